@@ -1,24 +1,67 @@
 from __future__ import annotations
 
 import json
+import logging
 import threading
-from queue import Queue, Empty
-from typing import Callable, Optional
+import time
+from collections import OrderedDict
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
+from .commands import LINK_TARGETS, PRIORITY_TARGETS, make_reply, run_command
+from .telemetry import Subscription, TelemetryEncoder
 
-try:
-    import serial  # type: ignore
-except ImportError:  # pragma: no cover
-    serial = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+# Replies and in-flight markers are keyed by the client's session (if it sends one) and seq.
+ReplyKey = Tuple[Any, int]
+
+
+def _import_serial():
+    # pyserial is only imported when the link is enabled.
+    try:
+        import serial  # type: ignore
+    except ImportError:  # pragma: no cover
+        return None
+    return serial
 
 
 class BLEGateway:
-    def __init__(self, port: str, baudrate: int, enabled: bool = True) -> None:
-        self.enabled = enabled and serial is not None
+    def __init__(
+        self,
+        port: str,
+        baudrate: int,
+        enabled: bool = True,
+        queue_size: int = 64,
+        priority_handler: Optional[Callable[[dict], Any]] = None,
+        dedupe_window: int = 32,
+        rx_queue: Any = None,
+        notify: Optional[Callable[[], None]] = None,
+        dedupe_ttl: float = 120.0,
+    ) -> None:
+        serial = _import_serial() if enabled else None
+        self.enabled = serial is not None
         self._port = port
         self._baudrate = baudrate
         self._serial = None
-        self._rx_queue: "Queue[str]" = Queue()
+        # A multiprocessing queue here hands commands straight to the control process.
+        self._rx_queue: "Queue[dict]" = rx_queue if rx_queue is not None else Queue(maxsize=max(queue_size, 1))
+        self.priority_handler = priority_handler
+        # Called after a command is queued, to wake a control loop sleeping until its next timer.
+        self.notify = notify
+        self.malformed_count = 0
+        self.dropped_count = 0
+        self.duplicate_count = 0
+        self._dedupe_window = max(dedupe_window, 1)
+        # Past this age a cached reply is forgotten and a command still without a reply
+        # (say the control process restarted) no longer blocks its seq.
+        self._dedupe_ttl = dedupe_ttl
+        self._replies: "OrderedDict[ReplyKey, Tuple[float, bytes]]" = OrderedDict()
+        self._pending: Dict[ReplyKey, float] = {}
+        self._seq_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self.subscription = Subscription()
         if self.enabled:
             self._serial = serial.Serial(port, baudrate=baudrate, timeout=1)
             self._reader = threading.Thread(target=self._read_loop, daemon=True)
@@ -28,28 +71,146 @@ class BLEGateway:
         assert self._serial
         while True:
             try:
-                line = self._serial.readline().decode("utf-8").strip()
+                raw = self._serial.readline()
             except Exception:
+                logger.warning(
+                    "Serial read failed on %s", self._port, exc_info=True, extra={"_rate_limit": True}
+                )
+                time.sleep(0.5)
+                continue
+            try:
+                line = raw.decode("utf-8").strip()
+            except UnicodeDecodeError:
+                # Line noise, not a failed port: drop the line and keep reading.
+                self.malformed_count += 1
+                logger.debug("Dropping non-UTF-8 command line %r", raw[:80])
                 continue
             if line:
-                self._rx_queue.put(line)
+                self._accept_line(line)
 
-    def poll_command(self) -> Optional[dict]:
-        if not self.enabled:
-            return None
+    def _accept_line(self, line: str) -> None:
         try:
-            line = self._rx_queue.get_nowait()
-            return json.loads(line)
-        except Empty:
-            return None
+            command = json.loads(line)
         except json.JSONDecodeError:
-            return None
+            self.malformed_count += 1
+            logger.debug("Dropping malformed command line %r", line[:80])
+            return
+        if not isinstance(command, dict):
+            self.malformed_count += 1
+            logger.debug("Dropping non-object command %r", line[:80])
+            return
+        seq = command.get("seq")
+        session = command.get("session")
+        # bool is an int subclass but never a meaningful sequence number.
+        if (seq is not None and (not isinstance(seq, int) or isinstance(seq, bool))) or not isinstance(
+            session, (str, int, type(None))
+        ):
+            self.malformed_count += 1
+            logger.debug("Dropping command with invalid seq/session %r", line[:80])
+            error = "seq must be an integer and session a string or integer"
+            self._write(self._encode(make_reply(None, False, error=error)))
+            return
+        if seq is not None:
+            key = (session, seq)
+            with self._seq_lock:
+                self._expire(time.monotonic())
+                cached = self._replies.get(key)
+                in_flight = key in self._pending
+                if cached is None and not in_flight:
+                    self._pending[key] = time.monotonic()
+            if cached is not None or in_flight:
+                # Resent command: replay the original reply instead of applying it twice.
+                self.duplicate_count += 1
+                if cached is not None:
+                    self._write(cached[1])
+                return
+        if command.get("target") in PRIORITY_TARGETS and self.priority_handler:
+            self.execute(command, self.priority_handler)
+            return
+        if command.get("target") in LINK_TARGETS:
+            self.execute(command, self._handle_link_command)
+            return
+        try:
+            self._rx_queue.put_nowait(command)
+        except Full:
+            self.dropped_count += 1
+            logger.warning(
+                "Command queue full, dropping %s command", command.get("target"), extra={"_rate_limit": True}
+            )
+            self.send_reply(make_reply(seq, False, error="command queue full", session=session), cache=False)
+            return
+        if self.notify is not None:
+            self.notify()
+
+    def _handle_link_command(self, command: dict) -> Any:
+        # Subscriptions only affect this link, so they are applied on the reader thread.
+        subscription = Subscription.from_command(command)
+        self.subscription = subscription
+        return subscription.describe()
 
-    def publish_state(self, payload: dict) -> None:
+    def execute(self, command: dict, handler: Callable[[dict], Any]) -> None:
+        self.send_reply(run_command(command, handler))
+
+    def _expire(self, now: float) -> None:
+        # Caller holds _seq_lock. Replies are stored in arrival order, so the oldest come first.
+        cutoff = now - self._dedupe_ttl
+        while self._replies and next(iter(self._replies.values()))[0] < cutoff:
+            self._replies.popitem(last=False)
+        for key in [key for key, since in self._pending.items() if since < cutoff]:
+            del self._pending[key]
+
+    @staticmethod
+    def _encode(reply: Dict[str, Any]) -> bytes:
+        return (json.dumps(reply) + "\n").encode("utf-8")
+
+    def send_reply(self, reply: Dict[str, Any], cache: bool = True) -> None:
+        """Write `reply` and keep it for replay to a resend of the same seq.
+
+        A transient refusal the client is meant to retry is sent with
+        ``cache=False``, so the retry is applied instead of answered from the cache.
+        """
+        seq = reply["seq"]
+        if seq is None:
+            return
+        data = self._encode(reply)
+        key = (reply.get("session"), seq)
+        with self._seq_lock:
+            self._pending.pop(key, None)
+            if cache:
+                self._replies[key] = (time.monotonic(), data)
+                while len(self._replies) > self._dedupe_window:
+                    self._replies.popitem(last=False)
+        self._write(data)
+
+    def _write(self, data: bytes) -> None:
         if not self.enabled or not self._serial:
             return
-        try:
-            self._serial.write((json.dumps(payload) + "\n").encode("utf-8"))
-        except Exception:
-            pass
+        with self._write_lock:
+            try:
+                self._serial.write(data)
+            except Exception:
+                logger.warning(
+                    "Serial write failed on %s", self._port, exc_info=True, extra={"_rate_limit": True}
+                )
+
+    def drain_commands(self) -> List[dict]:
+        commands: List[dict] = []
+        if not self.enabled:
+            return commands
+        # Only take what is queued right now so a chatty link cannot starve the tick.
+        for _ in range(self._rx_queue.qsize()):
+            try:
+                commands.append(self._rx_queue.get_nowait())
+            except Empty:
+                break
+        return commands
 
+    def publish_telemetry(self, encoders: Sequence[TelemetryEncoder]) -> None:
+        if not self.enabled or not self._serial:
+            return
+        subscription = self.subscription
+        if not subscription.due(time.monotonic()):
+            return
+        for encoder in encoders:
+            if subscription.wants(encoder.zone):
+                self._write(encoder.frame(subscription.topics))
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import logging
+import time
+from typing import Any, Callable, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+PRIORITY_TARGETS = ("estop",)
+LINK_TARGETS = ("subscribe",)
+
+
+def make_reply(
+    seq: Optional[int],
+    ok: bool,
+    result: Any = None,
+    error: Optional[str] = None,
+    elapsed_ms: float = 0.0,
+    session: Any = None,
+) -> Dict[str, Any]:
+    reply: Dict[str, Any] = {"type": "ack" if ok else "nak", "seq": seq, "ms": round(elapsed_ms, 3)}
+    if session is not None:
+        # Echoed so the link can key its reply cache on (session, seq).
+        reply["session"] = session
+    if ok:
+        reply["result"] = result
+    else:
+        reply["error"] = error
+    return reply
+
+
+def run_command(command: dict, handler: Callable[[dict], Any]) -> Dict[str, Any]:
+    start = time.perf_counter()
+    try:
+        result = handler(command)
+    except Exception as exc:
+        logger.info("Command %s rejected: %s", command.get("target"), exc)
+        elapsed_ms = (time.perf_counter() - start) * 1000.0
+        return make_reply(
+            command.get("seq"), False, error=str(exc), elapsed_ms=elapsed_ms, session=command.get("session")
+        )
+    elapsed_ms = (time.perf_counter() - start) * 1000.0
+    return make_reply(command.get("seq"), True, result=result, elapsed_ms=elapsed_ms, session=command.get("session"))
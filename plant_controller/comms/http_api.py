@@ -0,0 +1,300 @@
+from __future__ import annotations
+
+import asyncio
+import base64
+import hashlib
+import ipaddress
+import json
+import logging
+import struct
+import threading
+import time
+from queue import Queue, Empty, Full
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+from .commands import LINK_TARGETS, PRIORITY_TARGETS, make_reply, run_command
+from .telemetry import Subscription, TelemetryEncoder
+
+
+logger = logging.getLogger(__name__)
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_BODY = 64 * 1024
+MAX_CLIENT_BACKLOG = 256 * 1024
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 413: "Payload Too Large"}
+
+Reply = Callable[[Dict[str, Any]], None]
+
+
+def check_bind_host(host: str) -> None:
+    if host == "localhost":
+        return
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        raise ValueError(f"API host must be an IP address or localhost, got {host}") from None
+    if address.is_unspecified or not (address.is_loopback or address.is_private):
+        raise ValueError(f"API host {host} is not a loopback or LAN address")
+
+
+def ws_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+class _Client:
+    def __init__(self, writer: asyncio.StreamWriter) -> None:
+        self.writer = writer
+        self.subscription = Subscription()
+        self.dropped_frames = 0
+
+
+class HTTPAPIServer:
+    """Local HTTP + WebSocket API running on its own asyncio loop thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8080,
+        queue_size: int = 64,
+        priority_handler: Optional[Callable[[dict], Any]] = None,
+        metrics_source: Optional[Callable[[], bytes]] = None,
+        notify: Optional[Callable[[], None]] = None,
+    ) -> None:
+        check_bind_host(host)
+        self.host = host
+        self.port = port
+        self.priority_handler = priority_handler
+        self.metrics_source = metrics_source
+        # Called after a command is queued, to wake a control loop sleeping until its next timer.
+        self.notify = notify
+        self._commands: "Queue[Tuple[dict, Reply]]" = Queue(maxsize=max(queue_size, 1))
+        self._clients: Set[_Client] = set()
+        # Immutable copy for the control thread; replaced (never mutated) by the loop thread.
+        self._client_list: Tuple[_Client, ...] = ()
+        self._snapshot = b"{}\n"
+        self._startup_error: Optional[BaseException] = None
+        self._loop = asyncio.new_event_loop()
+        self._ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        if self._startup_error is not None:
+            raise self._startup_error
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._server = self._loop.run_until_complete(
+                asyncio.start_server(self._handle, self.host, self.port)
+            )
+        except OSError as exc:
+            self._startup_error = exc
+            self._ready.set()
+            return
+        self.port = self._server.sockets[0].getsockname()[1]
+        logger.info("HTTP API listening on %s:%s", self.host, self.port)
+        self._ready.set()
+        self._loop.run_forever()
+
+    def close(self) -> None:
+        if self._startup_error is None:
+            self._loop.call_soon_threadsafe(self._server.close)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=2.0)
+
+    @property
+    def client_count(self) -> int:
+        return len(self._client_list)
+
+    def publish(self, encoders: Sequence[TelemetryEncoder]) -> None:
+        # Called on the control thread: encode once per zone and distinct topic set, then hand off.
+        self._snapshot = b"".join(bytes(encoder.frame()) for encoder in encoders)
+        clients = self._client_list
+        if not clients:
+            return
+        now = time.monotonic()
+        frames: Dict[Tuple[Optional[str], Optional[Tuple[str, ...]]], bytes] = {}
+        due: List[Tuple[_Client, bytes]] = []
+        for client in clients:
+            subscription = client.subscription
+            if not subscription.due(now):
+                continue
+            for encoder in encoders:
+                if not subscription.wants(encoder.zone):
+                    continue
+                key = (encoder.zone, subscription.topics)
+                frame = frames.get(key)
+                if frame is None:
+                    data = bytes(encoder.frame(subscription.topics))
+                    frame = frames[key] = ws_frame(data.rstrip(b"\n"))
+                due.append((client, frame))
+        if due:
+            self._loop.call_soon_threadsafe(self._broadcast, due)
+
+    def _broadcast(self, due: List[Tuple[_Client, bytes]]) -> None:
+        for client, frame in due:
+            if client.writer.transport.get_write_buffer_size() > MAX_CLIENT_BACKLOG:
+                client.dropped_frames += 1
+                logger.debug("WebSocket client backlogged, skipping frame")
+                continue
+            client.writer.write(frame)
+
+    def drain_commands(self) -> List[Tuple[dict, Reply]]:
+        commands: List[Tuple[dict, Reply]] = []
+        for _ in range(self._commands.qsize()):
+            try:
+                commands.append(self._commands.get_nowait())
+            except Empty:
+                break
+        return commands
+
+    async def _submit(self, command: dict) -> Dict[str, Any]:
+        if command.get("target") in PRIORITY_TARGETS and self.priority_handler:
+            return run_command(command, self.priority_handler)
+        future = self._loop.create_future()
+
+        def reply(result: Dict[str, Any]) -> None:
+            self._loop.call_soon_threadsafe(lambda: future.done() or future.set_result(result))
+
+        try:
+            self._commands.put_nowait((command, reply))
+        except Full:
+            return make_reply(command.get("seq"), False, error="command queue full", session=command.get("session"))
+        if self.notify is not None:
+            self.notify()
+        return await future
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await reader.readline()
+            method, target, _ = request_line.decode("latin-1").split(" ", 2)
+            headers: Dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            path = target.split("?", 1)[0]
+            if method == "GET" and path == "/state":
+                await self._respond(writer, 200, self._snapshot)
+            elif method == "GET" and path == "/metrics" and self.metrics_source is not None:
+                await self._respond(writer, 200, self.metrics_source(), PROMETHEUS_CONTENT_TYPE)
+            elif method == "GET" and path == "/ws" and headers.get("upgrade", "").lower() == "websocket":
+                await self._websocket(reader, writer, headers)
+            elif method == "POST" and path == "/command":
+                length = int(headers.get("content-length", "0"))
+                if length > MAX_BODY:
+                    await self._respond(writer, 413, b'{"error":"body too large"}')
+                    return
+                command = json.loads(await reader.readexactly(length))
+                if not isinstance(command, dict):
+                    raise ValueError("command must be a JSON object")
+                reply = await self._submit(command)
+                status = 200 if reply["type"] == "ack" else 400
+                await self._respond(writer, status, json.dumps(reply).encode("utf-8"))
+            else:
+                await self._respond(writer, 404, b'{"error":"not found"}')
+        except (ValueError, asyncio.IncompleteReadError) as exc:
+            logger.debug("Rejecting HTTP request: %s", exc)
+            try:
+                await self._respond(writer, 400, b'{"error":"bad request"}')
+            except ConnectionError:
+                pass
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        body: bytes,
+        content_type: str = "application/json",
+    ) -> None:
+        head = (
+            f"HTTP/1.1 {status} {REASONS[status]}\r\n"
+            f"Content-Type: {content_type}\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            "Connection: close\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + body)
+        await writer.drain()
+
+    async def _websocket(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, headers: Dict[str, str]
+    ) -> None:
+        key = headers.get("sec-websocket-key")
+        if not key:
+            raise ValueError("missing Sec-WebSocket-Key")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode("ascii")).digest())
+        writer.write(
+            b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        writer.write(ws_frame(self._snapshot.rstrip(b"\n")))
+        client = _Client(writer)
+        self._clients.add(client)
+        self._client_list = tuple(self._clients)
+        try:
+            while True:
+                opcode, payload = await self._read_frame(reader)
+                if opcode == 0x8:
+                    writer.write(ws_frame(b"", 0x8))
+                    break
+                if opcode == 0x9:
+                    writer.write(ws_frame(payload, 0xA))
+                    continue
+                if opcode != 0x1:
+                    continue
+                try:
+                    command = json.loads(payload)
+                except ValueError:
+                    continue
+                if isinstance(command, dict):
+                    # Replies are sent as they complete so one client can pipeline several commands.
+                    self._loop.create_task(self._ws_command(client, command))
+        finally:
+            self._clients.discard(client)
+            self._client_list = tuple(self._clients)
+
+    async def _ws_command(self, client: _Client, command: dict) -> None:
+        if command.get("target") in LINK_TARGETS:
+            reply = run_command(command, lambda cmd: self._subscribe(client, cmd))
+        else:
+            reply = await self._submit(command)
+        if reply["seq"] is not None and not client.writer.is_closing():
+            client.writer.write(ws_frame(json.dumps(reply).encode("utf-8")))
+
+    @staticmethod
+    def _subscribe(client: _Client, command: dict) -> Any:
+        client.subscription = Subscription.from_command(command)
+        return client.subscription.describe()
+
+    @staticmethod
+    async def _read_frame(reader: asyncio.StreamReader) -> Tuple[int, bytes]:
+        head = await reader.readexactly(2)
+        opcode = head[0] & 0x0F
+        masked = head[1] & 0x80
+        length = head[1] & 0x7F
+        if length == 126:
+            length = struct.unpack("!H", await reader.readexactly(2))[0]
+        elif length == 127:
+            length = struct.unpack("!Q", await reader.readexactly(8))[0]
+        if length > MAX_BODY:
+            raise ValueError("websocket frame too large")
+        mask = await reader.readexactly(4) if masked else b""
+        payload = await reader.readexactly(length)
+        if masked and length:
+            key = (mask * (length // 4 + 1))[:length]
+            payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+        return opcode, payload
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import logging
+import math
+import os
+import pathlib
+import time
+from typing import Iterable, List, Mapping, Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+
+LOOP_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+Sample = Tuple[Mapping[str, str], float]
+Family = Tuple[str, str, str, Iterable[Sample]]
+
+
+def _format_value(value: Optional[float]) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return "NaN"
+    if value is True or value is False:
+        return "1" if value else "0"
+    if isinstance(value, float) and math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+
+def _format_labels(labels: Mapping[str, str]) -> str:
+    if not labels:
+        return ""
+    parts = []
+    for key, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        parts.append(f'{key}="{escaped}"')
+    return "{" + ",".join(parts) + "}"
+
+
+class MetricsExporter:
+    """Renders Prometheus text exposition once per tick; scrapes only read the last snapshot."""
+
+    def __init__(
+        self,
+        prefix: str = "plant",
+        textfile: Optional[str | pathlib.Path] = None,
+        textfile_interval: float = 15.0,
+    ) -> None:
+        self.prefix = prefix
+        self.textfile = pathlib.Path(textfile) if textfile else None
+        self.textfile_interval = textfile_interval
+        self._next_textfile = 0.0
+        self._loop_buckets: List[int] = [0] * len(LOOP_BUCKETS)
+        self._loop_count = 0
+        self._loop_sum = 0.0
+        self._missed = 0
+        self.snapshot = b""
+
+    def observe_loop(self, duration: float, deadline: float) -> None:
+        self._loop_count += 1
+        self._loop_sum += duration
+        for index, bound in enumerate(LOOP_BUCKETS):
+            if duration <= bound:
+                self._loop_buckets[index] += 1
+        if duration > deadline:
+            self._missed += 1
+
+    def _loop_lines(self) -> List[str]:
+        name = f"{self.prefix}_loop_duration_seconds"
+        lines = [f"# HELP {name} Control loop tick duration.", f"# TYPE {name} histogram"]
+        for bound, count in zip(LOOP_BUCKETS, self._loop_buckets):
+            lines.append(f'{name}_bucket{{le="{bound}"}} {count}')
+        lines.append(f'{name}_bucket{{le="+Inf"}} {self._loop_count}')
+        lines.append(f"{name}_sum {self._loop_sum!r}")
+        lines.append(f"{name}_count {self._loop_count}")
+        missed = f"{self.prefix}_loop_missed_deadlines_total"
+        lines.append(f"# HELP {missed} Ticks that overran the loop period.")
+        lines.append(f"# TYPE {missed} counter")
+        lines.append(f"{missed} {self._missed}")
+        return lines
+
+    def render(self, families: Iterable[Family]) -> bytes:
+        lines: List[str] = []
+        for name, kind, help_text, samples in families:
+            full_name = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full_name} {help_text}")
+            lines.append(f"# TYPE {full_name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{full_name}{_format_labels(labels)} {_format_value(value)}")
+        lines.extend(self._loop_lines())
+        lines.append("")
+        self.snapshot = "\n".join(lines).encode("utf-8")
+        self._write_textfile()
+        return self.snapshot
+
+    def _write_textfile(self) -> None:
+        if self.textfile is None:
+            return
+        now = time.monotonic()
+        if now < self._next_textfile:
+            return
+        self._next_textfile = now + self.textfile_interval
+        tmp_path = self.textfile.with_suffix(self.textfile.suffix + ".tmp")
+        try:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path.write_bytes(self.snapshot)
+            # node_exporter must never read a half-written file.
+            os.replace(tmp_path, self.textfile)
+        except OSError:
+            # A full or read-only SD card must not take the control loop down; retry next interval.
+            logger.warning(
+                "Writing metrics textfile %s failed", self.textfile, exc_info=True, extra={"_rate_limit": True}
+            )
+
+
+def labelled(label: str, values: Mapping[str, float], base: Optional[Mapping[str, str]] = None) -> Iterable[Sample]:
+    if base:
+        return (({**base, label: key}, value) for key, value in values.items())
+    return (({label: key}, value) for key, value in values.items())
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass
+from operator import itemgetter
+from typing import Any, Callable, Collection, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from plant_controller.utils.datatypes import (
+    EnvironmentReading,
+    ReservoirReading,
+    SoilReading,
+    SystemState,
+)
+
+
+STATE_SECTIONS = (
+    ("environment", EnvironmentReading),
+    ("reservoir", ReservoirReading),
+    ("soil", SoilReading),
+)
+
+TELEMETRY_TOPICS = tuple(name for name, _ in STATE_SECTIONS) + ("relays",)
+
+
+def _names(value: Any, key: str) -> Optional[Tuple[str, ...]]:
+    # A bare string is one name; iterating it would yield its characters.
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return (value,)
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"Subscription {key} must be a string or a list of strings")
+    return tuple(value)
+
+
+@dataclass
+class Subscription:
+    topics: Optional[Tuple[str, ...]] = None
+    period: float = 0.0
+    next_due: float = 0.0
+    zones: Optional[Tuple[str, ...]] = None
+
+    @classmethod
+    def from_command(cls, command: dict) -> "Subscription":
+        topics = _names(command.get("topics"), "topics")
+        if topics is not None:
+            unknown = [topic for topic in topics if topic not in TELEMETRY_TOPICS]
+            if unknown:
+                raise ValueError(f"Unknown telemetry topics {unknown}")
+            topics = tuple(topic for topic in TELEMETRY_TOPICS if topic in topics)
+        hz = float(command.get("hz", 0.0))
+        if hz < 0:
+            raise ValueError("Subscription rate must not be negative")
+        return cls(
+            topics=topics,
+            period=1.0 / hz if hz > 0 else 0.0,
+            zones=_names(command.get("zones"), "zones"),
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "topics": list(self.topics) if self.topics is not None else None,
+            "period": self.period,
+            "zones": list(self.zones) if self.zones is not None else None,
+        }
+
+    def wants(self, zone: Optional[str]) -> bool:
+        return self.zones is None or zone is None or zone in self.zones
+
+    def due(self, now: float) -> bool:
+        if now < self.next_due:
+            return False
+        self.next_due = now + self.period
+        return True
+
+
+def _tuple_getter(getter: Callable[[Any], Any], size: int) -> Callable[[Any], Tuple]:
+    # attrgetter/itemgetter return a bare value for a single key; keep the shape uniform.
+    if size == 1:
+        return lambda obj: (getter(obj),)
+    return getter
+
+
+def _encode_value(value: Any) -> bytes:
+    if value is None:
+        return b"null"
+    if value is True:
+        return b"true"
+    if value is False:
+        return b"false"
+    if isinstance(value, float):
+        return repr(value).encode("ascii") if math.isfinite(value) else b"null"
+    return str(value).encode("ascii")
+
+
+class _Section:
+    def __init__(self, name: str, keys: Iterable[str], getter: Optional[Callable[[Any], Tuple]] = None) -> None:
+        self.name = name
+        self.prefix = f'"{name}":{{'.encode("utf-8")
+        self.keys: List[bytes] = [f'"{key}":'.encode("utf-8") for key in keys]
+        self.getter = getter
+        self.buffer = bytearray()
+        self.last: Any = None
+        self.span = slice(0)
+
+    def encode(self, values: Sequence[Any]) -> None:
+        buf = self.buffer
+        del buf[:]
+        buf += self.prefix
+        for index, key in enumerate(self.keys):
+            if index:
+                buf += b","
+            buf += key
+            buf += _encode_value(values[index])
+        buf += b"}"
+
+
+class TelemetryEncoder:
+    """Encodes SystemState telemetry with a fixed key layout, re-encoding only changed sections."""
+
+    def __init__(self, relay_names: Iterable[str], zone: Optional[str] = None) -> None:
+        self.zone = zone
+        # Frames only carry a zone key when several zones share one link.
+        self._prefix = b'{"timestamp":' if zone is None else f'{{"zone":{json.dumps(zone)},"timestamp":'.encode("utf-8")
+        self.timestamp = 0.0
+        self._sections: List[_Section] = []
+        for name, reading_cls in STATE_SECTIONS:
+            section = _Section(name, reading_cls.FIELDS)
+            section.span = slice(reading_cls.OFFSET, reading_cls.OFFSET + len(reading_cls.FIELDS))
+            self._sections.append(section)
+        names = list(relay_names)
+        relay_getter = _tuple_getter(itemgetter(*names), len(names)) if names else (lambda _: ())
+        self._relays = _Section("relays", names, relay_getter)
+        self._by_topic: Dict[str, _Section] = {section.name: section for section in self._sections}
+        self._by_topic["relays"] = self._relays
+        self._frame = bytearray()
+
+    def update(self, state: SystemState, relay_states: Mapping[str, bool]) -> bool:
+        self.timestamp = state.timestamp
+        changed = False
+        values = state.values
+        # Compare raw bytes: NaN (a missing reading) never equals itself as a float.
+        raw = memoryview(values).cast("B")
+        for section in self._sections:
+            span = section.span
+            key = raw[span.start * 8 : span.stop * 8].tobytes()
+            if key != section.last:
+                section.encode(values[span])
+                section.last = key
+                changed = True
+        relays = self._relays.getter(relay_states)
+        if relays != self._relays.last:
+            self._relays.encode(relays)
+            self._relays.last = relays
+            changed = True
+        return changed
+
+    def frame(self, topics: Optional[Collection[str]] = None) -> bytearray:
+        # The returned buffer is reused by the next call; write it out before encoding again.
+        buf = self._frame
+        del buf[:]
+        buf += self._prefix
+        buf += _encode_value(float(self.timestamp))
+        for name in TELEMETRY_TOPICS if topics is None else topics:
+            buf += b","
+            buf += self._by_topic[name].buffer
+        buf += b"}\n"
+        return buf
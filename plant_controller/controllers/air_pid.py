@@ -5,13 +5,19 @@ from plant_controller.utils.datatypes import SystemState
 from plant_controller.utils.pid import PID
 
 from .base import BaseController
+from .registry import register
 
 
+@register("air_pid", requires=("air_pwm",), period_s=0.0, reads=("environment.air_temp_c",))
 class AirPIDController(BaseController):
     def __init__(self, pwm: PWMChannel, config: dict) -> None:
         super().__init__("air_pid", config)
         self.pwm = pwm
-        self.pid = PID(
+        self.pid = PID(0.0, 0.0, 0.0)
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
+        self.pid.tune(
             config.get("kp", 10.0),
             config.get("ki", 0.5),
             config.get("kd", 1.0),
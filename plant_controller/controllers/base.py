@@ -1,22 +1,81 @@
 from __future__ import annotations
 
+import threading
 import time
-from typing import Any, Dict
+from typing import Any, Dict, Optional, Tuple
 
 
 class BaseController:
+    # Set by @register: zone resources passed to __init__, the default cadence, and the
+    # SystemState fields update() reads (None: not declared, run on every period).
+    requires: Tuple[str, ...] = ()
+    period_s = 0.0
+    reads: Optional[Tuple[str, ...]] = None
+    read_mask = 0
+    max_idle_s = 30.0
+
     def __init__(self, name: str, config: Dict[str, Any]) -> None:
         self.name = name
         self.config = config
         self.enabled = config.get("enabled", True)
+        self.period_s = config.get("period_s", type(self).period_s)
+        self.max_idle_s = config.get("max_idle_s", type(self).max_idle_s)
+        self.runs = 0
         self._last_update = 0.0
+        self._wake_at = 0.0
+        self._pending = 0
+        # wake() also runs on the dosing worker (job on_done); without the lock a wake landing
+        # between should_run's check and its reset of _wake_at would be lost.
+        self._wake_lock = threading.Lock()
+
+    def configure(self, config: Dict[str, Any]) -> None:
+        """Read tunable settings from `config`; runs at construction and on every reload."""
+        return
+
+    def reconfigure(self, config: Dict[str, Any]) -> None:
+        # Runtime state (PID integrals, cooldowns, outputs) is kept; only settings change.
+        # `enabled` follows the file only when the file changed it, so a command toggle survives.
+        if config.get("enabled", True) != self.config.get("enabled", True):
+            self.enabled = config.get("enabled", True)
+        self.config = config
+        self.period_s = config.get("period_s", type(self).period_s)
+        self.max_idle_s = config.get("max_idle_s", type(self).max_idle_s)
+        self.configure(config)
+        self.wake()
+
+    def wake(self, at: float = 0.0) -> None:
+        """Time trigger: run once `at` (epoch seconds, default the next tick) has passed.
+
+        A wake bypasses both the change check and the period, e.g. for an enable
+        toggle or a cooldown that expires while the readings hold still.
+        """
+        with self._wake_lock:
+            self._wake_at = min(self._wake_at, at)
+
+    @property
+    def wake_at(self) -> float:
+        return self._wake_at
+
+    def should_run(self, interval: float = 1.0, changed: int = 0) -> bool:
+        """Decide whether update() is due; `changed` is the zone's dirty-field bitmask.
 
-    def should_run(self, interval: float = 1.0) -> bool:
+        A controller with declared `reads` runs at most once per `interval`, and only
+        when one of its fields changed since its last run, a wake time passed, or
+        `max_idle_s` went by without a run. Without `reads` only the interval applies.
+        """
         now = time.time()
-        if now - self._last_update >= interval:
-            self._last_update = now
-            return True
-        return False
+        self._pending |= changed & self.read_mask
+        since = now - self._last_update
+        with self._wake_lock:
+            if now < self._wake_at:
+                wanted = self.reads is None or self._pending or since >= self.max_idle_s
+                if not wanted or since < interval:
+                    return False
+            self._wake_at = float("inf")
+        self._last_update = now
+        self._pending = 0
+        self.runs += 1
+        return True
 
     def update(self, *_args: Any, **_kwargs: Any) -> None:
         raise NotImplementedError
@@ -5,8 +5,15 @@ from plant_controller.hardware.servo_driver import ServoDriver
 from plant_controller.utils.datatypes import SystemState
 
 from .base import BaseController
+from .registry import register
 
 
+@register(
+    "co2",
+    requires=("relays", "servos"),
+    period_s=0.0,
+    reads=("environment.co2_ppm", "environment.humidity"),
+)
 class CO2Controller(BaseController):
     def __init__(
         self,
@@ -19,11 +26,14 @@ class CO2Controller(BaseController):
         super().__init__("co2", config)
         self.relays = relays
         self.servos = servos
-        self.ppm_min = config.get("ppm_min", 900)
-        self.ppm_max = config.get("ppm_max", 1200)
         self.closed_positions = servo_positions
         self.vent_position = vent_position
         self._venting = False
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
+        self.ppm_min = config.get("ppm_min", 900)
+        self.ppm_max = config.get("ppm_max", 1200)
 
     def _set_vent(self, open_: bool) -> None:
         if open_:
@@ -6,18 +6,23 @@ from plant_controller.hardware.relay_manager import RelayManager
 from plant_controller.utils.datatypes import SystemState
 
 from .base import BaseController
+from .registry import register
 
 
+@register("humidity", requires=("relays",), period_s=0.0, reads=("environment.humidity",))
 class HumidityController(BaseController):
     def __init__(self, relays: RelayManager, config: dict) -> None:
         super().__init__("humidity", config)
         self.relays = relays
+        self._next_allowed_start = 0.0
+        self._heater_on_since = 0.0
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
         self.rh_min = config.get("rh_min", 50)
         self.rh_max = config.get("rh_max", 60)
         self.heater_cycle = config.get("heater_cycle_seconds", 60)
         self.heater_rest = config.get("heater_rest_seconds", 30)
-        self._next_allowed_start = 0.0
-        self._heater_on_since = 0.0
 
     def update(self, state: SystemState) -> None:
         if not self.enabled:
@@ -34,10 +39,12 @@ class HumidityController(BaseController):
                 self.relays.set_state("heater", True)
                 self.relays.set_state("humidity_fan", True)
                 self._heater_on_since = now
+                self.wake(now + self.heater_cycle)
         if heater_active and (humidity >= self.rh_max or now - self._heater_on_since > self.heater_cycle):
             self.relays.set_state("heater", False)
             self.relays.set_state("humidity_fan", False)
             self._next_allowed_start = now + self.heater_rest
+            self.wake(self._next_allowed_start)
         if humidity >= self.rh_max:
             self.relays.set_state("heater", False)
             self.relays.set_state("humidity_fan", False)
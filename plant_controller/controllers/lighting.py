@@ -5,12 +5,17 @@ import datetime as dt
 from plant_controller.hardware.relay_manager import RelayManager
 
 from .base import BaseController
+from .registry import register
 
 
+@register("lighting", requires=("relays",), period_s=30.0, reads=())
 class LightingController(BaseController):
     def __init__(self, relays: RelayManager, config: dict) -> None:
         super().__init__("lighting", config)
         self.relays = relays
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
         schedule = config.get("schedule", {})
         self.on_hour = schedule.get("on_hour", 6)
         self.off_hour = schedule.get("off_hour", 24)
@@ -19,7 +24,11 @@ class LightingController(BaseController):
         if not self.enabled:
             self.relays.set_state("lights", False)
             return
-        now = dt.datetime.now().hour
+        current = dt.datetime.now()
+        # The schedule only flips on the hour; nothing else can change the outcome.
+        next_hour = current.replace(minute=0, second=0, microsecond=0) + dt.timedelta(hours=1)
+        self.wake(next_hour.timestamp())
+        now = current.hour
         lights_on = False
         if self.on_hour < self.off_hour:
             lights_on = self.on_hour <= now < self.off_hour
@@ -1,52 +1,148 @@
 from __future__ import annotations
 
+import logging
 import time
-from typing import Optional
+from typing import List, Optional, Tuple
 
+from plant_controller.hardware.dosing_service import DoseJob, DosingService
 from plant_controller.hardware.relay_manager import RelayManager
-from plant_controller.hardware.syringe_driver import SyringeDriver
 from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.dose_planner import DosePlanner
+from plant_controller.utils.settle import SettleDetector
 
 from .base import BaseController
+from .registry import register
 
 
+logger = logging.getLogger(__name__)
+
+
+@register("nutrient", requires=("relays", "dosing"), period_s=5.0, reads=("reservoir.ec", "reservoir.tds"))
 class NutrientController(BaseController):
-    def __init__(self, relays: RelayManager, syringe: SyringeDriver, config: dict) -> None:
+    def __init__(self, relays: RelayManager, dosing: DosingService, config: dict) -> None:
         super().__init__("nutrient", config)
         self.relays = relays
-        self.syringe = syringe
+        self.dosing = dosing
+        self.settle = SettleDetector()
+        # Jobs of the correction in flight and the EC it was planned from.
+        self._jobs: List[DoseJob] = []
+        self._dose_ec = 0.0
+        # EC when the last dose went in and the ml per part delivered, until its response is measured.
+        self._last_dose: Optional[Tuple[float, float]] = None
+        self.planner: Optional[DosePlanner] = None
+        self._seed_gain = 0.0
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
         self.ec_min = config.get("ec_min", 1.6)
         self.ec_max = config.get("ec_max", 2.0)
+        self.ec_target = config.get("ec_target", (self.ec_min + self.ec_max) / 2.0)
         self.dose_ml = config.get("dose_ml", 1.0)
-        self._cooldown_until = 0.0
+        seed_gain = config.get("gain_ml_per_ec_l", 2.0)
+        planner = DosePlanner(
+            config.get("reservoir_liters", 20.0),
+            seed_gain,
+            config.get("max_sub_dose_ml", 5.0),
+            config.get("max_cycle_ml", 20.0),
+            learning_rate=config.get("gain_learning_rate", 0.3),
+        )
+        if self.planner is not None and seed_gain == self._seed_gain:
+            # A reload keeps the learned gain unless the seed value itself was retuned.
+            planner.gain = self.planner.gain
+        self.planner = planner
+        self._seed_gain = seed_gain
+        self.settle.tune(
+            config.get("settle_window_seconds", 30.0),
+            config.get("settle_slope_per_min", 0.01),
+            config.get("settle_band", 0.02),
+            config.get("settle_min_seconds", 20.0),
+            # The old fixed cooldown is now only the upper bound on a settle wait.
+            config.get("settle_timeout_seconds", config.get("cooldown_seconds", 300)),
+        )
+        self.settle_sample = config.get("settle_sample_seconds", 5.0)
+        self.mix_relay = config.get("mix_relay")
+
+    def _set_mixer(self, on: bool) -> None:
+        if self.mix_relay and self.mix_relay in self.relays.names:
+            self.relays.set_state(self.mix_relay, on)
+
+    def _start_settle(self, now: float) -> None:
+        self.settle.start(now)
+        self._set_mixer(True)
+        self.wake(now + self.settle_sample)
 
-    def _select_channel(self, name: str) -> None:
-        for relay in ("nutrient_a", "nutrient_b", "main_water", "mix_tank"):
-            self.relays.set_state(relay, relay == name)
+    def _settling(self, now: float, ec: Optional[float]) -> bool:
+        if ec is not None:
+            self.settle.add(now, ec)
+        if not self.settle.settled(now):
+            self.wake(now + self.settle_sample)
+            return True
+        self._set_mixer(False)
+        logger.info(
+            "Reservoir settled",
+            extra={"seconds": round(self.settle.duration, 1), "timed_out": self.settle.timed_out},
+        )
+        return False
 
-    def _dose(self, channel: str, ml: float) -> None:
-        self._select_channel(channel)
-        self.syringe.dispense_ml(ml, direction_up=False)
-        self._select_channel("")
+    def _submit(self, channel: str, ml: float) -> None:
+        # Completion wakes the controller, so it need not poll the queue.
+        self._jobs.append(self.dosing.submit(channel, ml, on_done=lambda job: self.wake()))
+
+    def _cancel_jobs(self) -> None:
+        for job in self._jobs:
+            self.dosing.cancel(job)
+        self._jobs = []
+
+    def _jobs_finished(self, now: float) -> None:
+        jobs, self._jobs = self._jobs, []
+        part_a = [job for job in jobs if job.channel == "nutrient_a"]
+        delivered = sum(job.delivered_ml for job in part_a)
+        if delivered > 0:
+            self._last_dose = (self._dose_ec, delivered)
+            logger.info(
+                "Nutrient dose",
+                extra={
+                    "ec": self._dose_ec,
+                    "target": self.ec_target,
+                    "ml_per_part": round(delivered, 2),
+                    "sub_doses": len(part_a),
+                },
+            )
+        self._start_settle(now)
+
+    def _learn(self, ec: float) -> None:
+        ec_before, dosed = self._last_dose
+        self._last_dose = None
+        gain = self.planner.observe(ec_before, ec, dosed)
+        if gain is not None:
+            logger.info(
+                "Nutrient gain updated",
+                extra={"ec_before": ec_before, "ec_after": ec, "dosed_ml": dosed, "gain_ml_per_ec_l": round(gain, 3)},
+            )
 
     def update(self, state: SystemState) -> None:
         if not self.enabled:
-            for relay in ("nutrient_a", "nutrient_b", "main_water", "mix_tank"):
-                self.relays.set_state(relay, False)
+            self._cancel_jobs()
+            self._set_mixer(False)
             return
         now = time.time()
-        if now < self._cooldown_until:
+        if self._jobs:
+            if all(job.done for job in self._jobs):
+                self._jobs_finished(now)
             return
         ec = state.reservoir.ec or state.reservoir.tds
+        if self.settle.active and self._settling(now, ec):
+            return
         if ec is None:
             return
+        if self._last_dose is not None:
+            self._learn(ec)
         if ec < self.ec_min:
-            self._dose("nutrient_a", self.dose_ml)
-            self._dose("nutrient_b", self.dose_ml)
-            self._cooldown_until = now + self.config.get("cooldown_seconds", 300)
+            self._dose_ec = ec
+            for ml in self.planner.plan(ec, self.ec_target):
+                # Alternate the parts so concentrated A and B never meet in the line.
+                self._submit("nutrient_a", ml)
+                self._submit("nutrient_b", ml)
         elif ec > self.ec_max:
-            self._select_channel("main_water")
-            self.syringe.dispense_ml(self.dose_ml, direction_up=False)
-            self._select_channel("")
-            self._cooldown_until = now + self.config.get("cooldown_seconds", 300)
+            self._submit("main_water", self.dose_ml)
 
@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import importlib
+import logging
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Type
+
+from plant_controller.utils.datatypes import SENSOR_FIELDS
+
+from .base import BaseController
+
+
+logger = logging.getLogger(__name__)
+
+# Zone-owned objects a controller can ask for by name.
+RESOURCES = ("relays", "servos", "air_pwm", "water_pwm", "syringe", "dosing")
+
+# Built-in controllers, in the order they run each tick.
+BUILTIN_MODULES = (
+    "humidity",
+    "co2",
+    "lighting",
+    "air_pid",
+    "water_pid",
+    "nutrient",
+    "soil",
+)
+
+_REGISTRY: Dict[str, Type[BaseController]] = {}
+
+
+def register(
+    name: str,
+    requires: Iterable[str] = (),
+    period_s: float = 0.0,
+    reads: Optional[Iterable[str]] = None,
+) -> Callable[[Type[BaseController]], Type[BaseController]]:
+    """Class decorator adding a controller to the registry.
+
+    The class is constructed as ``cls(*resources, config)`` with the zone
+    resources named in `requires`, in that order, and its `update` runs at
+    most once every `period_s` seconds (0 allows every tick). The
+    ``controllers.<name>.period_s`` setting overrides the cadence. With
+    `reads` (``SENSOR_FIELDS`` names) it only runs when one of those fields
+    changed, on a `wake()` time trigger, or after ``max_idle_s``.
+    """
+    requires = tuple(requires)
+    unknown = [item for item in requires if item not in RESOURCES]
+    if unknown:
+        raise ValueError(f"Controller {name} requires unknown resources: {', '.join(unknown)}")
+    fields = tuple(reads) if reads is not None else None
+    unknown = [item for item in fields or () if item not in SENSOR_FIELDS]
+    if unknown:
+        raise ValueError(f"Controller {name} reads unknown fields: {', '.join(unknown)}")
+    read_mask = sum(1 << SENSOR_FIELDS.index(item) for item in set(fields or ()))
+
+    def decorator(cls: Type[BaseController]) -> Type[BaseController]:
+        if name in _REGISTRY and _REGISTRY[name] is not cls:
+            raise ValueError(f"Controller {name} is already registered by {_REGISTRY[name].__qualname__}")
+        cls.requires = requires
+        cls.period_s = period_s
+        cls.reads = fields
+        cls.read_mask = read_mask
+        _REGISTRY[name] = cls
+        return cls
+
+    return decorator
+
+
+def load_plugins(modules: Iterable[str]) -> None:
+    # Importing a plugin module runs its @register decorators.
+    for module in modules:
+        importlib.import_module(module)
+        logger.info("Loaded controller plugin %s", module)
+
+
+def registered() -> List[Tuple[str, Type[BaseController]]]:
+    for module in BUILTIN_MODULES:
+        importlib.import_module(f"{__package__}.{module}")
+    # Built-ins keep their documented order whatever imported them first; plugins follow.
+    order = {name: index for index, name in enumerate(BUILTIN_MODULES)}
+    return sorted(_REGISTRY.items(), key=lambda item: order.get(item[0], len(order)))
+
+
+def build_controllers(resources: Dict[str, Any], config: Dict[str, Any]) -> List[BaseController]:
+    controllers = []
+    for name, cls in registered():
+        try:
+            args = [resources[item] for item in cls.requires]
+        except KeyError as exc:
+            raise ValueError(f"Controller {name} needs resource {exc.args[0]}") from None
+        controllers.append(cls(*args, config.get(name, {})))
+    return controllers
@@ -1,37 +1,48 @@
 from __future__ import annotations
 
 import time
+from typing import Optional
 
-from plant_controller.hardware.relay_manager import RelayManager
-from plant_controller.hardware.syringe_driver import SyringeDriver
+from plant_controller.hardware.dosing_service import DoseJob, DosingService
 from plant_controller.utils.datatypes import SystemState
 
 from .base import BaseController
+from .registry import register
 
 
+@register("soil", requires=("dosing",), period_s=5.0, reads=("soil.moisture",))
 class SoilController(BaseController):
-    def __init__(self, relays: RelayManager, syringe: SyringeDriver, config: dict) -> None:
+    def __init__(self, dosing: DosingService, config: dict) -> None:
         super().__init__("soil", config)
-        self.relays = relays
-        self.syringe = syringe
+        self.dosing = dosing
+        self._job: Optional[DoseJob] = None
+        self._next_check = 0.0
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
         self.moisture_min = config.get("moisture_min", 0.35)
         self.pulse_ml = config.get("pulse_ml", 0.5)
-        self._next_check = 0.0
 
     def update(self, state: SystemState) -> None:
         if not self.enabled:
-            self.relays.set_state("plant_output", False)
+            if self._job is not None:
+                self.dosing.cancel(self._job)
+                self._job = None
             return
+        job = self._job
+        if job is not None:
+            if not job.done:
+                return
+            # The settle time counts from when the pulse actually finished.
+            self._job = None
+            self._next_check = (job.finished or time.time()) + self.config.get("settle_time_seconds", 60)
+            self.wake(self._next_check)
         now = time.time()
         if now < self._next_check:
             return
         soil_moisture = state.soil.moisture
         if soil_moisture is None or soil_moisture >= self.moisture_min:
-            self.relays.set_state("plant_output", False)
             self._next_check = now + 10
             return
-        self.relays.set_state("plant_output", True)
-        self.syringe.dispense_ml(self.pulse_ml, direction_up=False)
-        self.relays.set_state("plant_output", False)
-        self._next_check = now + self.config.get("settle_time_seconds", 60)
+        self._job = self.dosing.submit("plant_output", self.pulse_ml, on_done=lambda job: self.wake())
 
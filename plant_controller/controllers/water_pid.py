@@ -6,14 +6,20 @@ from plant_controller.utils.datatypes import SystemState
 from plant_controller.utils.pid import PID
 
 from .base import BaseController
+from .registry import register
 
 
+@register("water_pid", requires=("water_pwm", "relays"), period_s=0.0, reads=("reservoir.water_temp_c",))
 class WaterPIDController(BaseController):
     def __init__(self, pwm: PWMChannel, relays: RelayManager, config: dict) -> None:
         super().__init__("water_pid", config)
         self.pwm = pwm
         self.relays = relays
-        self.pid = PID(
+        self.pid = PID(0.0, 0.0, 0.0)
+        self.configure(config)
+
+    def configure(self, config: dict) -> None:
+        self.pid.tune(
             config.get("kp", 8.0),
             config.get("ki", 0.4),
             config.get("kd", 1.2),
@@ -0,0 +1,279 @@
+from __future__ import annotations
+
+import heapq
+import logging
+import threading
+import time
+from collections import Counter, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+from .relay_manager import RelayManager
+from .syringe_driver import SyringeDriver
+
+
+logger = logging.getLogger(__name__)
+
+# Lower runs first. Manual doses preempt routine controller doses mid-stroke.
+PRIORITY_MANUAL = 0
+PRIORITY_ROUTINE = 10
+
+# Finished jobs kept for lookup by id after they leave the queue.
+RECENT_JOBS = 32
+
+# Valves the syringe output is routed through; exactly one (or none) is open while dosing.
+DOSING_RELAYS = ("nutrient_a", "nutrient_b", "main_water", "mix_tank", "plant_output")
+
+
+class DoseJob:
+    """One request for `ml` through `channel`; its fields are filled in as it runs."""
+
+    def __init__(
+        self,
+        job_id: int,
+        channel: str,
+        ml: float,
+        priority: int,
+        deadline: Optional[float],
+        on_done: Optional[Callable[["DoseJob"], None]],
+    ) -> None:
+        self.id = job_id
+        self.channel = channel
+        self.ml = ml
+        self.priority = priority
+        self.deadline = deadline
+        self.on_done = on_done
+        self.status = "queued"
+        self.delivered_ml = 0.0
+        self.preemptions = 0
+        self.error: Optional[str] = None
+        self.submitted = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._done = threading.Event()
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def remaining_ml(self) -> float:
+        return max(self.ml - self.delivered_ml, 0.0)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def describe(self) -> Dict[str, Any]:
+        info: Dict[str, Any] = {
+            "id": self.id,
+            "channel": self.channel,
+            "ml": self.ml,
+            "priority": self.priority,
+            "status": self.status,
+            "delivered_ml": round(self.delivered_ml, 3),
+            "preemptions": self.preemptions,
+        }
+        if self.error is not None:
+            info["error"] = self.error
+        return info
+
+
+class DosingService:
+    """Serialises every syringe move in a zone through one prioritised job queue.
+
+    Jobs run one at a time on a worker thread, which opens the channel's valve,
+    drives the stepper and closes the valve again. Callers get a `DoseJob` back
+    straight away. Queue order is priority, then deadline, then submission;
+    a job still queued after its deadline is dropped as expired. A more urgent
+    job stops the running one between steps, and the rest of that job goes back
+    in the queue. The last `RECENT_JOBS` finished jobs stay available to `job()`.
+    """
+
+    def __init__(
+        self,
+        syringe: SyringeDriver,
+        relays: RelayManager,
+        name: str = "dosing",
+        notify: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.syringe = syringe
+        self.relays = relays
+        self.notify = notify
+        self._valves = [relay for relay in DOSING_RELAYS if relay in relays.names]
+        self._heap: List[Tuple[int, float, int, DoseJob]] = []
+        self._cond = threading.Condition()
+        self._stop = threading.Event()
+        self._stop_reason = ""
+        self._running: Optional[DoseJob] = None
+        self._recent: Deque[DoseJob] = deque(maxlen=RECENT_JOBS)
+        self._next_id = 0
+        self._closed = False
+        self.outcomes: Counter = Counter()
+        self.wait_seconds = 0.0
+        self.run_seconds = 0.0
+        self._thread = threading.Thread(target=self._run, name=f"dosing-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(
+        self,
+        channel: str,
+        ml: float,
+        priority: int = PRIORITY_ROUTINE,
+        deadline: Optional[float] = None,
+        on_done: Optional[Callable[[DoseJob], None]] = None,
+    ) -> DoseJob:
+        with self._cond:
+            self._next_id += 1
+            job = DoseJob(self._next_id, channel, ml, priority, deadline, on_done)
+            self._push(job)
+            running = self._running
+            if running is not None and priority < running.priority:
+                self._stop_reason = "preempt"
+                self._stop.set()
+            self._cond.notify()
+        return job
+
+    def _push(self, job: DoseJob) -> None:
+        key = job.deadline if job.deadline is not None else float("inf")
+        heapq.heappush(self._heap, (job.priority, key, job.id, job))
+
+    def cancel(self, job: DoseJob) -> None:
+        with self._cond:
+            if job.status == "queued":
+                # Left in the heap; the worker skips it.
+                self._finish(job, "cancelled")
+            elif job is self._running:
+                self._stop_reason = "cancel"
+                self._stop.set()
+
+    def cancel_all(self) -> None:
+        with self._cond:
+            for _, _, _, job in self._heap:
+                if job.status == "queued":
+                    self._finish(job, "cancelled")
+            self._heap.clear()
+            if self._running is not None:
+                self._stop_reason = "cancel"
+                self._stop.set()
+
+    @property
+    def queue_depth(self) -> int:
+        with self._cond:
+            return sum(1 for *_, job in self._heap if job.status == "queued")
+
+    def job(self, job_id: int) -> Optional[DoseJob]:
+        """The running, queued or recently finished job with this id."""
+        with self._cond:
+            running = [self._running] if self._running is not None else []
+            for job in (*running, *(entry[3] for entry in self._heap), *self._recent):
+                if job.id == job_id:
+                    return job
+        return None
+
+    def describe(self) -> Dict[str, Any]:
+        with self._cond:
+            queued = [job for *_, job in sorted(self._heap) if job.status == "queued"]
+            running = self._running
+            recent = list(self._recent)
+        completed = self.outcomes["done"]
+        return {
+            "running": running.describe() if running is not None else None,
+            "queued": [job.describe() for job in queued],
+            "recent": [job.describe() for job in reversed(recent)],
+            "outcomes": dict(self.outcomes),
+            "syringe_ml": self.syringe.remaining_ml,
+            "mean_wait_seconds": round(self.wait_seconds / completed, 3) if completed else None,
+            "mean_run_seconds": round(self.run_seconds / completed, 3) if completed else None,
+        }
+
+    def _finish(self, job: DoseJob, status: str) -> None:
+        job.status = status
+        job.finished = time.time()
+        self.outcomes[status] += 1
+        self._recent.append(job)
+        if status == "done" and job.started is not None:
+            self.wait_seconds += job.started - job.submitted
+            self.run_seconds += job.finished - job.started
+        job._done.set()
+        if job.on_done is not None:
+            try:
+                job.on_done(job)
+            except Exception:
+                logger.exception("Dose completion callback failed")
+        if self.notify is not None:
+            self.notify()
+
+    def _next_job(self) -> Optional[DoseJob]:
+        with self._cond:
+            while True:
+                while not self._heap and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return None
+                job = heapq.heappop(self._heap)[3]
+                if job.status != "queued":
+                    continue
+                if job.deadline is not None and time.time() > job.deadline:
+                    self._finish(job, "expired")
+                    continue
+                job.status = "running"
+                if job.started is None:
+                    job.started = time.time()
+                self._running = job
+                self._stop.clear()
+                self._stop_reason = ""
+                return job
+
+    def _select(self, channel: str) -> None:
+        for relay in self._valves:
+            self.relays.set_state(relay, relay == channel)
+
+    def _run(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            error: Optional[str] = None
+            try:
+                self._select(job.channel)
+                job.delivered_ml += self.syringe.dispense_ml(
+                    job.remaining_ml,
+                    direction_up=False,
+                    channel=job.channel,
+                    stop=self._stop,
+                    valve=self._select,
+                )
+            except Exception as exc:
+                logger.exception("Dose failed", extra={"channel": job.channel, "job": job.id})
+                error = str(exc)
+            finally:
+                self._select("")
+            # Less than one step short is just rounding to whole steps.
+            if error is None and not self._stop.is_set() and job.remaining_ml * self.syringe.cfg.steps_per_ml >= 1:
+                error = f"delivered {job.delivered_ml:.3f} of {job.ml:.3f} ml"
+                logger.warning("Dose short", extra={"channel": job.channel, "job": job.id, "error": error})
+            with self._cond:
+                self._running = None
+                if error is not None:
+                    job.error = error
+                    self._finish(job, "failed")
+                elif self._stop.is_set() and self._stop_reason == "preempt" and job.remaining_ml > 1e-6:
+                    job.status = "queued"
+                    job.preemptions += 1
+                    self.outcomes["preempted"] += 1
+                    self._push(job)
+                elif self._stop.is_set() and self._stop_reason == "cancel":
+                    self._finish(job, "cancelled")
+                else:
+                    self._finish(job, "done")
+                    logger.info(
+                        "Dose complete",
+                        extra={"channel": job.channel, "job": job.id, "ml": round(job.delivered_ml, 3)},
+                    )
+
+    def close(self) -> None:
+        self.cancel_all()
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5.0)
@@ -1,9 +1,12 @@
 from __future__ import annotations
 
-from typing import Any
+from functools import lru_cache
+from typing import Any, Callable, Optional
 
 
+@lru_cache(maxsize=None)
 def get_gpio() -> Any:
+    # One backend per process so every zone and driver shares pin state (and the mock's).
     try:
         import RPi.GPIO as GPIO  # type: ignore
 
@@ -18,9 +21,13 @@ def get_gpio() -> Any:
             OUT = "OUT"
             IN = "IN"
             PUD_UP = "PUD_UP"
+            RISING = "RISING"
+            FALLING = "FALLING"
+            BOTH = "BOTH"
 
             def __init__(self) -> None:
                 self._pins: dict[int, bool] = {}
+                self._events: dict[int, tuple[str, Optional[Callable[[int], None]]]] = {}
 
             def setmode(self, *_args, **_kwargs) -> None:
                 return
@@ -28,17 +35,43 @@ def get_gpio() -> Any:
             def setwarnings(self, *_args, **_kwargs) -> None:
                 return
 
-            def setup(self, pin: int, *_args, **_kwargs) -> None:
-                self._pins.setdefault(pin, False)
+            def setup(self, pin: int, mode: str = OUT, *_args, **_kwargs) -> None:
+                # Inputs idle high, like a released switch on a pull-up; outputs start low.
+                self._pins.setdefault(pin, mode == self.IN)
 
             def output(self, pin: int, value: bool) -> None:
                 self._pins[pin] = bool(value)
 
             def input(self, pin: int) -> bool:
-                return self._pins.get(pin, False)
+                return self._pins.get(pin, True)
+
+            def add_event_detect(
+                self,
+                pin: int,
+                edge: str,
+                callback: Optional[Callable[[int], None]] = None,
+                bouncetime: Optional[int] = None,
+            ) -> None:
+                if pin in self._events:
+                    raise RuntimeError("Conflicting edge detection already enabled for this GPIO channel")
+                self._events[pin] = (edge, callback)
+
+            def remove_event_detect(self, pin: int) -> None:
+                self._events.pop(pin, None)
+
+            def set_input(self, pin: int, value: bool) -> None:
+                """Drive an input level from a test; a matching edge runs the callback, as on the Pi."""
+                old, value = self._pins.get(pin, True), bool(value)
+                self._pins[pin] = value
+                edge, callback = self._events.get(pin, (None, None))
+                if callback is None or old == value:
+                    return
+                if edge == self.BOTH or edge == (self.RISING if value else self.FALLING):
+                    callback(pin)
 
             def cleanup(self) -> None:
                 self._pins.clear()
+                self._events.clear()
 
             class PWM:
                 def __init__(self, pin: int, frequency: int) -> None:
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import threading
+from typing import Any, Dict, Optional
+
+
+_smbus: Dict[int, Any] = {}
+_locks: Dict[int, threading.Lock] = {}
+_busio_i2c: Optional[Any] = None
+_registry_lock = threading.Lock()
+
+
+def get_smbus(bus: int = 1) -> Optional[Any]:
+    """Return the process-wide SMBus handle for `bus`, shared by every zone."""
+    try:
+        from smbus2 import SMBus  # type: ignore
+    except ImportError:  # pragma: no cover
+        return None
+    with _registry_lock:
+        handle = _smbus.get(bus)
+        if handle is None:
+            handle = _smbus[bus] = SMBus(bus)
+        return handle
+
+
+def bus_lock(bus: int = 1) -> threading.Lock:
+    with _registry_lock:
+        return _locks.setdefault(bus, threading.Lock())
+
+
+def get_busio_i2c() -> Optional[Any]:
+    """Return the shared CircuitPython I2C object used by ADS1115 readers."""
+    global _busio_i2c
+    try:
+        import board  # type: ignore
+        import busio  # type: ignore
+    except ImportError:  # pragma: no cover
+        return None
+    with _registry_lock:
+        if _busio_i2c is None:
+            _busio_i2c = busio.I2C(board.SCL, board.SDA)
+        return _busio_i2c
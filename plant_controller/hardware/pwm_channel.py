@@ -16,15 +16,24 @@ class PWMChannel:
             self.gpio.setup(self.dir_pin, self.gpio.OUT)
         self._pwm = self.gpio.PWM(self.pwm_pin, self.frequency)
         self._pwm.start(0.0)
+        self.duty_cycle = 0.0
+        self.forward = True
 
     def set_output(self, duty_cycle: float, forward: bool = True) -> None:
         duty_cycle = max(0.0, min(100.0, duty_cycle))
         if self.dir_pin is not None:
             self.gpio.output(self.dir_pin, bool(forward))
         self._pwm.ChangeDutyCycle(duty_cycle)
+        self.duty_cycle = duty_cycle
+        self.forward = bool(forward)
+
+    @property
+    def signed_output(self) -> float:
+        return self.duty_cycle if self.forward else -self.duty_cycle
 
     def stop(self) -> None:
         self._pwm.stop()
+        self.duty_cycle = 0.0
         if self.dir_pin is not None:
             self.gpio.output(self.dir_pin, False)
 
@@ -1,15 +1,12 @@
 from __future__ import annotations
 
+import threading
 from dataclasses import dataclass
-from typing import Dict, Optional
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional
 
 from .gpio import get_gpio
-
-
-try:
-    from smbus2 import SMBus  # type: ignore
-except ImportError:  # pragma: no cover
-    SMBus = None  # type: ignore
+from .i2c_bus import bus_lock, get_smbus
 
 
 @dataclass
@@ -22,17 +19,21 @@ class PCF8574Driver:
     def __init__(self, config: PCF8574Config) -> None:
         self.config = config
         self._state = 0xFF
-        self._bus: Optional[SMBus] = SMBus(config.bus) if SMBus else None
+        self._bus = get_smbus(config.bus)
+        self._bus_lock = bus_lock(config.bus)
+        self._write()
+
+    def _write(self) -> None:
         if self._bus:
-            self._bus.write_byte(self.config.address, self._state)
+            with self._bus_lock:
+                self._bus.write_byte(self.config.address, self._state)
 
     def write_pin(self, pin: int, value: bool) -> None:
         if value:
             self._state |= 1 << pin
         else:
             self._state &= ~(1 << pin)
-        if self._bus:
-            self._bus.write_byte(self.config.address, self._state)
+        self._write()
 
 
 class RelayManager:
@@ -41,32 +42,50 @@ class RelayManager:
         expander_pins: Dict[str, int],
         direct_pins: Dict[str, int],
         expander_address: Optional[int] = None,
+        expander_bus: int = 1,
     ) -> None:
         self.gpio = get_gpio()
         self.direct_map = direct_pins
         self.expander_map = expander_pins
         self.expander = (
-            PCF8574Driver(PCF8574Config(expander_address)) if expander_address else None
+            PCF8574Driver(PCF8574Config(expander_address, expander_bus)) if expander_address else None
         )
         for name, pin in self.direct_map.items():
             self.gpio.setup(pin, self.gpio.OUT)
             self.gpio.output(pin, False)
         self._states: Dict[str, bool] = {name: False for name in self.names}
+        self._lock = threading.Lock()
+        self._states_view: Mapping[str, bool] = MappingProxyType(self._states)
+        self._bits: Dict[str, int] = {name: 1 << index for index, name in enumerate(self._states)}
+        self._mask = 0
 
     @property
     def names(self) -> Dict[str, int]:
         return {**self.expander_map, **self.direct_map}
 
     def set_state(self, name: str, enabled: bool) -> None:
-        self._states[name] = enabled
-        if name in self.expander_map and self.expander:
-            self.expander.write_pin(self.expander_map[name], not enabled)
-        elif name in self.direct_map:
-            self.gpio.output(self.direct_map[name], enabled)
+        # Emergency stop writes from the gateway thread, so guard the shared expander byte.
+        with self._lock:
+            self._states[name] = enabled
+            bit = self._bits.get(name, 0)
+            self._mask = self._mask | bit if enabled else self._mask & ~bit
+            if name in self.expander_map and self.expander:
+                self.expander.write_pin(self.expander_map[name], not enabled)
+            elif name in self.direct_map:
+                self.gpio.output(self.direct_map[name], enabled)
 
     def get_state(self, name: str) -> bool:
         return self._states.get(name, False)
 
+    @property
+    def states(self) -> Mapping[str, bool]:
+        return self._states_view
+
+    @property
+    def bitmask(self) -> int:
+        # Bit order follows `names`, the same order used for history records.
+        return self._mask
+
     def all_states(self) -> Dict[str, bool]:
         return dict(self._states)
 
@@ -10,6 +10,7 @@ class ServoDriver:
         self.gpio = get_gpio()
         self.frequency = frequency
         self._pwm_channels: Dict[str, object] = {}
+        self.angles: Dict[str, float] = {}
         for name, pin in servo_pins.items():
             self.gpio.setup(pin, self.gpio.OUT)
             pwm = self.gpio.PWM(pin, self.frequency)
@@ -27,6 +28,7 @@ class ServoDriver:
             raise KeyError(f"Unknown servo {name}")
         duty_cycle = self._angle_to_duty(angle)
         self._pwm_channels[name].ChangeDutyCycle(duty_cycle)
+        self.angles[name] = max(0.0, min(180.0, angle))
 
     def stop_all(self) -> None:
         for pwm in self._pwm_channels.values():
@@ -1,11 +1,21 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
+from collections import Counter
 from dataclasses import dataclass
+from typing import Callable, Optional
 
 from .gpio import get_gpio
 
 
+logger = logging.getLogger(__name__)
+
+# Debounce for the limit switch edge callbacks.
+LIMIT_BOUNCE_MS = 5
+
+
 @dataclass
 class SyringeConfig:
     step_pin: int
@@ -15,9 +25,21 @@ class SyringeConfig:
     limit_bottom: int
     steps_per_ml: int = 200
     step_delay: float = 0.002
+    # Volume between the two limit switches.
+    capacity_ml: float = 10.0
+    # Valve opened while the barrel is drawn back up; None disables automatic refills.
+    refill_channel: Optional[str] = None
 
 
 class SyringeDriver:
+    """Stepper-driven syringe with a step-counted plunger position.
+
+    `position` is in steps above the bottom limit switch and is None until
+    either switch has been reached. Dispensing moves the plunger down. A dose
+    larger than what is left in the barrel is delivered in parts, with the
+    barrel refilled (drawn up to the top switch) in between.
+    """
+
     def __init__(self, config: SyringeConfig) -> None:
         self.cfg = config
         self.gpio = get_gpio()
@@ -25,33 +47,184 @@ class SyringeDriver:
             self.gpio.setup(pin, self.gpio.OUT)
         for pin in (config.limit_top, config.limit_bottom):
             self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+        # Set from the edge callback when the switch the plunger is heading for closes.
+        self._limit_abort = False
+        # Whether the last move ended on the switch it was heading for.
+        self._reached_limit = False
+        self._watch_pin = config.limit_bottom
+        self._edges = self._watch_limits()
+        self.steps_moved = 0
+        self.position: Optional[int] = None
+        self.refills = 0
+        self.dose_counts: Counter = Counter()
+        self.dosed_ml: Counter = Counter()
         self.disable()
 
+    @property
+    def travel_steps(self) -> int:
+        return int(self.cfg.capacity_ml * self.cfg.steps_per_ml)
+
+    @property
+    def remaining_ml(self) -> Optional[float]:
+        """Liquid left in the barrel, or None before homing."""
+        if self.position is None:
+            return None
+        return self.position / self.cfg.steps_per_ml
+
     def enable(self) -> None:
         self.gpio.output(self.cfg.enable_pin, False)
 
     def disable(self) -> None:
         self.gpio.output(self.cfg.enable_pin, True)
 
+    def _watch_limits(self) -> bool:
+        watched = []
+        try:
+            for pin in (self.cfg.limit_top, self.cfg.limit_bottom):
+                # The switches pull the input low when closed, so closing is a falling edge.
+                self.gpio.add_event_detect(pin, self.gpio.FALLING, callback=self._on_limit, bouncetime=LIMIT_BOUNCE_MS)
+                watched.append(pin)
+        except (AttributeError, RuntimeError) as exc:
+            logger.warning("Limit switch edge detection unavailable, polling every step: %s", exc)
+            for pin in watched:
+                self.gpio.remove_event_detect(pin)
+            return False
+        return True
+
+    def _on_limit(self, pin: int) -> None:
+        # Runs on the GPIO library's event thread; only the switch in the direction of travel aborts.
+        if pin == self._watch_pin:
+            self._limit_abort = True
+
     def _limit_triggered(self, top: bool) -> bool:
         pin = self.cfg.limit_top if top else self.cfg.limit_bottom
         return not bool(self.gpio.input(pin))
 
-    def move_steps(self, steps: int, direction_up: bool) -> None:
+    def move_steps(self, steps: int, direction_up: bool, stop: Optional[threading.Event] = None) -> int:
         self.enable()
         self.gpio.output(self.cfg.dir_pin, direction_up)
+        self._watch_pin = self.cfg.limit_top if direction_up else self.cfg.limit_bottom
+        self._limit_abort = False
+        # One level read covers a switch that is already closed (no edge will come) or closed
+        # while the flag was being reset; after that the edge callback takes over.
+        if self._limit_triggered(direction_up):
+            self._limit_abort = True
+        poll = not self._edges
+        moved = 0
+        at_limit = False
         for _ in range(abs(steps)):
-            if direction_up and self._limit_triggered(True):
+            # Checked between steps so a preempted or cancelled dose stops within one step.
+            if stop is not None and stop.is_set():
                 break
-            if not direction_up and self._limit_triggered(False):
+            if self._limit_abort or (poll and self._limit_triggered(direction_up)):
+                at_limit = True
                 break
             self.gpio.output(self.cfg.step_pin, True)
             time.sleep(self.cfg.step_delay)
             self.gpio.output(self.cfg.step_pin, False)
             time.sleep(self.cfg.step_delay)
+            moved += 1
+        self._reached_limit = at_limit
+        if at_limit:
+            # Either switch is an absolute reference, so reaching one also corrects any drift in the count.
+            self.position = self.travel_steps if direction_up else 0
+        elif self.position is not None:
+            self.position += moved if direction_up else -moved
+            self.position = min(max(self.position, 0), self.travel_steps)
+        self.disable()
+        self.steps_moved += moved
+        return moved
+
+    def close(self) -> None:
+        if self._edges:
+            for pin in (self.cfg.limit_top, self.cfg.limit_bottom):
+                self.gpio.remove_event_detect(pin)
+            self._edges = False
         self.disable()
 
-    def dispense_ml(self, ml: float, direction_up: bool = False) -> None:
+    def home(self, stop: Optional[threading.Event] = None) -> None:
+        """Draw the plunger up until the top switch trips, which fills the barrel."""
+        self.position = None
+        # A margin beyond the nominal travel covers a plunger that starts below the bottom switch.
+        self.move_steps(self.travel_steps + self.cfg.steps_per_ml, True, stop)
+        if self.position is None and not (stop is not None and stop.is_set()):
+            raise RuntimeError("Syringe top limit switch not reached while homing")
+
+    def refill(self, stop: Optional[threading.Event] = None) -> None:
+        """Draw the plunger up to the top switch; only a refill that reaches it is counted."""
+        if self.position is None:
+            self.home(stop)
+        else:
+            # The margin lets the switch, not the step count, end the refill.
+            self.move_steps(self.travel_steps - self.position + self.cfg.steps_per_ml, True, stop)
+        if not self._reached_limit:
+            if stop is not None and stop.is_set():
+                return
+            self.position = None
+            raise RuntimeError("Syringe top limit switch not reached while refilling")
+        self.refills += 1
+
+    def dispense_ml(
+        self,
+        ml: float,
+        direction_up: bool = False,
+        channel: str = "manual",
+        stop: Optional[threading.Event] = None,
+        valve: Optional[Callable[[str], None]] = None,
+    ) -> float:
+        """Move `ml` through `channel` and return the volume actually delivered.
+
+        Dispensing (down) refills the barrel whenever it runs empty, calling
+        `valve` with ``refill_channel`` before the refill and with `channel`
+        after it. Without a ``refill_channel`` there is nothing to draw from,
+        so delivery ends when the barrel is empty; a barrel loaded by hand is
+        only trusted when the plunger sits on the top switch. Delivery also
+        ends early on `stop` or a plunger that does not move after a refill.
+        """
         steps = int(ml * self.cfg.steps_per_ml)
-        self.move_steps(steps, direction_up)
+        if direction_up:
+            moved = self.move_steps(steps, True, stop)
+        else:
+            moved = 0
+            refilled = False
+            while moved < steps and not (stop is not None and stop.is_set()):
+                if self.position:
+                    step = self.move_steps(min(steps - moved, self.position), False, stop)
+                    moved += step
+                    refilled = refilled and step == 0
+                    continue
+                if self.cfg.refill_channel is None:
+                    if self.position is None and self._limit_triggered(True):
+                        # Not homed yet, but the plunger is on the top switch: a full, hand-loaded barrel.
+                        self.position = self.travel_steps
+                        continue
+                    logger.warning(
+                        "Syringe empty and no refill_channel set; dose cut short",
+                        extra={"channel": channel, "ml": round(moved / self.cfg.steps_per_ml, 3)},
+                    )
+                    break
+                if refilled:
+                    # Empty again straight after a refill without moving: the plunger or a switch is stuck.
+                    logger.warning("Syringe did not move after a refill", extra={"channel": channel})
+                    break
+                self._refill_for(channel, stop, valve)
+                refilled = True
+        delivered = moved / self.cfg.steps_per_ml
+        self.dose_counts[channel] += 1
+        self.dosed_ml[channel] += delivered
+        return delivered
+
+    def _refill_for(
+        self,
+        channel: str,
+        stop: Optional[threading.Event],
+        valve: Optional[Callable[[str], None]],
+    ) -> None:
+        if valve is not None:
+            valve(self.cfg.refill_channel)
+        try:
+            self.refill(stop)
+        finally:
+            if valve is not None:
+                valve(channel)
 
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from typing import List, Sequence, Tuple
+
+
+Point = Tuple[float, float]
+
+
+def lttb(points: Sequence[Point], max_points: int) -> List[Point]:
+    """Largest-triangle-three-buckets downsampling; keeps first and last points.
+
+    A budget of one keeps only the last (most recent) point.
+    """
+    count = len(points)
+    if max_points >= count:
+        return list(points)
+    if max_points <= 0:
+        return []
+    if max_points == 1:
+        return [points[-1]]
+    if max_points == 2:
+        return [points[0], points[-1]]
+    sampled = [points[0]]
+    every = (count - 2) / (max_points - 2)
+    anchor = 0
+    for index in range(max_points - 2):
+        start = int(index * every) + 1
+        end = int((index + 1) * every) + 1
+        next_end = min(int((index + 2) * every) + 1, count)
+        next_bucket = points[end:next_end] or points[-1:]
+        avg_t = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_v = sum(p[1] for p in next_bucket) / len(next_bucket)
+        at, av = points[anchor]
+        best_area = -1.0
+        best = start
+        for candidate in range(start, end):
+            ct, cv = points[candidate]
+            area = abs((at - avg_t) * (cv - av) - (at - ct) * (avg_v - av))
+            if area > best_area:
+                best_area = area
+                best = candidate
+        sampled.append(points[best])
+        anchor = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def min_max(points: Sequence[Point], max_points: int) -> List[Point]:
+    """Keep the minimum and maximum of each bucket, in time order."""
+    count = len(points)
+    buckets = max_points // 2
+    if count <= max_points or buckets < 1:
+        return list(points)
+    sampled: List[Point] = []
+    every = count / buckets
+    for index in range(buckets):
+        chunk = points[int(index * every) : int((index + 1) * every)]
+        if not chunk:
+            continue
+        low = min(chunk, key=lambda p: p[1])
+        high = max(chunk, key=lambda p: p[1])
+        sampled.extend((low, high) if low[0] <= high[0] else (high, low))
+    return sampled
+
+
+DECIMATORS = {"lttb": lttb, "min_max": min_max}
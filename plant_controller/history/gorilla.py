@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import bisect
+import json
+import math
+import os
+import pathlib
+import struct
+from dataclasses import dataclass
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+MAGIC = b"PCGOR001"
+_FOOTER = struct.Struct("<IQ8s")
+_INDEX = struct.Struct("<ddIQI")
+_DOUBLE = struct.Struct("<d")
+_UINT64 = struct.Struct("<Q")
+# Delta-of-delta buckets for microsecond timestamps: (prefix, prefix bits, value bits).
+_DOD_BUCKETS = ((0b10, 2, 7), (0b110, 3, 12), (0b1110, 4, 20))
+
+
+def _float_bits(value: float) -> int:
+    return _UINT64.unpack(_DOUBLE.pack(value))[0]
+
+
+def _bits_float(bits: int) -> float:
+    return _DOUBLE.unpack(_UINT64.pack(bits))[0]
+
+
+class BitWriter:
+    def __init__(self) -> None:
+        self._out = bytearray()
+        self._acc = 0
+        self._nbits = 0
+
+    def write(self, value: int, nbits: int) -> None:
+        self._acc = (self._acc << nbits) | (value & ((1 << nbits) - 1))
+        self._nbits += nbits
+        while self._nbits >= 8:
+            self._nbits -= 8
+            self._out.append((self._acc >> self._nbits) & 0xFF)
+        self._acc &= (1 << self._nbits) - 1
+
+    def getvalue(self) -> bytes:
+        if self._nbits:
+            return bytes(self._out) + bytes([(self._acc << (8 - self._nbits)) & 0xFF])
+        return bytes(self._out)
+
+
+class BitReader:
+    def __init__(self, data: bytes) -> None:
+        self._data = data
+        self._pos = 0
+
+    def read(self, nbits: int) -> int:
+        start = self._pos >> 3
+        end = (self._pos + nbits + 7) >> 3
+        chunk = int.from_bytes(self._data[start:end], "big")
+        shift = (end << 3) - self._pos - nbits
+        self._pos += nbits
+        return (chunk >> shift) & ((1 << nbits) - 1)
+
+    def read_bit(self) -> int:
+        byte = self._data[self._pos >> 3]
+        bit = (byte >> (7 - (self._pos & 7))) & 1
+        self._pos += 1
+        return bit
+
+
+class _FloatEncoder:
+    def __init__(self) -> None:
+        self.prev: Optional[int] = None
+        self.leading = -1
+        self.trailing = 0
+
+    def encode(self, out: BitWriter, value: float) -> None:
+        bits = _float_bits(value)
+        if self.prev is None:
+            out.write(bits, 64)
+            self.prev = bits
+            return
+        xor = bits ^ self.prev
+        self.prev = bits
+        if xor == 0:
+            out.write(0, 1)
+            return
+        leading = min(64 - xor.bit_length(), 31)
+        trailing = (xor & -xor).bit_length() - 1
+        if self.leading >= 0 and leading >= self.leading and trailing >= self.trailing:
+            # Reuse the previous window of meaningful bits.
+            out.write(0b10, 2)
+            out.write(xor >> self.trailing, 64 - self.leading - self.trailing)
+            return
+        meaningful = 64 - leading - trailing
+        out.write(0b11, 2)
+        out.write(leading, 5)
+        out.write(meaningful - 1, 6)
+        out.write(xor >> trailing, meaningful)
+        self.leading = leading
+        self.trailing = trailing
+
+
+class _FloatDecoder:
+    def __init__(self) -> None:
+        self.prev: Optional[int] = None
+        self.leading = 0
+        self.trailing = 0
+
+    def decode(self, reader: BitReader) -> float:
+        if self.prev is None:
+            self.prev = reader.read(64)
+            return _bits_float(self.prev)
+        if not reader.read_bit():
+            return _bits_float(self.prev)
+        if reader.read_bit():
+            self.leading = reader.read(5)
+            meaningful = reader.read(6) + 1
+            self.trailing = 64 - self.leading - meaningful
+        xor = reader.read(64 - self.leading - self.trailing) << self.trailing
+        self.prev ^= xor
+        return _bits_float(self.prev)
+
+
+def _signed(value: int, nbits: int) -> int:
+    return value - (1 << nbits) if value >= 1 << (nbits - 1) else value
+
+
+def encode_block(records: Sequence[Tuple], columns: int, relays: int) -> bytes:
+    """Encode ``(timestamp, relay_mask, *values)`` rows into one Gorilla bit stream."""
+    out = BitWriter()
+    floats = [_FloatEncoder() for _ in range(columns)]
+    prev_us = prev_delta = 0
+    prev_mask: Optional[int] = None
+    for index, record in enumerate(records):
+        ts_us = int(round(record[0] * 1_000_000))
+        if index == 0:
+            out.write(ts_us, 64)
+        elif index == 1:
+            prev_delta = ts_us - prev_us
+            out.write(prev_delta, 64)
+        else:
+            delta = ts_us - prev_us
+            dod = delta - prev_delta
+            prev_delta = delta
+            if dod == 0:
+                out.write(0, 1)
+            else:
+                for prefix, prefix_bits, value_bits in _DOD_BUCKETS:
+                    limit = 1 << (value_bits - 1)
+                    if -limit <= dod < limit:
+                        out.write(prefix, prefix_bits)
+                        out.write(dod, value_bits)
+                        break
+                else:
+                    out.write(0b1111, 4)
+                    out.write(dod, 64)
+        prev_us = ts_us
+        mask = int(record[1])
+        if mask == prev_mask:
+            out.write(0, 1)
+        else:
+            out.write(1, 1)
+            out.write(mask, relays)
+            prev_mask = mask
+        for encoder, value in zip(floats, record[2:]):
+            encoder.encode(out, math.nan if value is None else float(value))
+    return out.getvalue()
+
+
+def decode_block(data: bytes, count: int, columns: int, relays: int) -> Iterator[Tuple]:
+    reader = BitReader(data)
+    floats = [_FloatDecoder() for _ in range(columns)]
+    ts_us = delta = mask = 0
+    for index in range(count):
+        if index == 0:
+            ts_us = reader.read(64)
+        elif index == 1:
+            delta = _signed(reader.read(64), 64)
+            ts_us += delta
+        else:
+            if reader.read_bit():
+                value_bits = 64
+                for _, _, bucket_bits in _DOD_BUCKETS:
+                    if not reader.read_bit():
+                        value_bits = bucket_bits
+                        break
+                delta += _signed(reader.read(value_bits), value_bits)
+            ts_us += delta
+        if reader.read_bit():
+            mask = reader.read(relays)
+        yield (ts_us / 1_000_000, mask, *(decoder.decode(reader) for decoder in floats))
+
+
+@dataclass
+class BlockIndex:
+    start: float
+    end: float
+    count: int
+    offset: int
+    length: int
+
+
+def write_archive(
+    path: str | pathlib.Path,
+    columns: Sequence[str],
+    relay_names: Sequence[str],
+    records: Iterable[Tuple],
+    block_size: int = 3600,
+) -> int:
+    """Write rows to a compressed archive file and return its size in bytes."""
+    path = pathlib.Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    header = json.dumps({"columns": list(columns), "relays": list(relay_names)}).encode("utf-8")
+    relays = max(len(relay_names), 1)
+    index: List[BlockIndex] = []
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with tmp_path.open("wb") as handle:
+        handle.write(MAGIC)
+        handle.write(struct.pack("<I", len(header)))
+        handle.write(header)
+        block: List[Tuple] = []
+
+        def flush_block() -> None:
+            data = encode_block(block, len(columns), relays)
+            index.append(BlockIndex(block[0][0], block[-1][0], len(block), handle.tell(), len(data)))
+            handle.write(data)
+            block.clear()
+
+        for record in records:
+            block.append(record)
+            if len(block) >= block_size:
+                flush_block()
+        if block:
+            flush_block()
+        index_offset = handle.tell()
+        for entry in index:
+            handle.write(_INDEX.pack(entry.start, entry.end, entry.count, entry.offset, entry.length))
+        handle.write(_FOOTER.pack(len(index), index_offset, MAGIC))
+        size = handle.tell()
+    os.replace(tmp_path, path)
+    return size
+
+
+class ArchiveReader:
+    def __init__(self, path: str | pathlib.Path) -> None:
+        self.path = pathlib.Path(path)
+        with self.path.open("rb") as handle:
+            if handle.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"Not a history archive: {self.path}")
+            header_len = struct.unpack("<I", handle.read(4))[0]
+            header = json.loads(handle.read(header_len))
+            handle.seek(-_FOOTER.size, os.SEEK_END)
+            blocks, index_offset, magic = _FOOTER.unpack(handle.read(_FOOTER.size))
+            if magic != MAGIC:
+                raise ValueError(f"History archive {self.path} is incomplete")
+            handle.seek(index_offset)
+            raw_index = handle.read(blocks * _INDEX.size)
+        self.columns: List[str] = header["columns"]
+        self.relay_names: List[str] = header["relays"]
+        self.blocks = [BlockIndex(*entry) for entry in _INDEX.iter_unpack(raw_index)]
+        self._block_ends = [block.end for block in self.blocks]
+
+    def __len__(self) -> int:
+        return sum(block.count for block in self.blocks)
+
+    def iter_records(self, start: Optional[float] = None, end: Optional[float] = None) -> Iterator[Tuple]:
+        """Stream records in ``[start, end]``, decoding only the blocks that overlap it."""
+        first = 0 if start is None else bisect.bisect_left(self._block_ends, start)
+        relays = max(len(self.relay_names), 1)
+        with self.path.open("rb") as handle:
+            for block in self.blocks[first:]:
+                if end is not None and block.start > end:
+                    return
+                handle.seek(block.offset)
+                data = handle.read(block.length)
+                for record in decode_block(data, block.count, len(self.columns), relays):
+                    if start is not None and record[0] < start:
+                        continue
+                    if end is not None and record[0] > end:
+                        return
+                    yield record
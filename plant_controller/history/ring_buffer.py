@@ -0,0 +1,173 @@
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import pathlib
+import struct
+import sys
+from array import array
+from typing import Iterator, Optional, Sequence, Tuple
+
+
+MAGIC = b"PCRING01"
+HEADER_SIZE = 4096
+# magic, record size, capacity, records written, schema length
+_HEADER = struct.Struct("<8sIQQI")
+_COUNT_OFFSET = 8 + 4 + 8
+# timestamp, relay bitmask; the float64 columns follow
+_RECORD_HEAD = struct.Struct("<dQ")
+_RAW_DOUBLES = sys.byteorder == "little"
+
+
+class RingBufferStore:
+    """Fixed-record time-series ring stored in a memory-mapped file.
+
+    Each record is ``timestamp, relay bitmask, *columns`` packed as little-endian
+    doubles (bitmask as uint64). Missing readings are stored as NaN.
+    """
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        columns: Sequence[str],
+        relay_names: Sequence[str] = (),
+        capacity: int = 604800,
+        readonly: bool = False,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.columns = list(columns)
+        self.relay_names = list(relay_names)
+        self.readonly = readonly
+        self._record = struct.Struct(f"<dQ{len(self.columns)}d")
+        schema = json.dumps({"columns": self.columns, "relays": self.relay_names}).encode("utf-8")
+        if _HEADER.size + len(schema) > HEADER_SIZE:
+            raise ValueError("History schema does not fit in the ring header")
+        if self.path.exists():
+            self._open_existing(schema)
+        elif readonly:
+            raise FileNotFoundError(f"History ring not found: {self.path}")
+        else:
+            self.capacity = max(int(capacity), 1)
+            self._create(schema)
+        self._count = self._read_count()
+
+    @classmethod
+    def open_reader(cls, path: str | pathlib.Path) -> "RingBufferStore":
+        with pathlib.Path(path).open("rb") as handle:
+            header = handle.read(HEADER_SIZE)
+        magic, _, capacity, _, schema_len = _HEADER.unpack_from(header)
+        if magic != MAGIC:
+            raise ValueError(f"Not a history ring file: {path}")
+        schema = json.loads(header[_HEADER.size : _HEADER.size + schema_len])
+        return cls(path, schema["columns"], schema["relays"], capacity, readonly=True)
+
+    def _create(self, schema: bytes) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        size = HEADER_SIZE + self.capacity * self._record.size
+        with self.path.open("wb") as handle:
+            handle.truncate(size)
+        self._map(size)
+        _HEADER.pack_into(self._mm, 0, MAGIC, self._record.size, self.capacity, 0, len(schema))
+        self._mm[_HEADER.size : _HEADER.size + len(schema)] = schema
+        self._mm.flush()
+
+    def _open_existing(self, schema: bytes) -> None:
+        size = os.path.getsize(self.path)
+        self._map(size)
+        magic, record_size, capacity, _, schema_len = _HEADER.unpack_from(self._mm, 0)
+        stored_schema = bytes(self._mm[_HEADER.size : _HEADER.size + schema_len])
+        if magic != MAGIC or record_size != self._record.size or stored_schema != schema:
+            self.close()
+            raise ValueError(f"History ring {self.path} was written with a different layout")
+        if size != HEADER_SIZE + capacity * record_size:
+            self.close()
+            raise ValueError(f"History ring {self.path} is truncated")
+        self.capacity = capacity
+
+    def _map(self, size: int) -> None:
+        flags = os.O_RDONLY if self.readonly else os.O_RDWR
+        fd = os.open(self.path, flags)
+        try:
+            access = mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE
+            self._mm = mmap.mmap(fd, size, access=access)
+        finally:
+            os.close(fd)
+        self._view = memoryview(self._mm)
+
+    def _read_count(self) -> int:
+        return struct.unpack_from("<Q", self._mm, _COUNT_OFFSET)[0]
+
+    @property
+    def record_size(self) -> int:
+        return self._record.size
+
+    def __len__(self) -> int:
+        return min(self._read_count(), self.capacity)
+
+    def append(self, timestamp: float, relay_mask: int, values: Sequence[float], extra: Sequence[float] = ()) -> None:
+        """Write one record; its columns are `values` followed by `extra`.
+
+        A float64 ``array`` for `values` is copied into the slot as raw bytes.
+        """
+        if len(values) + len(extra) != len(self.columns):
+            raise ValueError(f"History record needs {len(self.columns)} columns, got {len(values) + len(extra)}")
+        count = self._count
+        offset = HEADER_SIZE + (count % self.capacity) * self._record.size
+        _RECORD_HEAD.pack_into(self._mm, offset, timestamp, relay_mask)
+        offset += _RECORD_HEAD.size
+        end = offset + 8 * len(values)
+        if _RAW_DOUBLES and isinstance(values, array) and values.typecode == "d":
+            self._view[offset:end] = memoryview(values).cast("B")
+        else:
+            struct.pack_into(f"<{len(values)}d", self._mm, offset, *values)
+        if extra:
+            struct.pack_into(f"<{len(extra)}d", self._mm, end, *extra)
+        # Publish the record only after its bytes are in place so readers never see a partial slot.
+        self._count = count + 1
+        struct.pack_into("<Q", self._mm, _COUNT_OFFSET, self._count)
+
+    def flush(self) -> None:
+        if not self.readonly:
+            self._mm.flush()
+
+    def _slot_view(self, slot: int, length: int) -> memoryview:
+        start = HEADER_SIZE + slot * self._record.size
+        return self._view[start : start + length * self._record.size]
+
+    def records(self, last: Optional[int] = None) -> Iterator[Tuple]:
+        """Yield records oldest to newest, unpacked straight from the mapped file."""
+        count = self._read_count()
+        available = min(count, self.capacity)
+        if count > self.capacity:
+            # The oldest slot may be overwritten by a concurrent writer; skip it.
+            available -= 1
+        if last is not None:
+            available = min(available, last)
+        if available <= 0:
+            return
+        first = (count - available) % self.capacity
+        tail = min(available, self.capacity - first)
+        yield from self._record.iter_unpack(self._slot_view(first, tail))
+        if available > tail:
+            yield from self._record.iter_unpack(self._slot_view(0, available - tail))
+
+    def latest(self) -> Optional[Tuple]:
+        for record in self.records(last=1):
+            return record
+        return None
+
+    def column_index(self, name: str) -> int:
+        return self.columns.index(name) + 2
+
+    def close(self) -> None:
+        view = getattr(self, "_view", None)
+        if view is not None:
+            view.release()
+            self._view = None
+        mm = getattr(self, "_mm", None)
+        if mm is not None:
+            if not self.readonly:
+                mm.flush()
+            mm.close()
+            self._mm = None
@@ -0,0 +1,270 @@
+from __future__ import annotations
+
+import logging
+import math
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .decimate import DECIMATORS, Point
+from .gorilla import write_archive
+
+
+logger = logging.getLogger(__name__)
+
+
+ROLLUPS = (("rollup_1m", 60), ("rollup_1h", 3600))
+
+# Delay before retrying a failed archive write; doubles per failure up to the maximum.
+ARCHIVE_RETRY_SECONDS = 60.0
+ARCHIVE_RETRY_MAX_SECONDS = 3600.0
+
+# Rows kept in memory while the database cannot be written; older ones are dropped beyond this.
+MAX_PENDING_ROWS = 86400
+
+
+class SQLiteHistory:
+    """Batched SQLite history with incrementally maintained min/mean/max rollups."""
+
+    def __init__(
+        self,
+        path: str | pathlib.Path,
+        fields: Sequence[str],
+        batch_size: int = 60,
+        flush_interval: float = 60.0,
+        retention_days: float = 14.0,
+        rollup_retention_days: Optional[Dict[str, float]] = None,
+        archive_dir: Optional[str | pathlib.Path] = None,
+        relay_names: Sequence[str] = (),
+        segment_seconds: float = 86400.0,
+    ) -> None:
+        self.path = pathlib.Path(path)
+        self.fields = list(fields)
+        if len(set(self.fields)) != len(self.fields):
+            raise ValueError("History field names must be unique")
+        self.batch_size = max(int(batch_size), 1)
+        self.flush_interval = flush_interval
+        self.retention_s = retention_days * 86400.0
+        self.rollup_retention_s = {
+            table: days * 86400.0 for table, days in (rollup_retention_days or {"rollup_1m": 90.0}).items()
+        }
+        self.archive_dir = pathlib.Path(archive_dir) if archive_dir else None
+        self.relay_names = list(relay_names)
+        self.segment_s = segment_seconds
+        self._archived_until = 0.0
+        self._archiver: Optional[threading.Thread] = None
+        self._archive_backoff = ARCHIVE_RETRY_SECONDS
+        self._archive_retry_at = 0.0
+        self._pending: List[Tuple] = []
+        self._last_flush = time.monotonic()
+        self._retry_at = 0.0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._create_schema()
+        columns = ", ".join(["ts", "relays", *self.fields])
+        marks = ", ".join("?" for _ in range(len(self.fields) + 2))
+        self._insert_sql = f"INSERT OR REPLACE INTO samples ({columns}) VALUES ({marks})"
+
+    def _create_schema(self) -> None:
+        columns = "".join(f", {name} REAL" for name in self.fields)
+        with self._conn:
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS samples (ts REAL PRIMARY KEY, relays INTEGER{columns})"
+            )
+            existing = {row[1] for row in self._conn.execute("PRAGMA table_info(samples)")}
+            for name in self.fields:
+                if name not in existing:
+                    self._conn.execute(f"ALTER TABLE samples ADD COLUMN {name} REAL")
+            for table, _ in ROLLUPS:
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ("
+                    "bucket INTEGER NOT NULL, field TEXT NOT NULL, n INTEGER NOT NULL, "
+                    "total REAL NOT NULL, vmin REAL NOT NULL, vmax REAL NOT NULL, "
+                    "PRIMARY KEY (bucket, field)) WITHOUT ROWID"
+                )
+
+    def record(self, timestamp: float, relay_mask: int, values: Sequence[Optional[float]]) -> None:
+        self._pending.append((timestamp, relay_mask, *values))
+        now = time.monotonic()
+        if now < self._retry_at:
+            return
+        if len(self._pending) >= self.batch_size or now - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def _rollup_rows(self, width: int) -> List[Tuple]:
+        buckets: Dict[Tuple[int, str], List[float]] = {}
+        for row in self._pending:
+            bucket = int(row[0] // width) * width
+            for name, value in zip(self.fields, row[2:]):
+                if value is None or math.isnan(value):
+                    continue
+                agg = buckets.get((bucket, name))
+                if agg is None:
+                    buckets[(bucket, name)] = [1, value, value, value]
+                else:
+                    agg[0] += 1
+                    agg[1] += value
+                    agg[2] = min(agg[2], value)
+                    agg[3] = max(agg[3], value)
+        return [(bucket, name, *agg) for (bucket, name), agg in buckets.items()]
+
+    def _archive_segment(self, segment_end: float) -> None:
+        # Reading and encoding a day of samples takes a while on a Pi, so this runs on its own
+        # thread with its own connection; WAL lets it read while the control thread writes.
+        columns = ", ".join(["ts", "relays", *self.fields])
+        conn = None
+        try:
+            conn = sqlite3.connect(str(self.path))
+            first, last, count = conn.execute(
+                "SELECT MIN(ts), MAX(ts), COUNT(*) FROM samples WHERE ts < ?", (segment_end,)
+            ).fetchone()
+            if count:
+                name = f"samples-{int(first)}-{int(last)}.gor"
+                # The cursor streams rows into the encoder block by block instead of loading the day.
+                rows = conn.execute(f"SELECT {columns} FROM samples WHERE ts < ? ORDER BY ts", (segment_end,))
+                size = write_archive(self.archive_dir / name, self.fields, self.relay_names, rows)
+                logger.info("Archived %d history rows to %s", count, name, extra={"bytes": size})
+        except (OSError, sqlite3.Error):
+            logger.exception(
+                "Archiving history before %s failed; retrying in %.0f s", segment_end, self._archive_backoff
+            )
+            self._archive_retry_at = time.monotonic() + self._archive_backoff
+            self._archive_backoff = min(self._archive_backoff * 2.0, ARCHIVE_RETRY_MAX_SECONDS)
+            return
+        finally:
+            if conn is not None:
+                conn.close()
+        self._archive_backoff = ARCHIVE_RETRY_SECONDS
+        self._archived_until = segment_end
+
+    def _archive_expired(self, cutoff: float) -> None:
+        # Started after the batch is committed, so the archiver's connection sees every row.
+        segment_end = (cutoff // self.segment_s) * self.segment_s
+        idle = self._archiver is None or not self._archiver.is_alive()
+        if idle and segment_end > self._archived_until and time.monotonic() >= self._archive_retry_at:
+            self._archiver = threading.Thread(target=self._archive_segment, args=(segment_end,), daemon=True)
+            self._archiver.start()
+
+    def flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._pending:
+            return
+        newest = self._pending[-1][0]
+        expired = newest - self.retention_s
+        cutoff = expired
+        if self.archive_dir is not None:
+            # Raw rows are only deleted once a whole segment has been written to a compressed archive.
+            cutoff = min(cutoff, self._archived_until)
+        try:
+            with self._conn:
+                self._conn.executemany(self._insert_sql, self._pending)
+                for table, width in ROLLUPS:
+                    # Fold this batch into existing buckets instead of recomputing them from raw rows.
+                    self._conn.executemany(
+                        f"INSERT INTO {table} (bucket, field, n, total, vmin, vmax) VALUES (?, ?, ?, ?, ?, ?) "
+                        "ON CONFLICT (bucket, field) DO UPDATE SET "
+                        "n = n + excluded.n, total = total + excluded.total, "
+                        "vmin = MIN(vmin, excluded.vmin), vmax = MAX(vmax, excluded.vmax)",
+                        self._rollup_rows(width),
+                    )
+                self._conn.execute("DELETE FROM samples WHERE ts < ?", (cutoff,))
+                for table, retention in self.rollup_retention_s.items():
+                    self._conn.execute(f"DELETE FROM {table} WHERE bucket < ?", (newest - retention,))
+        except sqlite3.Error:
+            # Runs on the control thread: a locked or failing database must not stop the loop.
+            # The transaction rolled back, so the whole batch is retried after flush_interval.
+            logger.warning(
+                "Writing %d history rows failed; keeping them for the next flush",
+                len(self._pending),
+                exc_info=True,
+                extra={"_rate_limit": True},
+            )
+            self._retry_at = self._last_flush + self.flush_interval
+            if len(self._pending) > MAX_PENDING_ROWS:
+                del self._pending[: len(self._pending) - MAX_PENDING_ROWS]
+            return
+        self._retry_at = 0.0
+        self._pending.clear()
+        if self.archive_dir is not None:
+            self._archive_expired(expired)
+
+    def _choose_level(self, field: str, start: float, end: float, max_points: int) -> Tuple[str, int]:
+        # Finest level that holds the whole range within a row budget the decimator handles quickly.
+        budget = max(max_points * 4, 2000)
+        levels = [("samples", "ts", "raw", 0), *((table, "bucket", table, width) for table, width in ROLLUPS)]
+        oldest = {
+            level: self._conn.execute(f"SELECT MIN({column}) FROM {table}").fetchone()[0]
+            for table, column, level, _ in levels
+        }
+        coarsest, coarse_width = ROLLUPS[-1]
+        first = oldest[coarsest]
+        if first is None:
+            return "raw", 0
+        # A window reaching back before any data (the default 24 h on a young database) is
+        # clamped to the oldest stored bucket. Every flush writes all levels, so a level whose
+        # oldest row falls in that same bucket has not been pruned and holds everything stored.
+        start = max(start, first)
+        for table, column, level, width in levels:
+            if oldest[level] is None or (oldest[level] > start and oldest[level] >= first + coarse_width):
+                continue
+            if level == "raw":
+                sql = f"SELECT COUNT({field}) FROM samples WHERE ts BETWEEN ? AND ?"
+                rows = self._conn.execute(sql, (start, end)).fetchone()[0]
+            else:
+                sql = f"SELECT COUNT(*) FROM {table} WHERE field = ? AND bucket BETWEEN ? AND ?"
+                rows = self._conn.execute(sql, (field, start - width, end)).fetchone()[0]
+            if rows <= budget:
+                return level, width
+        return ROLLUPS[-1]
+
+    def query(
+        self,
+        field: str,
+        start: float,
+        end: float,
+        max_points: int = 500,
+        method: str = "lttb",
+    ) -> Dict[str, Any]:
+        if field not in self.fields:
+            raise ValueError(f"Unknown history field {field}")
+        if method not in DECIMATORS:
+            raise ValueError(f"Unknown decimation method {method}")
+        if end < start:
+            raise ValueError("History query end is before start")
+        max_points = max(int(max_points), 2)
+        self.flush()
+        level, width = self._choose_level(field, start, end, max_points)
+        if level == "raw":
+            cursor = self._conn.execute(
+                f"SELECT ts, {field} FROM samples WHERE ts BETWEEN ? AND ? AND {field} IS NOT NULL ORDER BY ts",
+                (start, end),
+            )
+            points: List[Point] = cursor.fetchall()
+        elif method == "min_max":
+            # Rollups already carry each bucket's extremes; use them instead of the means.
+            points = []
+            cursor = self._conn.execute(
+                f"SELECT bucket, vmin, vmax FROM {level} WHERE field = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (field, start - width, end),
+            )
+            for bucket, vmin, vmax in cursor:
+                points.append((float(bucket), vmin))
+                points.append((bucket + width / 2.0, vmax))
+        else:
+            cursor = self._conn.execute(
+                f"SELECT bucket + ?, total / n FROM {level} WHERE field = ? AND bucket BETWEEN ? AND ? ORDER BY bucket",
+                (width / 2.0, field, start - width, end),
+            )
+            points = cursor.fetchall()
+        points = DECIMATORS[method](points, max_points)
+        return {"field": field, "level": level, "points": [[t, v] for t, v in points]}
+
+    def close(self) -> None:
+        self.flush()
+        if self._archiver is not None:
+            self._archiver.join()
+        self._conn.close()
@@ -1,13 +1,75 @@
 from __future__ import annotations
 
-from plant_controller.system_manager import SystemManager
+import time
+
+# Taken before the package imports below so --profile-startup can time them.
+_IMPORT_START = time.perf_counter()
+
+import argparse  # noqa: E402
+import logging  # noqa: E402
+
+from plant_controller.system_manager import SystemManager  # noqa: E402
+from plant_controller.utils.config import load_config  # noqa: E402
+from plant_controller.utils.log import configure_logging  # noqa: E402
+
+
+logger = logging.getLogger(__name__)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Plant controller service")
+    parser.add_argument("--config", default="config.yaml", help="Path to config.yaml")
+    parser.add_argument(
+        "--profile-startup",
+        action="store_true",
+        help="Time each startup phase up to the first sensor read, then exit",
+    )
+    return parser.parse_args()
+
+
+def profile_startup(config_path: str) -> None:
+    phases = [("imports", time.perf_counter() - _IMPORT_START)]
+    start = time.perf_counter()
+    config = load_config(config_path)
+    phases.append(("config", time.perf_counter() - start))
+    start = time.perf_counter()
+    configure_logging(config.get("logging", {}))
+    phases.append(("logging", time.perf_counter() - start))
+    start = time.perf_counter()
+    manager = SystemManager(config_path)
+    phases.append(("build", time.perf_counter() - start))
+    start = time.perf_counter()
+    try:
+        # Read and encode only: a real tick would switch relays and could queue doses.
+        for zone in manager.zones:
+            if zone.poller is not None:
+                zone.poller.read_into(zone.state)
+            elif zone.sensor_hub is not None:
+                zone.sensor_hub.refresh(zone.state)
+            zone.telemetry.update(zone.state, zone.relays.states)
+        phases.append(("first_read", time.perf_counter() - start))
+    finally:
+        manager.close()
+    for name, seconds in phases:
+        logger.info("startup %-10s %8.1f ms", name, seconds * 1000.0)
+    logger.info("startup %-10s %8.1f ms", "total", sum(seconds for _, seconds in phases) * 1000.0)
 
 
 def main() -> None:
-    manager = SystemManager("config.yaml")
+    args = parse_args()
+    if args.profile_startup:
+        profile_startup(args.config)
+        return
+    config = load_config(args.config)
+    configure_logging(config.get("logging", {}))
+    if config.get("processes", {}).get("enabled", False):
+        from plant_controller.multiprocess import Supervisor
+
+        Supervisor(args.config).run()
+        return
+    manager = SystemManager(args.config)
     manager.run_forever()
 
 
 if __name__ == "__main__":
     main()
-
@@ -0,0 +1,374 @@
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import pathlib
+import queue
+import signal
+import sys
+import threading
+import time
+from array import array
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from plant_controller.comms.ble_gateway import BLEGateway
+from plant_controller.comms.commands import run_command
+from plant_controller.comms.telemetry import TelemetryEncoder
+from plant_controller.sensors.hub import SensorHub
+from plant_controller.system_manager import SystemManager
+from plant_controller.utils.config import load_config
+from plant_controller.utils.datatypes import SENSOR_FIELDS, SystemState
+from plant_controller.utils.log import configure_logging
+from plant_controller.utils.seqlock import SeqlockBlock
+from plant_controller.zone import Zone, zone_configs
+
+
+logger = logging.getLogger(__name__)
+
+# Per zone: acquisition time followed by every sensor field.
+SENSOR_ROW = 1 + len(SENSOR_FIELDS)
+# Per zone: control tick time and relay bitmask.
+ACTUATOR_ROW = 2
+
+_missing = array("d", [math.nan] * len(SENSOR_FIELDS))
+
+
+def pack_sensors(states: Sequence[SystemState]) -> List[float]:
+    values: List[float] = []
+    for state in states:
+        values.append(state.timestamp)
+        values.extend(state.values)
+    return values
+
+
+def unpack_sensors(values: Sequence[float], states: Sequence[SystemState], stale_before: float) -> None:
+    # Rows older than `stale_before` (or never written) read as missing so controllers hold off.
+    for index, state in enumerate(states):
+        base = index * SENSOR_ROW
+        if values[base] >= stale_before:
+            state.values[:] = array("d", values[base + 1 : base + SENSOR_ROW])
+        else:
+            state.values[:] = _missing
+
+
+def pack_actuators(zones: Sequence[Zone]) -> List[float]:
+    values: List[float] = []
+    for zone in zones:
+        values.append(zone.state.timestamp)
+        values.append(float(zone.relays.bitmask))
+    return values
+
+
+def _relay_names(zone_cfg: Dict[str, Any]) -> List[str]:
+    # Same order as RelayManager.names, so bit positions line up without touching hardware.
+    relays_cfg = zone_cfg.get("relays", {})
+    return list({**relays_cfg.get("expander", {}), **relays_cfg.get("direct", {})})
+
+
+class QueueLink:
+    """Stands in for BLEGateway inside the control process.
+
+    Commands arrive on a multiprocessing queue filled by the comms process and
+    replies go back on another. Priority commands get their own queue and
+    thread so an estop never waits for the control tick.
+    """
+
+    def __init__(
+        self,
+        commands: Any,
+        replies: Any,
+        priority: Any,
+        priority_results: Any,
+    ) -> None:
+        self._commands = commands
+        self._replies = replies
+        self._priority = priority
+        self._priority_results = priority_results
+        self.priority_handler: Optional[Callable[[dict], Any]] = None
+        self._priority_thread = threading.Thread(target=self._priority_loop, daemon=True)
+        self._priority_thread.start()
+
+    def _priority_loop(self) -> None:
+        while True:
+            token, command = self._priority.get()
+            if self.priority_handler is None:
+                continue
+            self._priority_results.put((token, run_command(command, self.priority_handler)))
+
+    def drain_commands(self) -> List[dict]:
+        commands: List[dict] = []
+        for _ in range(self._commands.qsize()):
+            try:
+                commands.append(self._commands.get_nowait())
+            except queue.Empty:
+                break
+        return commands
+
+    def execute(self, command: dict, handler: Callable[[dict], Any]) -> None:
+        reply = run_command(command, handler)
+        if reply["seq"] is not None:
+            self._replies.put(reply)
+
+    def publish_telemetry(self, _encoders: Sequence[TelemetryEncoder]) -> None:
+        # The comms process encodes telemetry itself from the shared blocks.
+        return
+
+
+class _PriorityForwarder:
+    def __init__(self, requests: Any, results: Any, timeout: float) -> None:
+        self._requests = requests
+        self._results = results
+        self._timeout = timeout
+        self._token = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, command: dict) -> Any:
+        with self._lock:
+            self._token += 1
+            token = self._token
+            self._requests.put((token, command))
+            deadline = time.monotonic() + self._timeout
+            while True:
+                remaining = deadline - time.monotonic()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    answered, reply = self._results.get(timeout=remaining)
+                except queue.Empty:
+                    raise TimeoutError("Control process did not answer") from None
+                # Answers to requests that already timed out are stale; skip them.
+                if answered == token:
+                    break
+        if reply["type"] == "nak":
+            raise ValueError(reply["error"])
+        return reply["result"]
+
+
+class _ControlManager(SystemManager):
+    def __init__(
+        self,
+        config_path: str,
+        link: QueueLink,
+        sensors: SeqlockBlock,
+        actuators: SeqlockBlock,
+        stale_seconds: float,
+    ) -> None:
+        super().__init__(config_path, link=link, acquire=False)
+        self._sensors = sensors
+        self._actuators = actuators
+        self._stale_seconds = stale_seconds
+        self._states = [zone.state for zone in self.zones]
+
+    def run_once(self) -> None:
+        unpack_sensors(self._sensors.read(), self._states, time.time() - self._stale_seconds)
+        super().run_once()
+        self._actuators.write(pack_actuators(self.zones))
+
+
+def _child_setup(config_path: str, role: str) -> Dict[str, Any]:
+    config = load_config(config_path)
+    log_cfg = dict(config.get("logging", {}))
+    if log_cfg.get("file"):
+        # Rotating handlers cannot share one file across processes.
+        path = pathlib.Path(log_cfg["file"])
+        log_cfg["file"] = str(path.with_name(f"{path.stem}.{role}{path.suffix}"))
+    configure_logging(log_cfg)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    return config
+
+
+def _sensor_period(config: Dict[str, Any]) -> float:
+    hz = float(config.get("processes", {}).get("sensor_hz", config.get("loop_hz", 1)))
+    if hz <= 0:
+        raise ValueError("processes.sensor_hz must be positive")
+    return 1.0 / hz
+
+
+def acquire(hubs: Sequence[SensorHub], states: Sequence[SystemState]) -> None:
+    # One bad read (an I2C glitch, a DHT timeout) must not take the whole process down.
+    for hub, state in zip(hubs, states):
+        try:
+            hub.refresh(state)
+        except Exception:
+            logger.warning("Sensor refresh failed", exc_info=True, extra={"_rate_limit": True})
+        state.timestamp = time.time()
+
+
+def sensor_main(config_path: str, sensor_block: str) -> None:
+    config = _child_setup(config_path, "sensors")
+    hubs = [SensorHub(cfg) for _, cfg in zone_configs(config)]
+    states = [SystemState() for _ in hubs]
+    block = SeqlockBlock(sensor_block, len(hubs) * SENSOR_ROW)
+    period = _sensor_period(config)
+    logger.info("Sensor process acquiring %d zone(s) every %.2f s", len(hubs), period)
+    try:
+        while True:
+            start = time.monotonic()
+            acquire(hubs, states)
+            block.write(pack_sensors(states))
+            elapsed = time.monotonic() - start
+            if elapsed < period:
+                time.sleep(period - elapsed)
+    finally:
+        block.close()
+
+
+def control_main(
+    config_path: str,
+    sensor_block: str,
+    actuator_block: str,
+    commands: Any,
+    replies: Any,
+    priority: Any,
+    priority_results: Any,
+) -> None:
+    config = _child_setup(config_path, "control")
+    zones = len(zone_configs(config))
+    sensors = SeqlockBlock(sensor_block, zones * SENSOR_ROW)
+    actuators = SeqlockBlock(actuator_block, zones * ACTUATOR_ROW)
+    link = QueueLink(commands, replies, priority, priority_results)
+    stale_seconds = float(config.get("processes", {}).get("stale_seconds", 10.0))
+    try:
+        _ControlManager(config_path, link, sensors, actuators, stale_seconds).run_forever()
+    finally:
+        sensors.close()
+        actuators.close()
+
+
+def _forward_replies(replies: Any, gateway: BLEGateway) -> None:
+    while True:
+        gateway.send_reply(replies.get())
+
+
+def comms_main(
+    config_path: str,
+    sensor_block: str,
+    actuator_block: str,
+    commands: Any,
+    replies: Any,
+    priority: Any,
+    priority_results: Any,
+) -> None:
+    config = _child_setup(config_path, "comms")
+    resolved = zone_configs(config)
+    proc_cfg = config.get("processes", {})
+    ble_cfg = config.get("ble", {})
+    gateway = BLEGateway(
+        ble_cfg.get("port", "/dev/ttyS0"),
+        ble_cfg.get("baudrate", 115200),
+        ble_cfg.get("enabled", True),
+        priority_handler=_PriorityForwarder(priority, priority_results, proc_cfg.get("estop_timeout_seconds", 2.0)),
+        dedupe_window=ble_cfg.get("dedupe_window", 32),
+        dedupe_ttl=ble_cfg.get("dedupe_ttl_seconds", 120.0),
+        rx_queue=commands,
+    )
+    threading.Thread(target=_forward_replies, args=(replies, gateway), daemon=True).start()
+    names = [_relay_names(cfg) for _, cfg in resolved]
+    encoders = [TelemetryEncoder(zone_names, name if len(resolved) > 1 else None) for (name, _), zone_names in zip(resolved, names)]
+    states = [SystemState() for _ in resolved]
+    relay_states: List[Dict[str, bool]] = [dict.fromkeys(zone_names, False) for zone_names in names]
+    sensors = SeqlockBlock(sensor_block, len(resolved) * SENSOR_ROW)
+    actuators = SeqlockBlock(actuator_block, len(resolved) * ACTUATOR_ROW)
+    stale_seconds = float(proc_cfg.get("stale_seconds", 10.0))
+    last_tick = actuators.seq
+    try:
+        while True:
+            time.sleep(0.05)
+            actuator_values = actuators.read()
+            # Publish once per control tick, after the tick's relay changes are visible.
+            if actuators.seq == last_tick or math.isnan(actuator_values[0]):
+                continue
+            last_tick = actuators.seq
+            unpack_sensors(sensors.read(), states, time.time() - stale_seconds)
+            for index, encoder in enumerate(encoders):
+                state = states[index]
+                state.timestamp = actuator_values[index * ACTUATOR_ROW]
+                mask = int(actuator_values[index * ACTUATOR_ROW + 1])
+                zone_relays = relay_states[index]
+                for bit, name in enumerate(names[index]):
+                    zone_relays[name] = bool(mask >> bit & 1)
+                encoder.update(state, zone_relays)
+            gateway.publish_telemetry(encoders)
+    finally:
+        sensors.close()
+        actuators.close()
+
+
+class Supervisor:
+    """Runs sensor acquisition, control and comms as separate processes and restarts any that die."""
+
+    def __init__(self, config_path: str = "config.yaml") -> None:
+        self.config_path = config_path
+        config = load_config(config_path)
+        proc_cfg = config.get("processes", {})
+        self.backoff_max = float(proc_cfg.get("restart_backoff_max_seconds", 30.0))
+        zones = len(zone_configs(config))
+        self._context = multiprocessing.get_context("spawn")
+        self.sensors = SeqlockBlock(None, zones * SENSOR_ROW, create=True)
+        self.actuators = SeqlockBlock(None, zones * ACTUATOR_ROW, create=True)
+        commands = self._context.Queue(maxsize=max(config.get("ble", {}).get("queue_size", 64), 1))
+        queues = (commands, self._context.Queue(), self._context.Queue(), self._context.Queue())
+        blocks = (self.sensors.name, self.actuators.name)
+        self._targets: Dict[str, Any] = {
+            "sensors": (sensor_main, (config_path, self.sensors.name)),
+            "control": (control_main, (config_path, *blocks, *queues)),
+            "comms": (comms_main, (config_path, *blocks, *queues)),
+        }
+        self._processes: Dict[str, Any] = {}
+        self._started: Dict[str, float] = {}
+        self._backoff: Dict[str, float] = dict.fromkeys(self._targets, 1.0)
+        self._restart_at: Dict[str, float] = {}
+
+    def _start(self, role: str) -> None:
+        target, args = self._targets[role]
+        process = self._context.Process(target=target, args=args, name=f"plant-{role}", daemon=False)
+        process.start()
+        self._processes[role] = process
+        self._started[role] = time.monotonic()
+        logger.info("Started %s process", role, extra={"pid": process.pid})
+
+    def _check(self) -> None:
+        now = time.monotonic()
+        for role, process in self._processes.items():
+            if process.is_alive():
+                continue
+            restart_at = self._restart_at.get(role)
+            if restart_at is None:
+                # Crashes soon after start back off exponentially; a long healthy run resets the delay.
+                if now - self._started[role] > 60.0:
+                    self._backoff[role] = 1.0
+                delay = self._backoff[role]
+                self._backoff[role] = min(delay * 2.0, self.backoff_max)
+                self._restart_at[role] = now + delay
+                logger.warning(
+                    "%s process exited, restarting in %.0f s",
+                    role,
+                    delay,
+                    extra={"exitcode": process.exitcode},
+                )
+            elif now >= restart_at:
+                del self._restart_at[role]
+                self._start(role)
+
+    def run(self) -> None:
+        signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+        try:
+            for role in self._targets:
+                self._start(role)
+            while True:
+                time.sleep(1.0)
+                self._check()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        for process in self._processes.values():
+            if process.is_alive():
+                process.terminate()
+        for process in self._processes.values():
+            process.join(5.0)
+            if process.is_alive():
+                process.kill()
+        self.sensors.close()
+        self.actuators.close()
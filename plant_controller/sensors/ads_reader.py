@@ -3,19 +3,7 @@ from __future__ import annotations
 import time
 from typing import Dict, Optional
 
-
-try:
-    from adafruit_ads1x15.analog_in import AnalogIn  # type: ignore
-    from adafruit_ads1x15.ads1115 import ADS1115  # type: ignore
-    from adafruit_ads1x15.ads1x15 import ADS1x15 as ADS  # type: ignore
-    import board  # type: ignore
-    import busio  # type: ignore
-except ImportError:  # pragma: no cover
-    AnalogIn = None  # type: ignore
-    ADS1115 = None  # type: ignore
-    ADS = None  # type: ignore
-    board = None  # type: ignore
-    busio = None  # type: ignore
+from plant_controller.hardware.i2c_bus import get_busio_i2c
 
 
 class ADSReader:
@@ -25,8 +13,17 @@ class ADSReader:
         self.delay_between_reads = delay_between_reads
         self._fallback: Dict[str, float] = {}
         
-        if ADS1115 and board and busio:
-            i2c = busio.I2C(board.SCL, board.SDA)
+        # The CircuitPython stack is slow to import; only load it when an ADC is configured.
+        i2c = None
+        if configs:
+            try:
+                from adafruit_ads1x15.analog_in import AnalogIn  # type: ignore
+                from adafruit_ads1x15.ads1115 import ADS1115  # type: ignore
+
+                i2c = get_busio_i2c()
+            except ImportError:  # pragma: no cover
+                pass
+        if i2c is not None:
             for address, channel_map in configs.items():
                 ads = ADS1115(i2c, address=address)
                 for name, ch in channel_map.items():
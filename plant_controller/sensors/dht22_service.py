@@ -1,19 +1,22 @@
 from __future__ import annotations
 
+import logging
 import time
 from typing import Optional, Tuple
 
 
-try:
-    import board  # type: ignore
-    import adafruit_dht  # type: ignore
-except ImportError:  # pragma: no cover
-    board = None  # type: ignore
-    adafruit_dht = None  # type: ignore
+logger = logging.getLogger(__name__)
 
 
 class DHT22Service:
-    def __init__(self, gpio_pin: int) -> None:
+    def __init__(self, gpio_pin: Optional[int]) -> None:
+        board = adafruit_dht = None
+        if gpio_pin is not None:
+            try:
+                import board  # type: ignore
+                import adafruit_dht  # type: ignore
+            except ImportError:  # pragma: no cover
+                pass
         if board and adafruit_dht:
             pin = getattr(board, f"D{gpio_pin}")
             self._sensor = adafruit_dht.DHT22(pin)
@@ -33,8 +36,9 @@ class DHT22Service:
             humidity = self._sensor.humidity
             if temp_c is not None and humidity is not None:
                 self._last_read = (float(temp_c), float(humidity))
-        except RuntimeError:
-            pass
+        except RuntimeError as exc:
+            # DHT22 checksum/timing errors are routine; keep the previous reading.
+            logger.debug("DHT22 read failed: %s", exc)
         finally:
             self._last_ts = now
         return self._last_read
@@ -1,14 +1,34 @@
 from __future__ import annotations
 
-from typing import Dict
+import logging
+import threading
+import time
+from array import array
+from typing import Dict, Iterable, Optional
 
-from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.datatypes import NAN, SENSOR_COUNT, SENSOR_FIELDS, SystemState
+from plant_controller.utils.seqlock import StateBuffer
 
 from .ads_reader import ADSReader
 from .dht22_service import DHT22Service
 from .ds18b20_service import DS18B20Service
 
 
+logger = logging.getLogger(__name__)
+
+# Smallest move that counts as a change, in each field's own unit; roughly sensor noise.
+DEFAULT_DEADBANDS = {
+    "air_temp_c": 0.1,
+    "humidity": 0.5,
+    "co2_ppm": 20.0,
+    "water_temp_c": 0.1,
+    "ph": 0.02,
+    "ec": 0.02,
+    "tds": 10.0,
+    "moisture": 0.01,
+}
+
+
 class SensorHub:
     def __init__(self, config: dict) -> None:
         sensors = config.get("sensors", {})
@@ -62,3 +82,64 @@ class SensorHub:
         if co2_v is not None:
             state.environment.co2_ppm = 200 * co2_v
 
+
+class ChangeTracker:
+    """Turns successive readings into a bitmask of fields that moved past their deadband.
+
+    Bit `i` is field `SENSOR_FIELDS[i]`. Each field is compared with the last value
+    it was reported at, not the previous reading, so a slow drift is reported once
+    it adds up to a deadband. A reading that appears or goes missing always counts.
+    """
+
+    def __init__(self, deadbands: Optional[Dict[str, float]] = None) -> None:
+        bands = {**DEFAULT_DEADBANDS, **(deadbands or {})}
+        self._bands = [float(bands.get(name.split(".")[-1], 0.0)) for name in SENSOR_FIELDS]
+        self._seen = array("d", [NAN] * SENSOR_COUNT)
+
+    def update(self, values: Iterable[float]) -> int:
+        changed = 0
+        seen = self._seen
+        for index, value in enumerate(values):
+            last = seen[index]
+            if value != value:
+                if last == last:
+                    changed |= 1 << index
+                    seen[index] = value
+            elif last != last or abs(value - last) > self._bands[index]:
+                changed |= 1 << index
+                seen[index] = value
+        return changed
+
+
+class SensorPoller:
+    """Runs `SensorHub.refresh` on its own thread and publishes each pass through a StateBuffer."""
+
+    def __init__(self, hub: SensorHub, period: float, name: str = "sensors") -> None:
+        self.hub = hub
+        self.period = period
+        self.buffer = StateBuffer()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"poll-{name}", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            start = time.monotonic()
+            back = self.buffer.back
+            try:
+                self.hub.refresh(back)
+            except Exception:
+                logger.warning("Sensor refresh failed", exc_info=True, extra={"_rate_limit": True})
+            back.timestamp = time.time()
+            self.buffer.publish()
+            self._stop.wait(max(self.period - (time.monotonic() - start), 0.0))
+
+    def read_into(self, state: SystemState) -> int:
+        return self.buffer.read_into(state)
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=5.0)
@@ -1,127 +1,240 @@
 from __future__ import annotations
 
+import logging
+import threading
 import time
-from typing import Dict, List
+from functools import partial
+from itertools import chain
+from typing import Any, Dict, Iterator, List, Optional
 
 from plant_controller.comms.ble_gateway import BLEGateway
-from plant_controller.controllers.air_pid import AirPIDController
-from plant_controller.controllers.co2 import CO2Controller
-from plant_controller.controllers.humidity import HumidityController
-from plant_controller.controllers.lighting import LightingController
-from plant_controller.controllers.nutrient import NutrientController
-from plant_controller.controllers.soil import SoilController
-from plant_controller.controllers.water_pid import WaterPIDController
-from plant_controller.hardware.pwm_channel import PWMChannel
-from plant_controller.hardware.relay_manager import RelayManager
-from plant_controller.hardware.servo_driver import ServoDriver
-from plant_controller.hardware.syringe_driver import SyringeConfig, SyringeDriver
-from plant_controller.sensors.hub import SensorHub
+from plant_controller.comms.commands import run_command
+from plant_controller.comms.metrics import Family, MetricsExporter
+from plant_controller.controllers.registry import load_plugins
 from plant_controller.utils.config import load_config
-from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.config_watch import ConfigWatcher
+from plant_controller.utils.timer_wheel import Timer, TimerWheel
+from plant_controller.zone import Zone, zone_configs
 
 
-class NullServos:
-    def set_angle(self, *_args, **_kwargs) -> None:
-        return
-
-
-class NullPWM:
-    def set_output(self, *_args, **_kwargs) -> None:
-        return
-
-    def stop(self) -> None:
-        return
+logger = logging.getLogger(__name__)
 
 
 class SystemManager:
-    def __init__(self, config_path: str = "config.yaml") -> None:
+    def __init__(self, config_path: str = "config.yaml", link: Any = None, acquire: bool = True) -> None:
+        self.config_path = config_path
         self.config = load_config(config_path)
-        self.state = SystemState()
-        self.sensor_hub = SensorHub(self.config)
-        relays_cfg = self.config.get("relays", {})
-        self.relays = RelayManager(
-            expander_pins=relays_cfg.get("expander", {}),
-            direct_pins=relays_cfg.get("direct", {}),
-            expander_address=relays_cfg.get("expander_address"),
-        )
-        servo_cfg = self.config.get("servos", {})
-        self.servos = ServoDriver(servo_cfg) if servo_cfg else NullServos()
-        pwm_cfg = self.config.get("pwm", {})
-        air_cfg = pwm_cfg.get("air_peltier")
-        water_cfg = pwm_cfg.get("water_peltier")
-        self.air_pwm = PWMChannel(**air_cfg) if air_cfg else NullPWM()
-        self.water_pwm = PWMChannel(**water_cfg) if water_cfg else NullPWM()
-        syringe_cfg_data = self.config.get("syringe")
-        if not syringe_cfg_data:
-            raise ValueError("Syringe configuration missing in config.yaml")
-        syringe_cfg = SyringeConfig(**syringe_cfg_data)
-        self.syringe = SyringeDriver(syringe_cfg)
-        controllers_cfg = self.config.get("controllers", {})
-        self.controllers = self._build_controllers(controllers_cfg)
+        load_plugins(self.config.get("plugins", []))
+        # Set from comms and dosing threads when there is work, so the loop can sleep until its next timer.
+        self._wakeup = threading.Event()
+        resolved = zone_configs(self.config)
+        self.zones: List[Zone] = [
+            Zone(name, cfg, tag_telemetry=len(resolved) > 1, acquire=acquire, notify=self._wakeup.set)
+            for name, cfg in resolved
+        ]
+        self._zones_by_name: Dict[str, Zone] = {zone.name: zone for zone in self.zones}
+        self._encoders = [zone.telemetry for zone in self.zones]
+        self.timers = TimerWheel(time.time())
+        self._wake_timers: Dict[Any, Timer] = {}
         ble_cfg = self.config.get("ble", {})
-        self.ble = BLEGateway(
-            ble_cfg.get("port", "/dev/ttyS0"),
-            ble_cfg.get("baudrate", 115200),
-            ble_cfg.get("enabled", True),
+        if link is not None:
+            # Multi-process mode: the serial link lives in the comms process.
+            link.priority_handler = self._handle_priority_command
+            self.ble = link
+        else:
+            self.ble = BLEGateway(
+                ble_cfg.get("port", "/dev/ttyS0"),
+                ble_cfg.get("baudrate", 115200),
+                ble_cfg.get("enabled", True),
+                queue_size=ble_cfg.get("queue_size", 64),
+                priority_handler=self._handle_priority_command,
+                dedupe_window=ble_cfg.get("dedupe_window", 32),
+                dedupe_ttl=ble_cfg.get("dedupe_ttl_seconds", 120.0),
+                notify=self._wakeup.set,
+            )
+        metrics_cfg = self.config.get("metrics", {})
+        self.metrics = (
+            MetricsExporter(
+                textfile=metrics_cfg.get("textfile"),
+                textfile_interval=metrics_cfg.get("textfile_interval_seconds", 15.0),
+            )
+            if metrics_cfg.get("enabled", False)
+            else None
+        )
+        api_cfg = self.config.get("api", {})
+        self.api = None
+        if api_cfg.get("enabled", False):
+            # asyncio is a noticeable share of startup on a Pi; skip it unless the API is on.
+            from plant_controller.comms.http_api import HTTPAPIServer
+
+            self.api = HTTPAPIServer(
+                api_cfg.get("host", "127.0.0.1"),
+                api_cfg.get("port", 8080),
+                queue_size=api_cfg.get("queue_size", 64),
+                priority_handler=self._handle_priority_command,
+                metrics_source=(lambda: self.metrics.snapshot) if self.metrics else None,
+                notify=self._wakeup.set,
+            )
+        reload_cfg = self.config.get("reload", {})
+        self.watcher = (
+            ConfigWatcher(
+                config_path,
+                poll_interval=reload_cfg.get("poll_seconds", 2.0),
+                use_inotify=reload_cfg.get("inotify", True),
+            )
+            if reload_cfg.get("enabled", True)
+            else None
         )
+        if self.watcher is not None:
+            logger.info("Watching %s for config changes (%s)", self.watcher.path, self.watcher.mode)
+
+    def zone(self, name: Optional[str] = None) -> Zone:
+        if name is None:
+            return self.zones[0]
+        zone = self._zones_by_name.get(name)
+        if zone is None:
+            raise ValueError(f"Unknown zone {name}")
+        return zone
+
+    def _handle_command(self, command: Dict) -> Any:
+        return self.zone(command.get("zone")).handle_command(command)
+
+    def _handle_priority_command(self, command: Dict) -> Any:
+        if command.get("target") == "estop":
+            if command.get("zone") is not None:
+                self.zone(command["zone"]).emergency_stop()
+                return {"estop": True, "zone": command["zone"]}
+            self.emergency_stop()
+            return {"estop": True}
+        raise ValueError(f"Unknown priority target {command.get('target')}")
+
+    def emergency_stop(self) -> None:
+        # An estop without a zone is a panic button for the whole installation.
+        for zone in self.zones:
+            zone.emergency_stop()
 
-    def _build_controllers(self, cfg: dict) -> List:
-        controllers = []
-        controllers.append(HumidityController(self.relays, cfg.get("humidity", {})))
-        controllers.append(
-            CO2Controller(self.relays, self.servos, cfg.get("co2", {}), (0.0, 0.0), 90.0)
+    def reload_config(self) -> bool:
+        """Re-read the config file and apply what changed without rebuilding drivers.
+
+        Controllers keep their PID integrals, cooldowns and outputs. Sections that
+        need new hardware handles or sockets are logged and wait for a restart.
+        """
+        try:
+            config = load_config(self.config_path)
+        except Exception as exc:
+            # A half-saved or invalid file must never take the running loop down.
+            logger.error("Config reload failed; keeping the running config: %s", exc)
+            return False
+        old, self.config = self.config, config
+        resolved = zone_configs(config)
+        restart = [
+            key
+            for key in ("ble", "api", "metrics", "logging", "processes", "reload", "plugins")
+            if config.get(key, {}) != old.get(key, {})
+        ]
+        if [name for name, _ in resolved] != [zone.name for zone in self.zones]:
+            restart.append("zones")
+        else:
+            for zone, (_, cfg) in zip(self.zones, resolved):
+                restart += [f"{zone.name}.{key}" for key in zone.reconfigure(cfg)]
+        if restart:
+            logger.warning("Config sections changed that only apply after a restart: %s", ", ".join(restart))
+        logger.info("Config reloaded from %s", self.config_path)
+        return True
+
+    def _metric_families(self) -> Iterator[Family]:
+        # Every zone yields the same families in the same order; merge them so each is declared once.
+        for families in zip(*(zone.metric_families() for zone in self.zones)):
+            name, kind, help_text, _ = families[0]
+            yield name, kind, help_text, chain.from_iterable(family[3] for family in families)
+        if not isinstance(self.ble, BLEGateway):
+            return
+        yield "ble_rejected_commands_total", "counter", "Serial commands dropped by the gateway.", (
+            ({"reason": "malformed"}, self.ble.malformed_count),
+            ({"reason": "queue_full"}, self.ble.dropped_count),
+            ({"reason": "duplicate"}, self.ble.duplicate_count),
         )
-        controllers.append(LightingController(self.relays, cfg.get("lighting", {})))
-        controllers.append(AirPIDController(self.air_pwm, cfg.get("air_pid", {})))
-        controllers.append(WaterPIDController(self.water_pwm, self.relays, cfg.get("water_pid", {})))
-        controllers.append(NutrientController(self.relays, self.syringe, cfg.get("nutrient", {})))
-        controllers.append(SoilController(self.relays, self.syringe, cfg.get("soil", {})))
-        return controllers
-
-    def _handle_command(self, command: Dict) -> None:
-        target = command.get("target")
-        if target == "relay":
-            name = command.get("name")
-            state = bool(command.get("state", False))
-            self.relays.set_state(name, state)
-        elif target == "controller":
-            name = command.get("name")
-            enabled = bool(command.get("enabled", True))
-            for ctrl in self.controllers:
-                if ctrl.name == name:
-                    ctrl.enabled = enabled
-        elif target == "dose":
-            channel = command.get("channel", "nutrient_a")
-            amount = float(command.get("amount", 1.0))
-            if channel in ("nutrient_a", "nutrient_b"):
-                self.relays.set_state(channel, True)
-                self.syringe.dispense_ml(amount, direction_up=False)
-                self.relays.set_state(channel, False)
 
     def run_once(self) -> None:
-        self.sensor_hub.refresh(self.state)
-        self.state.timestamp = time.time()
-        for controller in self.controllers:
-            controller.update(self.state)
-        payload = {
-            "timestamp": self.state.timestamp,
-            "environment": self.state.environment.__dict__,
-            "reservoir": self.state.reservoir.__dict__,
-            "soil": self.state.soil.__dict__,
-            "relays": self.relays.all_states(),
-        }
-        self.ble.publish_state(payload)
-        command = self.ble.poll_command()
-        if command:
-            self._handle_command(command)
+        if self.watcher is not None and self.watcher.changed():
+            self.reload_config()
+        for zone in self.zones:
+            zone.tick()
+        self.ble.publish_telemetry(self._encoders)
+        if self.api is not None:
+            self.api.publish(self._encoders)
+        self._drain_commands()
+        if self.metrics is not None:
+            self.metrics.render(self._metric_families())
 
-    def run_forever(self) -> None:
+    def _drain_commands(self) -> None:
+        for command in self.ble.drain_commands():
+            self.ble.execute(command, self._handle_command)
+        if self.api is not None:
+            for command, reply in self.api.drain_commands():
+                reply(run_command(command, self._handle_command))
+
+    def _tick_period(self) -> float:
+        # Read every tick so a reloaded loop_hz takes effect immediately.
         loop_hz = self.config.get("loop_hz", 1)
-        delay = 1.0 / max(loop_hz, 1)
-        while True:
-            start = time.time()
-            self.run_once()
-            elapsed = time.time() - start
-            if elapsed < delay:
-                time.sleep(delay - elapsed)
+        return 1.0 / loop_hz if loop_hz > 0 else 1.0
+
+    def _on_tick(self, deadline: float) -> None:
+        delay = self._tick_period()
+        start = time.time()
+        self.run_once()
+        elapsed = time.time() - start
+        if self.metrics is not None:
+            self.metrics.observe_loop(elapsed, delay)
+        if elapsed >= delay:
+            logger.debug("Tick overran loop period", extra={"elapsed": elapsed, "period": delay})
+        # Keep the phase of the original schedule; an overrun starts the next tick at once.
+        following = max(deadline + delay, time.time())
+        self.timers.schedule(following, partial(self._on_tick, following))
+
+    def _sync_wake_timers(self) -> None:
+        # Mirror each controller's next time trigger into the wheel so the loop wakes exactly then.
+        for zone in self.zones:
+            for ctrl in zone.controllers:
+                at = ctrl.wake_at
+                timer = self._wake_timers.get(ctrl)
+                if timer is not None and timer.active and timer.deadline == at:
+                    continue
+                if timer is not None:
+                    timer.cancel()
+                if at == float("inf"):
+                    self._wake_timers.pop(ctrl, None)
+                else:
+                    self._wake_timers[ctrl] = self.timers.schedule(at, zone.run_timers)
+
+    def run_forever(self) -> None:
+        """Sleep until the earliest timer or an incoming command, instead of polling every tick.
+
+        The sensor tick (`loop_hz`) and every controller time trigger live in one
+        timer wheel; command arrivals on the BLE link or the API set an event that
+        cuts the sleep short, so commands no longer wait for the next tick.
+        """
+        logger.info("Control loop starting at %s Hz", self.config.get("loop_hz", 1))
+        try:
+            # The first tick runs straight away so controllers start from real readings.
+            self._on_tick(time.time())
+            while True:
+                self._sync_wake_timers()
+                deadline = self.timers.next_deadline()
+                timeout = None if deadline is None else deadline - time.time()
+                if (timeout is None or timeout > 0) and self._wakeup.wait(timeout):
+                    self._wakeup.clear()
+                for timer in self.timers.advance(time.time()):
+                    timer.callback()
+                self._drain_commands()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if self.api is not None:
+            self.api.close()
+        if self.watcher is not None:
+            self.watcher.close()
+        for zone in self.zones:
+            zone.close()
 
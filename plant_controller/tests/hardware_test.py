@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import argparse
+import logging
 import time
 from typing import Callable, Dict, Iterable, List
 
@@ -11,6 +12,10 @@ from plant_controller.hardware.syringe_driver import SyringeConfig, SyringeDrive
 from plant_controller.sensors.hub import SensorHub
 from plant_controller.utils.config import load_config
 from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.log import configure_logging
+
+
+logger = logging.getLogger(__name__)
 
 
 def build_relay_manager(config: dict) -> RelayManager:
@@ -23,28 +28,28 @@ def build_relay_manager(config: dict) -> RelayManager:
 
 
 def test_sensors(config: dict) -> None:
-    print("=== Sensor Test ===")
+    logger.info("=== Sensor Test ===")
     hub = SensorHub(config)
     state = SystemState()
     hub.refresh(state)
-    print(f"Air temp: {state.environment.air_temp_c} °C")
-    print(f"Humidity: {state.environment.humidity} %")
-    print(f"CO2: {state.environment.co2_ppm} ppm")
-    print(f"Water temp: {state.reservoir.water_temp_c} °C")
-    print(f"pH: {state.reservoir.ph}")
-    print(f"TDS/EC: {state.reservoir.tds}")
-    print(f"Soil moisture: {state.soil.moisture}")
+    logger.info("Air temp: %s °C", state.environment.air_temp_c)
+    logger.info("Humidity: %s %%", state.environment.humidity)
+    logger.info("CO2: %s ppm", state.environment.co2_ppm)
+    logger.info("Water temp: %s °C", state.reservoir.water_temp_c)
+    logger.info("pH: %s", state.reservoir.ph)
+    logger.info("TDS/EC: %s", state.reservoir.tds)
+    logger.info("Soil moisture: %s", state.soil.moisture)
 
 
 def test_servos(config: dict) -> None:
-    print("=== Servo Test ===")
+    logger.info("=== Servo Test ===")
     servo_cfg = config.get("servos", {})
     driver = ServoDriver(servo_cfg)
     for name in servo_cfg.keys():
-        print(f"Moving servo {name} +10°")
+        logger.info("Moving servo %s +10°", name)
         driver.set_angle(name, 10.0)
         time.sleep(1.0)
-        print(f"Returning servo {name} to 0°")
+        logger.info("Returning servo %s to 0°", name)
         driver.set_angle(name, 0.0)
         time.sleep(1.0)
     driver.stop_all()
@@ -52,23 +57,23 @@ def test_servos(config: dict) -> None:
 
 def _relay_sequence(manager: RelayManager, names: Iterable[str], dwell: float) -> None:
     for name in names:
-        print(f"Energizing relay {name}")
+        logger.info("Energizing relay %s", name)
         manager.set_state(name, True)
         time.sleep(dwell)
-        print(f"De-energizing relay {name}")
+        logger.info("De-energizing relay %s", name)
         manager.set_state(name, False)
         time.sleep(1.0)
 
 
 def test_expander_relays(config: dict) -> None:
-    print("=== Expander Relay Test ===")
+    logger.info("=== Expander Relay Test ===")
     manager = build_relay_manager(config)
     expander_names: List[str] = list(config.get("relays", {}).get("expander", {}).keys())
     _relay_sequence(manager, expander_names, 5.0)
 
 
 def test_direct_relays(config: dict) -> None:
-    print("=== Direct Relay Test ===")
+    logger.info("=== Direct Relay Test ===")
     manager = build_relay_manager(config)
     direct_names: List[str] = list(config.get("relays", {}).get("direct", {}).keys())
     _relay_sequence(manager, direct_names, 2.0)
@@ -76,42 +81,42 @@ def test_direct_relays(config: dict) -> None:
 
 def _test_peltier(channel_cfg: dict, label: str) -> None:
     if not channel_cfg:
-        print(f"No config for {label}, skipping")
+        logger.info("No config for %s, skipping", label)
         return
     pwm = PWMChannel(**channel_cfg)
-    print(f"{label}: Cooling direction for 3 minutes")
+    logger.info("%s: Cooling direction for 3 minutes", label)
     pwm.set_output(80.0, forward=True)
     for remaining in range(3, 0, -1):
-        print(f"  Cooling... {remaining} minute(s) left")
+        logger.info("  Cooling... %s minute(s) left", remaining)
         time.sleep(60)
-    print(f"{label}: Heating direction for 3 minutes")
+    logger.info("%s: Heating direction for 3 minutes", label)
     pwm.set_output(80.0, forward=False)
     for remaining in range(3, 0, -1):
-        print(f"  Heating... {remaining} minute(s) left")
+        logger.info("  Heating... %s minute(s) left", remaining)
         time.sleep(60)
     pwm.set_output(0.0)
     pwm.stop()
 
 
 def test_peltiers(config: dict) -> None:
-    print("=== Peltier Test ===")
+    logger.info("=== Peltier Test ===")
     pwm_cfg = config.get("pwm", {})
     _test_peltier(pwm_cfg.get("air_peltier", {}), "Air Peltier")
     _test_peltier(pwm_cfg.get("water_peltier", {}), "Water Peltier")
 
 
 def test_stepper(config: dict) -> None:
-    print("=== Stepper (Syringe) Test ===")
+    logger.info("=== Stepper (Syringe) Test ===")
     syringe_cfg = config.get("syringe")
     if not syringe_cfg:
-        print("No syringe config found")
+        logger.info("No syringe config found")
         return
     driver = SyringeDriver(SyringeConfig(**syringe_cfg))
     steps_per_rev = syringe_cfg.get("steps_per_ml", 200)
-    print("Moving +1 revolution")
+    logger.info("Moving +1 revolution")
     driver.move_steps(steps_per_rev, direction_up=True)
     time.sleep(1.0)
-    print("Moving -1 revolution")
+    logger.info("Moving -1 revolution")
     driver.move_steps(steps_per_rev, direction_up=False)
 
 
@@ -151,6 +156,7 @@ def main() -> None:
         help="Seconds to wait between loops when --loop is set",
     )
     args = parser.parse_args()
+    configure_logging({"format": "text", "level": "INFO"})
     config = load_config(args.config)
     interval = max(args.interval, 0.0)
 
@@ -158,14 +164,14 @@ def main() -> None:
         for name in args.tests:
             try:
                 TESTS[name](config)
-            except Exception as exc:  # pragma: no cover
-                print(f"Test '{name}' failed: {exc}")
+            except Exception:  # pragma: no cover
+                logger.exception("Test '%s' failed", name)
 
     while True:
         run_selected_tests()
         if not args.loop:
             break
-        print(f"Loop complete, sleeping for {interval} second(s)")
+        logger.info("Loop complete, sleeping for %s second(s)", interval)
         time.sleep(interval)
 
 
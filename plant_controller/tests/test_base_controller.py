@@ -0,0 +1,88 @@
+from __future__ import annotations
+
+import types
+
+import pytest
+
+from plant_controller.controllers import base
+from plant_controller.controllers.base import BaseController
+
+
+class _Reader(BaseController):
+    reads = ("ph",)
+    read_mask = 0b01
+
+    def update(self, *_args, **_kwargs) -> None:
+        return
+
+
+class _Periodic(BaseController):
+    def update(self, *_args, **_kwargs) -> None:
+        return
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000.0]
+    monkeypatch.setattr(base, "time", types.SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+def test_first_call_runs_then_waits_for_a_read_field(clock):
+    ctrl = _Reader("ph", {"period_s": 5.0, "max_idle_s": 60.0})
+    assert ctrl.should_run(ctrl.period_s)
+    clock[0] += 10.0
+    # A change in a field the controller does not read is ignored.
+    assert not ctrl.should_run(ctrl.period_s, changed=0b10)
+    assert ctrl.should_run(ctrl.period_s, changed=0b01)
+    assert ctrl.runs == 2
+
+
+def test_change_inside_the_period_is_kept_until_the_period_passes(clock):
+    ctrl = _Reader("ph", {"period_s": 5.0, "max_idle_s": 60.0})
+    assert ctrl.should_run(ctrl.period_s)
+    clock[0] += 1.0
+    assert not ctrl.should_run(ctrl.period_s, changed=0b01)
+    clock[0] += 4.0
+    assert ctrl.should_run(ctrl.period_s)
+
+
+def test_max_idle_runs_without_changes(clock):
+    ctrl = _Reader("ph", {"period_s": 5.0, "max_idle_s": 30.0})
+    assert ctrl.should_run(ctrl.period_s)
+    clock[0] += 29.0
+    assert not ctrl.should_run(ctrl.period_s)
+    clock[0] += 1.0
+    assert ctrl.should_run(ctrl.period_s)
+
+
+def test_controller_without_reads_runs_on_its_period(clock):
+    ctrl = _Periodic("lights", {"period_s": 2.0})
+    assert ctrl.should_run(ctrl.period_s)
+    clock[0] += 1.0
+    assert not ctrl.should_run(ctrl.period_s)
+    clock[0] += 1.0
+    assert ctrl.should_run(ctrl.period_s)
+
+
+def test_wake_bypasses_period_and_change_check(clock):
+    ctrl = _Reader("ph", {"period_s": 5.0, "max_idle_s": 60.0})
+    assert ctrl.should_run(ctrl.period_s)
+    ctrl.wake(clock[0] + 2.0)
+    clock[0] += 1.0
+    assert not ctrl.should_run(ctrl.period_s)
+    clock[0] += 1.0
+    assert ctrl.should_run(ctrl.period_s)
+    # The wake is consumed by the run.
+    clock[0] += 1.0
+    assert not ctrl.should_run(ctrl.period_s)
+    assert ctrl.wake_at == float("inf")
+
+
+def test_wake_during_update_is_not_lost(clock):
+    ctrl = _Reader("ph", {"period_s": 5.0, "max_idle_s": 60.0})
+    assert ctrl.should_run(ctrl.period_s)
+    # A dose finishing while update() runs (after should_run reset the wake time).
+    ctrl.wake()
+    clock[0] += 0.1
+    assert ctrl.should_run(ctrl.period_s)
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import json
+import types
+
+import pytest
+
+from plant_controller.comms import ble_gateway
+from plant_controller.comms.ble_gateway import BLEGateway
+from plant_controller.comms.commands import make_reply
+
+
+class _EndOfInput(BaseException):
+    """Raised by the fake port once its lines run out, to leave the reader loop."""
+
+
+class _FakeSerial:
+    def __init__(self, lines):
+        self._lines = list(lines)
+        self.written = []
+
+    def readline(self) -> bytes:
+        if not self._lines:
+            raise _EndOfInput
+        return self._lines.pop(0)
+
+    def write(self, data: bytes) -> None:
+        self.written.append(data)
+
+
+def _gateway(lines) -> BLEGateway:
+    gateway = BLEGateway("/dev/null", 9600, enabled=False)
+    gateway.enabled = True
+    gateway._serial = _FakeSerial(lines)
+    return gateway
+
+
+def _no_sleep(_seconds: float) -> None:
+    raise AssertionError("reader slept on a bad line")
+
+
+def test_non_utf8_line_is_malformed_without_backoff(monkeypatch):
+    monkeypatch.setattr(ble_gateway.time, "sleep", _no_sleep)
+    gateway = _gateway([b'\xff\xfe{"target":"relay"}\n', b'{"target":"relay","name":"pump"}\n'])
+    with pytest.raises(_EndOfInput):
+        gateway._read_loop()
+    assert gateway.malformed_count == 1
+    assert gateway._rx_queue.get_nowait() == {"target": "relay", "name": "pump"}
+
+
+@pytest.mark.parametrize("seq", [True, "7", 1.5])
+def test_non_integer_seq_is_refused(seq):
+    gateway = _gateway([])
+    gateway._accept_line(json.dumps({"target": "relay", "seq": seq}))
+    assert gateway.malformed_count == 1
+    assert gateway._rx_queue.empty()
+    reply = json.loads(gateway._serial.written[-1])
+    assert reply["type"] == "nak" and reply["seq"] is None
+
+
+def _reply(gateway: BLEGateway) -> dict:
+    return json.loads(gateway._serial.written[-1])
+
+
+def _send(gateway: BLEGateway, seq: int, session=None, target: str = "relay") -> None:
+    command = {"target": target, "name": "pump", "seq": seq}
+    if session is not None:
+        command["session"] = session
+    gateway._accept_line(json.dumps(command))
+
+
+def test_duplicate_seq_replays_the_cached_reply():
+    gateway = _gateway([])
+    _send(gateway, 1, session="a")
+    # Resent before the control loop answered: dropped, nothing written.
+    _send(gateway, 1, session="a")
+    assert gateway.duplicate_count == 1
+    assert gateway._serial.written == []
+    (command,) = gateway.drain_commands()
+    gateway.send_reply(make_reply(command["seq"], True, result="ok", session=command["session"]))
+    _send(gateway, 1, session="a")
+    assert gateway.duplicate_count == 2
+    assert gateway._serial.written[-1] == gateway._serial.written[-2]
+    assert _reply(gateway)["result"] == "ok"
+    assert gateway.drain_commands() == []
+
+
+def test_dedupe_is_per_session_and_expires(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(ble_gateway, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    gateway = BLEGateway("/dev/null", 9600, enabled=False, dedupe_ttl=10.0)
+    gateway.enabled = True
+    gateway._serial = _FakeSerial([])
+    _send(gateway, 1, session="a")
+    gateway.send_reply(make_reply(1, True, session="a"))
+    # The same seq from a new session (a reconnected client) is a new command.
+    _send(gateway, 1, session="b")
+    assert len(gateway.drain_commands()) == 2
+    # A command never answered stops blocking its seq once the TTL passes.
+    _send(gateway, 2, session="a")
+    gateway.drain_commands()
+    _send(gateway, 2, session="a")
+    assert gateway.drain_commands() == []
+    now[0] += 11.0
+    _send(gateway, 1, session="a")
+    _send(gateway, 2, session="a")
+    assert [command["seq"] for command in gateway.drain_commands()] == [1, 2]
+    assert gateway.duplicate_count == 1
+
+
+def test_queue_full_nak_is_not_replayed_to_the_retry():
+    gateway = BLEGateway("/dev/null", 9600, enabled=False, queue_size=1)
+    gateway.enabled = True
+    gateway._serial = _FakeSerial([])
+    _send(gateway, 1)
+    _send(gateway, 2)
+    assert gateway.dropped_count == 1
+    assert _reply(gateway) == {"type": "nak", "seq": 2, "ms": 0.0, "error": "command queue full"}
+    gateway.drain_commands()
+    _send(gateway, 2)
+    assert gateway.duplicate_count == 0
+    assert [command["seq"] for command in gateway.drain_commands()] == [2]
+
+
+def test_drain_returns_every_queued_command_in_order():
+    woken = []
+    gateway = _gateway([])
+    gateway.notify = lambda: woken.append(1)
+    for seq in range(5):
+        _send(gateway, seq)
+    assert [command["seq"] for command in gateway.drain_commands()] == [0, 1, 2, 3, 4]
+    assert gateway.drain_commands() == []
+    assert len(woken) == 5
+
+
+def test_overflow_is_counted():
+    gateway = BLEGateway("/dev/null", 9600, enabled=False, queue_size=2)
+    gateway.enabled = True
+    gateway._serial = _FakeSerial([])
+    for seq in range(5):
+        _send(gateway, seq)
+    assert gateway.dropped_count == 3
+    assert [command["seq"] for command in gateway.drain_commands()] == [0, 1]
+
+
+def test_estop_skips_a_full_queue():
+    handled = []
+    gateway = BLEGateway("/dev/null", 9600, enabled=False, queue_size=1, priority_handler=handled.append)
+    gateway.enabled = True
+    gateway._serial = _FakeSerial([])
+    _send(gateway, 1)
+    _send(gateway, 2, target="estop")
+    assert [command["target"] for command in handled] == ["estop"]
+    assert _reply(gateway)["type"] == "ack" and _reply(gateway)["seq"] == 2
+    assert gateway.dropped_count == 0
+    assert [command["seq"] for command in gateway.drain_commands()] == [1]
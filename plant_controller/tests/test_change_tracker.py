@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from plant_controller.controllers.nutrient import NutrientController
+from plant_controller.sensors.hub import ChangeTracker
+from plant_controller.utils.datatypes import SENSOR_FIELDS, SystemState
+
+
+def _bit(field: str) -> int:
+    return 1 << SENSOR_FIELDS.index(field)
+
+
+def test_first_reading_and_missing_fields():
+    tracker = ChangeTracker()
+    state = SystemState()
+    # Nothing read yet: NaN to NaN is no change.
+    assert tracker.update(state.values) == 0
+    state.reservoir.ph = 6.0
+    assert tracker.update(state.values) == _bit("reservoir.ph")
+    state.reservoir.ph = None
+    assert tracker.update(state.values) == _bit("reservoir.ph")
+    assert tracker.update(state.values) == 0
+
+
+def test_sub_deadband_moves_are_ignored_until_they_add_up():
+    tracker = ChangeTracker()
+    state = SystemState()
+    state.environment.humidity = 50.0
+    tracker.update(state.values)
+    # Default humidity deadband is 0.5 %: three 0.2 % steps report once, at the third.
+    masks = []
+    for value in (50.2, 50.4, 50.6):
+        state.environment.humidity = value
+        masks.append(tracker.update(state.values))
+    assert masks == [0, 0, _bit("environment.humidity")]
+
+
+def test_configured_deadband_overrides_the_default():
+    tracker = ChangeTracker({"ph": 0.5})
+    state = SystemState()
+    state.reservoir.ph = 6.0
+    tracker.update(state.values)
+    state.reservoir.ph = 6.3
+    assert tracker.update(state.values) == 0
+    state.reservoir.ph = 6.6
+    assert tracker.update(state.values) == _bit("reservoir.ph")
+
+
+def test_read_mask_matches_the_declared_fields():
+    tracker = ChangeTracker()
+    state = SystemState()
+    tracker.update(state.values)
+    state.reservoir.ec = 1.8
+    state.environment.air_temp_c = 22.0
+    changed = tracker.update(state.values)
+    assert NutrientController.reads == ("reservoir.ec", "reservoir.tds")
+    assert NutrientController.read_mask == _bit("reservoir.ec") | _bit("reservoir.tds")
+    # Only the EC bit is the nutrient controller's business.
+    assert changed & NutrientController.read_mask == _bit("reservoir.ec")
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from plant_controller.utils import config
+from plant_controller.utils.config import load_config, validate_config
+
+
+def test_validation_reports_every_mismatch():
+    with pytest.raises(ValueError) as error:
+        validate_config(
+            {"ble": {"baudrate": "fast"}, "loop_hz": True, "zones": {"veg": {"relays": []}}, "plugins": ["a", 3]},
+            "test.yaml",
+        )
+    message = str(error.value)
+    assert message.startswith("Invalid configuration in test.yaml: ")
+    assert "ble.baudrate: expected int, got str" in message
+    assert "loop_hz: expected int or float, got bool" in message
+    assert "zones.veg.relays: expected mapping, got list" in message
+    assert "plugins[1]: expected str, got int" in message
+
+
+def test_validation_accepts_nulls_and_unknown_keys():
+    data = {"sensors": {"dht22_gpio": None}, "syringe": {"refill_channel": None}, "custom": {"anything": [1]}}
+    assert validate_config(data) is data
+
+
+@pytest.fixture
+def parses(monkeypatch, tmp_path):
+    """Fresh in-process memo and a counter of real YAML parses."""
+    monkeypatch.setattr(config, "_memo", {})
+    calls = []
+    parse = config._parse
+
+    def counting(raw, source):
+        calls.append(source)
+        return parse(raw, source)
+
+    monkeypatch.setattr(config, "_parse", counting)
+    return calls
+
+
+def _write(path, text: str, mtime_ns: int) -> None:
+    path.write_text(text)
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+def test_cache_hit_skips_parsing(parses, tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "loop_hz: 2\n", 1_000_000_000)
+    assert load_config(path) == {"loop_hz": 2}
+    assert (tmp_path / ".config.yaml.cache").exists()
+    config._memo.clear()
+    assert load_config(path) == {"loop_hz": 2}
+    assert len(parses) == 1
+    # Each call returns its own copy.
+    load_config(path)["loop_hz"] = 5
+    assert load_config(path) == {"loop_hz": 2}
+
+
+def test_touched_file_falls_back_to_the_content_hash(parses, tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "loop_hz: 2\n", 1_000_000_000)
+    load_config(path)
+    config._memo.clear()
+    os.utime(path, ns=(2_000_000_000, 2_000_000_000))
+    assert load_config(path) == {"loop_hz": 2}
+    assert len(parses) == 1
+    _write(path, "loop_hz: 3\n", 3_000_000_000)
+    assert load_config(path) == {"loop_hz": 3}
+    assert len(parses) == 2
+
+
+def test_corrupt_cache_is_ignored_and_rewritten(parses, tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "loop_hz: 2\n", 1_000_000_000)
+    cache = tmp_path / ".config.yaml.cache"
+    cache.write_bytes(b"\x00garbage")
+    assert load_config(path) == {"loop_hz": 2}
+    assert len(parses) == 1
+    config._memo.clear()
+    assert load_config(path) == {"loop_hz": 2}
+    assert len(parses) == 1
+
+
+def test_invalid_file_is_not_cached(parses, tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "loop_hz: fast\n", 1_000_000_000)
+    with pytest.raises(ValueError, match="loop_hz"):
+        load_config(path)
+    assert not (tmp_path / ".config.yaml.cache").exists()
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+
+from plant_controller.comms.telemetry import STATE_SECTIONS, TelemetryEncoder
+from plant_controller.history.ring_buffer import RingBufferStore
+from plant_controller.utils.datatypes import (
+    SENSOR_COUNT,
+    SENSOR_FIELDS,
+    EnvironmentReading,
+    ReservoirReading,
+    SoilReading,
+    SystemState,
+)
+
+
+def test_none_and_nan_round_trip():
+    state = SystemState()
+    assert all(math.isnan(value) for value in state.values)
+    assert state.reservoir.ph is None
+    state.reservoir.ph = 6.1
+    assert state.reservoir.ph == 6.1
+    state.reservoir.ph = None
+    assert math.isnan(state.values[ReservoirReading.OFFSET + ReservoirReading.FIELDS.index("ph")])
+    assert state.reservoir.ph is None
+    state.values[EnvironmentReading.OFFSET] = math.nan
+    assert state.environment.air_temp_c is None
+
+
+def test_views_write_through_to_values():
+    state = SystemState()
+    state.environment.humidity = 55.0
+    state.soil.moisture = 0.4
+    assert state.values[SENSOR_FIELDS.index("environment.humidity")] == 55.0
+    assert state.values[SENSOR_FIELDS.index("soil.moisture")] == 0.4
+    state.values[SENSOR_FIELDS.index("reservoir.ec")] = 1.8
+    assert state.reservoir.ec == 1.8
+    # A snapshot owns its vector; the original's views keep pointing at the original.
+    snapshot = state.snapshot()
+    state.reservoir.ec = 2.0
+    assert snapshot.reservoir.ec == 1.8
+    state.copy_from(snapshot)
+    assert state.reservoir.ec == 1.8
+
+
+def test_standalone_reading_and_wrong_length():
+    reading = ReservoirReading(ph=5.9, ec=None)
+    assert (reading.ph, reading.ec) == (5.9, None)
+    assert reading == ReservoirReading(ph=5.9)
+    with pytest.raises(ValueError, match=f"needs {SENSOR_COUNT} sensor values"):
+        SystemState([0.0] * (SENSOR_COUNT - 1))
+
+
+def test_sections_tile_the_vector_in_field_order():
+    sections = (EnvironmentReading, ReservoirReading, SoilReading)
+    offset = 0
+    for reading_cls in sections:
+        assert reading_cls.OFFSET == offset
+        offset += len(reading_cls.FIELDS)
+    assert offset == SENSOR_COUNT == len(SENSOR_FIELDS)
+    assert tuple(cls for _, cls in STATE_SECTIONS) == sections
+    assert SENSOR_FIELDS == tuple(f"{name}.{field}" for name, cls in STATE_SECTIONS for field in cls.FIELDS)
+
+
+def test_ring_and_telemetry_see_the_same_layout(tmp_path):
+    state = SystemState([float(index) for index in range(SENSOR_COUNT)], timestamp=42.0)
+    ring = RingBufferStore(tmp_path / "h.ring", list(SENSOR_FIELDS), [], capacity=2)
+    try:
+        ring.append(state.timestamp, 0, state.values)
+        row = ring.latest()
+        for name in SENSOR_FIELDS:
+            section, field = name.split(".")
+            assert row[ring.column_index(name)] == getattr(getattr(state, section), field)
+    finally:
+        ring.close()
+    encoder = TelemetryEncoder([])
+    encoder.update(state, {})
+    frame = json.loads(bytes(encoder.frame()))
+    for name in SENSOR_FIELDS:
+        section, field = name.split(".")
+        assert frame[section][field] == getattr(getattr(state, section), field)
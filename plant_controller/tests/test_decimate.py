@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+from plant_controller.history.decimate import lttb, min_max
+
+
+POINTS = [(float(t), math.sin(t / 5.0) + (3.0 if t == 37 else 0.0)) for t in range(100)]
+
+
+@pytest.mark.parametrize("budget, expected", [(0, []), (1, [POINTS[-1]]), (2, [POINTS[0], POINTS[-1]])])
+def test_lttb_small_budgets_keep_the_ends(budget, expected):
+    assert lttb(POINTS, budget) == expected
+
+
+def test_lttb_keeps_ends_and_the_spike():
+    sampled = lttb(POINTS, 10)
+    assert len(sampled) == 10
+    assert sampled[0] == POINTS[0] and sampled[-1] == POINTS[-1]
+    assert POINTS[37] in sampled
+    assert [t for t, _ in sampled] == sorted(t for t, _ in sampled)
+
+
+def test_lttb_returns_short_series_unchanged():
+    assert lttb(POINTS[:5], 10) == POINTS[:5]
+
+
+def test_min_max_keeps_each_bucket_extremes_in_time_order():
+    sampled = min_max(POINTS, 10)
+    assert len(sampled) == 10
+    assert max(sampled, key=lambda p: p[1]) == POINTS[37]
+    assert [t for t, _ in sampled] == sorted(t for t, _ in sampled)
@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import pytest
+
+from plant_controller.utils.dose_planner import DosePlanner
+
+
+def test_plan_covers_the_deficit_in_equal_sub_doses():
+    planner = DosePlanner(reservoir_liters=20.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=50.0)
+    # 0.3 EC * 2 ml/(EC*L) * 20 L = 12 ml, split into three sub-doses of 4 ml.
+    assert planner.plan(1.5, 1.8) == pytest.approx([4.0, 4.0, 4.0])
+    assert planner.plan(1.8, 1.8) == []
+    assert planner.plan(2.0, 1.8) == []
+
+
+def test_plan_is_capped_at_max_cycle_ml():
+    planner = DosePlanner(reservoir_liters=20.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=20.0)
+    # A reading of 0 would ask for 72 ml; the cycle cap holds it to 20 ml.
+    plan = planner.plan(0.0, 1.8)
+    assert sum(plan) == pytest.approx(20.0)
+    assert plan == pytest.approx([5.0] * 4)
+
+
+def test_observe_moves_gain_towards_the_measured_response():
+    planner = DosePlanner(reservoir_liters=10.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=20.0, learning_rate=0.5)
+    # 6 ml raised 10 L by 0.2 EC: observed gain 3.0, halfway from 2.0 is 2.5.
+    assert planner.observe(1.4, 1.6, 6.0) == pytest.approx(2.5)
+    assert planner.gain == pytest.approx(2.5)
+
+
+@pytest.mark.parametrize(
+    "ec_after, dosed, expected",
+    [
+        # Rise of 0.025 for 20 ml: observed 80, clamped to 4 * 2.0.
+        (1.425, 20.0, 2.0 + 0.5 * (8.0 - 2.0)),
+        # Rise of 10 for 1 ml: observed 0.01, clamped to 2.0 / 4.
+        (11.4, 1.0, 2.0 + 0.5 * (0.5 - 2.0)),
+    ],
+)
+def test_observe_clamps_a_single_update_to_four_times(ec_after, dosed, expected):
+    planner = DosePlanner(reservoir_liters=10.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=20.0, learning_rate=0.5)
+    assert planner.observe(1.4, ec_after, dosed) == pytest.approx(expected)
+
+
+def test_observe_skips_noise_sized_rises():
+    planner = DosePlanner(reservoir_liters=10.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=20.0)
+    assert planner.observe(1.4, 1.41, 5.0) is None
+    assert planner.observe(1.4, 1.3, 5.0) is None
+    assert planner.observe(1.4, 1.6, 0.0) is None
+    assert planner.gain == 2.0
+
+
+def test_rejects_non_positive_settings():
+    with pytest.raises(ValueError):
+        DosePlanner(reservoir_liters=0.0, gain=2.0, max_sub_dose_ml=5.0, max_cycle_ml=20.0)
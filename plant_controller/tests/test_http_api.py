@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import http.client
+import json
+import os
+import socket
+import struct
+import threading
+
+import pytest
+
+from plant_controller.comms.http_api import HTTPAPIServer, check_bind_host, ws_frame
+from plant_controller.comms.telemetry import TelemetryEncoder
+from plant_controller.utils.datatypes import SystemState
+
+
+@pytest.fixture
+def server():
+    handled = []
+    api = HTTPAPIServer("127.0.0.1", 0, queue_size=4, priority_handler=handled.append, metrics_source=lambda: b"up 1\n")
+    api.handled = handled
+    yield api
+    api.close()
+
+
+def _get(api: HTTPAPIServer, path: str):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port, timeout=5)
+    try:
+        conn.request("GET", path)
+        response = conn.getresponse()
+        return response.status, response.getheader("Content-Type"), response.read()
+    finally:
+        conn.close()
+
+
+def _post(api: HTTPAPIServer, command: dict):
+    conn = http.client.HTTPConnection("127.0.0.1", api.port, timeout=5)
+    try:
+        conn.request("POST", "/command", body=json.dumps(command), headers={"Content-Type": "application/json"})
+        response = conn.getresponse()
+        return response.status, json.loads(response.read())
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize("host", ["0.0.0.0", "::", "8.8.8.8", "example.com"])
+def test_refuses_a_public_or_wildcard_bind(host):
+    with pytest.raises(ValueError):
+        check_bind_host(host)
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", "::1", "localhost", "192.168.1.20", "10.0.0.5"])
+def test_allows_loopback_and_lan_binds(host):
+    check_bind_host(host)
+
+
+def test_get_state_and_metrics(server):
+    encoder = TelemetryEncoder(["pump"])
+    state = SystemState()
+    state.environment.air_temp_c = 21.5
+    encoder.update(state, {"pump": True})
+    server.publish([encoder])
+    status, content_type, body = _get(server, "/state")
+    assert status == 200 and content_type == "application/json"
+    frame = json.loads(body)
+    assert frame["environment"]["air_temp_c"] == 21.5
+    assert frame["relays"] == {"pump": True}
+    status, content_type, body = _get(server, "/metrics")
+    assert status == 200 and content_type.startswith("text/plain; version=0.0.4")
+    assert body == b"up 1\n"
+    assert _get(server, "/nope")[0] == 404
+
+
+def test_post_command_round_trip(server):
+    result = {}
+    client = threading.Thread(target=lambda: result.update(reply=_post(server, {"target": "relay", "seq": 4})))
+    client.start()
+    commands = []
+    while not commands and client.is_alive():
+        commands = server.drain_commands()
+    ((command, reply),) = commands
+    assert command == {"target": "relay", "seq": 4}
+    reply({"type": "ack", "seq": 4, "ms": 0.1, "result": {"name": "pump"}})
+    client.join(5.0)
+    assert result["reply"] == (200, {"type": "ack", "seq": 4, "ms": 0.1, "result": {"name": "pump"}})
+
+
+def test_estop_goes_through_the_priority_handler(server):
+    status, reply = _post(server, {"target": "estop", "seq": 9})
+    assert status == 200 and reply["type"] == "ack" and reply["seq"] == 9
+    assert server.handled == [{"target": "estop", "seq": 9}]
+    assert server.drain_commands() == []
+
+
+def test_bad_json_is_a_400(server):
+    conn = http.client.HTTPConnection("127.0.0.1", server.port, timeout=5)
+    try:
+        conn.request("POST", "/command", body=b"[1, 2")
+        assert conn.getresponse().status == 400
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize(
+    "length, header",
+    [(5, b"\x81\x05"), (126, b"\x81\x7e\x00\x7e"), (70000, b"\x81\x7f" + struct.pack("!Q", 70000))],
+)
+def test_ws_frame_length_encodings(length, header):
+    frame = ws_frame(b"x" * length)
+    assert frame[: len(header)] == header
+    assert len(frame) == len(header) + length
+
+
+def _recv_frame(sock: socket.socket):
+    def exactly(count: int) -> bytes:
+        data = b""
+        while len(data) < count:
+            chunk = sock.recv(count - len(data))
+            assert chunk
+            data += chunk
+        return data
+
+    head = exactly(2)
+    length = head[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", exactly(2))[0]
+    return head[0] & 0x0F, exactly(length)
+
+
+def _masked(payload: bytes, opcode: int = 0x1) -> bytes:
+    mask = os.urandom(4)
+    body = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return struct.pack("!BB", 0x80 | opcode, 0x80 | len(payload)) + mask + body
+
+
+def test_websocket_handshake_snapshot_and_subscribe(server):
+    with socket.create_connection(("127.0.0.1", server.port), timeout=5) as sock:
+        # The key and accept value from RFC 6455 section 1.3.
+        sock.sendall(
+            b"GET /ws HTTP/1.1\r\nHost: x\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Key: dGhlIHNhbXBsZSBub25jZQ==\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        )
+        head = b""
+        while not head.endswith(b"\r\n\r\n"):
+            head += sock.recv(1)
+        assert head.startswith(b"HTTP/1.1 101 ")
+        assert b"Sec-WebSocket-Accept: s3pPLMBiTxaQ9kYGzzhZRbK+xOo=\r\n" in head
+        assert _recv_frame(sock) == (0x1, b"{}")
+        sock.sendall(_masked(json.dumps({"target": "subscribe", "seq": 1, "zones": "veg", "hz": 2}).encode()))
+        opcode, payload = _recv_frame(sock)
+        reply = json.loads(payload)
+        assert opcode == 0x1 and reply["type"] == "ack" and reply["seq"] == 1
+        assert reply["result"] == {"topics": None, "period": 0.5, "zones": ["veg"]}
+        sock.sendall(_masked(b"hi", opcode=0x9))
+        assert _recv_frame(sock) == (0xA, b"hi")
+        sock.sendall(_masked(b"", opcode=0x8))
+        assert _recv_frame(sock) == (0x8, b"")
+
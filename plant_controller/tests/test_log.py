@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+import json
+import logging
+import queue
+import sys
+
+from plant_controller.utils import log
+
+
+def _record(msg="reading %s", args=("ec",), level=logging.DEBUG, name="sensor", **extra) -> logging.LogRecord:
+    record = logging.LogRecord(name, level, __file__, 1, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def test_rate_limit_drops_repeats_and_reports_suppressed(monkeypatch):
+    clock = [100.0]
+    monkeypatch.setattr(log.time, "monotonic", lambda: clock[0])
+    limiter = log.RateLimitFilter(interval=30.0)
+    assert limiter.filter(_record(args=("ec",)))
+    # Same template with different arguments counts as a repeat.
+    assert not limiter.filter(_record(args=("ph",)))
+    assert not limiter.filter(_record(args=("tds",)))
+    assert limiter.filter(_record(msg="other %s"))
+    clock[0] += 30.0
+    record = _record()
+    assert limiter.filter(record)
+    assert record.suppressed == 2
+
+
+def test_rate_limit_passes_warnings_unless_flagged(monkeypatch):
+    monkeypatch.setattr(log.time, "monotonic", lambda: 100.0)
+    limiter = log.RateLimitFilter(interval=30.0)
+    assert limiter.filter(_record(level=logging.WARNING))
+    assert limiter.filter(_record(level=logging.WARNING))
+    assert limiter.filter(_record(msg="retry", level=logging.WARNING, _rate_limit=True))
+    assert not limiter.filter(_record(msg="retry", level=logging.WARNING, _rate_limit=True))
+
+
+def test_structured_formatter_emits_one_json_object():
+    try:
+        raise RuntimeError("boom")
+    except RuntimeError:
+        exc_info = sys.exc_info()
+    record = _record(level=logging.WARNING, zone="veg", _rate_limit=True)
+    record.exc_info = exc_info
+    line = log.StructuredFormatter().format(record)
+    assert "\n" not in line
+    entry = json.loads(line)
+    assert entry["level"] == "WARNING"
+    assert entry["logger"] == "sensor"
+    assert entry["msg"] == "reading ec"
+    assert entry["zone"] == "veg"
+    assert "_rate_limit" not in entry
+    assert entry["exc"].endswith("RuntimeError: boom")
+    assert isinstance(entry["ts"], float)
+
+
+def test_structured_formatter_stringifies_unknown_types():
+    entry = json.loads(log.StructuredFormatter().format(_record(path=object)))
+    assert entry["path"] == str(object)
+
+
+def test_full_queue_drops_and_counts_without_tracebacks(capsys):
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=1)
+    handler = log._DeferredQueueHandler(log_queue)
+    for index in range(4):
+        handler.handle(_record(msg="record %d", args=(index,)))
+    assert handler.dropped == 3
+    assert capsys.readouterr().err == ""
+    assert log_queue.get_nowait().getMessage() == "record 0"
+    handler.handle(_record(msg="after", args=()))
+    resumed = log_queue.get_nowait()
+    assert resumed.getMessage() == "after"
+    assert resumed.dropped == 3
+    handler.handle(_record(msg="later", args=()))
+    assert not hasattr(log_queue.get_nowait(), "dropped")
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import math
+import os
+
+from plant_controller.comms.metrics import LOOP_BUCKETS, MetricsExporter, labelled
+
+
+def _render(exporter: MetricsExporter) -> list:
+    families = [
+        ("relay_state", "gauge", "Relay output.", labelled("relay", {"pump": True, "fan": False}, {"zone": "veg"})),
+        ("sensor_value", "gauge", "Latest reading.", [({"field": 'a"b\\c\nd'}, math.nan), ({}, 1.5)]),
+        ("limit", "gauge", "Bounds.", [({"side": "hi"}, math.inf), ({"side": "lo"}, -math.inf), ({}, None)]),
+    ]
+    return exporter.render(families).decode("utf-8").split("\n")
+
+
+def test_families_get_help_type_and_escaped_labels():
+    lines = _render(MetricsExporter())
+    assert lines[:4] == [
+        "# HELP plant_relay_state Relay output.",
+        "# TYPE plant_relay_state gauge",
+        'plant_relay_state{zone="veg",relay="pump"} 1',
+        'plant_relay_state{zone="veg",relay="fan"} 0',
+    ]
+    assert 'plant_sensor_value{field="a\\"b\\\\c\\nd"} NaN' in lines
+    assert "plant_sensor_value 1.5" in lines
+    assert 'plant_limit{side="hi"} +Inf' in lines
+    assert 'plant_limit{side="lo"} -Inf' in lines
+    assert "plant_limit NaN" in lines
+    assert lines[-1] == ""
+
+
+def test_loop_histogram_is_cumulative_with_sum_and_count():
+    exporter = MetricsExporter()
+    for duration in (0.004, 0.02, 0.3, 7.0):
+        exporter.observe_loop(duration, deadline=1.0)
+    lines = _render(exporter)
+    buckets = {
+        line.split('le="')[1].split('"')[0]: int(line.rsplit(" ", 1)[1])
+        for line in lines
+        if line.startswith("plant_loop_duration_seconds_bucket")
+    }
+    assert buckets == {
+        **{str(bound): sum(d <= bound for d in (0.004, 0.02, 0.3, 7.0)) for bound in LOOP_BUCKETS},
+        "+Inf": 4,
+    }
+    assert "# TYPE plant_loop_duration_seconds histogram" in lines
+    assert "plant_loop_duration_seconds_count 4" in lines
+    assert float(next(line for line in lines if line.startswith("plant_loop_duration_seconds_sum")).split()[1]) == (
+        0.004 + 0.02 + 0.3 + 7.0
+    )
+    assert "plant_loop_missed_deadlines_total 1" in lines
+
+
+def test_textfile_is_replaced_atomically(tmp_path, monkeypatch):
+    target = tmp_path / "node" / "plant.prom"
+    exporter = MetricsExporter(textfile=target, textfile_interval=0.0)
+    replaced = []
+    real_replace = os.replace
+
+    def recording_replace(src, dst):
+        # The snapshot is complete in the temporary file before it takes the real name.
+        replaced.append((str(src), str(dst), open(src, "rb").read()))
+        real_replace(src, dst)
+
+    monkeypatch.setattr("plant_controller.comms.metrics.os.replace", recording_replace)
+    snapshot = exporter.render([])
+    assert target.read_bytes() == snapshot
+    assert replaced == [(str(target) + ".tmp", str(target), snapshot)]
+    assert not (tmp_path / "node" / "plant.prom.tmp").exists()
+
+
+def test_textfile_interval_and_write_failure(tmp_path, caplog):
+    blocker = tmp_path / "file"
+    blocker.write_text("not a directory")
+    exporter = MetricsExporter(textfile=blocker / "plant.prom", textfile_interval=3600.0)
+    # The parent is a file, so the write fails; render still returns the snapshot.
+    assert exporter.render([]).startswith(b"# HELP plant_loop_duration_seconds")
+    assert "Writing metrics textfile" in caplog.text
+    good = MetricsExporter(textfile=tmp_path / "plant.prom", textfile_interval=3600.0)
+    good.render([])
+    (tmp_path / "plant.prom").unlink()
+    good.render([])
+    # Within the interval the file is not rewritten.
+    assert not (tmp_path / "plant.prom").exists()
@@ -0,0 +1,183 @@
+from __future__ import annotations
+
+import math
+import queue
+import threading
+
+import pytest
+
+from plant_controller import multiprocess
+from plant_controller.multiprocess import (
+    SENSOR_ROW,
+    Supervisor,
+    _PriorityForwarder,
+    acquire,
+    pack_sensors,
+    unpack_sensors,
+)
+from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.seqlock import SeqlockBlock
+
+
+@pytest.fixture
+def block():
+    writer = SeqlockBlock(None, 3, create=True)
+    reader = SeqlockBlock(writer.name, 3)
+    yield writer, reader
+    reader.close()
+    writer.close()
+
+
+def test_seqlock_round_trip(block):
+    writer, reader = block
+    assert all(math.isnan(value) for value in reader.read())
+    writer.write([1.0, 2.0, 3.0])
+    assert reader.read() == (1.0, 2.0, 3.0)
+    assert reader.seq == writer.seq
+
+
+class _RacingPayload:
+    """Lets a write land between the reader's payload copy and its second counter check."""
+
+    def __init__(self, payload, writer: SeqlockBlock, values) -> None:
+        self._payload = payload
+        self._writer = writer
+        self._values = values
+        self.calls = 0
+
+    def unpack_from(self, buf, offset):
+        self.calls += 1
+        copied = self._payload.unpack_from(buf, offset)
+        if self.calls == 1:
+            self._writer.write(self._values)
+        return copied
+
+
+def test_seqlock_read_retries_a_torn_copy(block):
+    writer, reader = block
+    writer.write([1.0, 1.0, 1.0])
+    racing = reader._payload = _RacingPayload(reader._payload, writer, [2.0, 2.0, 2.0])
+    assert reader.read() == (2.0, 2.0, 2.0)
+    assert racing.calls == 2
+
+
+def test_seqlock_read_gives_up_on_a_stuck_writer(block):
+    writer, reader = block
+    # A writer that died mid-update leaves the counter odd.
+    SeqlockBlock._SEQ.pack_into(writer._shm.buf, 0, 7)
+    with pytest.raises(TimeoutError):
+        reader.read(retries=10)
+    writer.write([4.0, 5.0, 6.0])
+    assert reader.read() == (4.0, 5.0, 6.0)
+
+
+def test_sensor_rows_round_trip_and_go_missing_when_stale():
+    first, second = SystemState(), SystemState()
+    first.environment.air_temp_c = 21.0
+    first.timestamp = 100.0
+    second.reservoir.ec = 1.7
+    second.timestamp = 50.0
+    values = pack_sensors([first, second])
+    assert len(values) == 2 * SENSOR_ROW
+    out = [SystemState(), SystemState()]
+    unpack_sensors(values, out, stale_before=90.0)
+    assert out[0].environment.air_temp_c == 21.0
+    # The second row is older than the cutoff: every field reads missing.
+    assert out[1].reservoir.ec is None
+    assert all(math.isnan(value) for value in out[1].values)
+
+
+def _answer(requests, results, replies):
+    def run():
+        for reply in replies:
+            token, command = requests.get(timeout=5)
+            for answer in reply(token):
+                results.put(answer)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_priority_forwarder_skips_stale_answers():
+    requests, results = queue.Queue(), queue.Queue()
+    forward = _PriorityForwarder(requests, results, timeout=5.0)
+    ok = {"type": "ack", "seq": 1, "result": "stopped"}
+    # An answer to an earlier, timed-out request arrives first and is ignored.
+    _answer(requests, results, [lambda token: [(token - 1, {"type": "ack", "result": "old"}), (token, ok)]])
+    assert forward({"target": "estop"}) == "stopped"
+
+
+def test_priority_forwarder_raises_on_nak_and_timeout():
+    requests, results = queue.Queue(), queue.Queue()
+    forward = _PriorityForwarder(requests, results, timeout=0.1)
+    _answer(requests, results, [lambda token: [(token, {"type": "nak", "error": "unknown zone"})]])
+    with pytest.raises(ValueError, match="unknown zone"):
+        forward({"target": "estop", "zone": "x"})
+    with pytest.raises(TimeoutError):
+        forward({"target": "estop"})
+
+
+class _Dead:
+    exitcode = 1
+    pid = 0
+
+    def is_alive(self) -> bool:
+        return False
+
+
+def test_supervisor_restart_backoff(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(multiprocess.time, "monotonic", lambda: now[0])
+    supervisor = Supervisor.__new__(Supervisor)
+    supervisor.backoff_max = 8.0
+    supervisor._processes = {"sensors": _Dead()}
+    supervisor._started = {"sensors": now[0]}
+    supervisor._backoff = {"sensors": 1.0}
+    supervisor._restart_at = {}
+    starts = []
+
+    def start(role):
+        starts.append(now[0])
+        supervisor._processes[role] = _Dead()
+        supervisor._started[role] = now[0]
+
+    supervisor._start = start
+    delays = []
+    for _ in range(5):
+        supervisor._check()
+        delay = supervisor._restart_at["sensors"] - now[0]
+        delays.append(delay)
+        now[0] += delay - 0.5
+        supervisor._check()
+        assert len(starts) == len(delays) - 1
+        now[0] += 0.5
+        supervisor._check()
+    # Quick crashes double the wait up to the cap.
+    assert delays == [1.0, 2.0, 4.0, 8.0, 8.0]
+    # A process that ran for over a minute before dying restarts after the base delay again.
+    now[0] += 120.0
+    supervisor._check()
+    assert supervisor._restart_at["sensors"] - now[0] == 1.0
+
+
+class _FlakyHub:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def refresh(self, state: SystemState) -> None:
+        self.calls += 1
+        if self.calls == 1:
+            raise OSError("I2C read failed")
+        state.reservoir.ph = 6.1
+
+
+def test_acquire_survives_a_failing_hub():
+    flaky, good = _FlakyHub(), _FlakyHub()
+    good.calls = 1
+    states = [SystemState(), SystemState()]
+    acquire([flaky, good], states)
+    assert states[0].reservoir.ph is None and states[0].timestamp > 0
+    assert states[1].reservoir.ph == 6.1
+    acquire([flaky, good], states)
+    assert states[0].reservoir.ph == 6.1
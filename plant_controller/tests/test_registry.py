@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import pytest
+
+from plant_controller.controllers import registry
+from plant_controller.controllers.base import BaseController
+from plant_controller.controllers.registry import BUILTIN_MODULES, build_controllers, register, registered
+from plant_controller.utils.datatypes import SENSOR_FIELDS
+
+
+@pytest.fixture
+def empty_registry(monkeypatch):
+    monkeypatch.setattr(registry, "_REGISTRY", {})
+    monkeypatch.setattr(registry, "BUILTIN_MODULES", ())
+
+
+def _controller(name: str, **kwargs):
+    @register(name, **kwargs)
+    class _Probe(BaseController):
+        def __init__(self, *args) -> None:
+            *self.resources, config = args
+            super().__init__(name, config)
+
+        def update(self, *_args, **_kwargs) -> None:
+            return
+
+    return _Probe
+
+
+def test_build_injects_resources_in_declared_order(empty_registry):
+    _controller("probe", requires=("dosing", "relays"), period_s=5.0, reads=("reservoir.ec",))
+    resources = {"relays": "R", "dosing": "D", "servos": "S"}
+    (probe,) = build_controllers(resources, {"probe": {"setpoint": 3}})
+    assert probe.resources == ["D", "R"]
+    assert probe.config == {"setpoint": 3}
+    assert probe.period_s == 5.0
+    assert probe.read_mask == 1 << SENSOR_FIELDS.index("reservoir.ec")
+
+
+def test_config_period_overrides_the_declared_cadence(empty_registry):
+    _controller("probe", period_s=5.0)
+    (probe,) = build_controllers({}, {"probe": {"period_s": 0.5}})
+    assert probe.period_s == 0.5
+    assert type(probe).period_s == 5.0
+
+
+def test_unknown_resource_or_field_is_rejected(empty_registry):
+    with pytest.raises(ValueError, match="unknown resources: pump"):
+        _controller("probe", requires=("pump",))
+    with pytest.raises(ValueError, match="unknown fields: reservoir.salt"):
+        _controller("probe", reads=("reservoir.salt",))
+
+
+def test_missing_resource_at_build_time(empty_registry):
+    _controller("probe", requires=("syringe",))
+    with pytest.raises(ValueError, match="needs resource syringe"):
+        build_controllers({"relays": object()}, {})
+
+
+def test_duplicate_names_are_rejected(empty_registry):
+    first = _controller("probe")
+    with pytest.raises(ValueError, match="already registered"):
+        _controller("probe")
+    # Registering the same class again (a module imported twice) is harmless.
+    register("probe")(first)
+
+
+def test_builtins_keep_their_order_and_plugins_follow(monkeypatch):
+    monkeypatch.setattr(registry, "_REGISTRY", dict(registry._REGISTRY))
+    _controller("zz_plugin")
+    names = [name for name, _ in registered()]
+    assert names[: len(BUILTIN_MODULES)] == list(BUILTIN_MODULES)
+    assert names[-1] == "zz_plugin"
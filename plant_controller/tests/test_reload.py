@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import logging
+import os
+
+import pytest
+import yaml
+
+from plant_controller.system_manager import SystemManager
+from plant_controller.utils.config_watch import ConfigWatcher
+
+
+BASE = {
+    "ble": {"enabled": False, "baudrate": 115200},
+    "reload": {"inotify": False, "poll_seconds": 0},
+    "relays": {"direct": {"heater": 17, "nutrient_a": 22}},
+    "syringe": {
+        "step_pin": 5,
+        "dir_pin": 6,
+        "enable_pin": 13,
+        "limit_top": 19,
+        "limit_bottom": 26,
+        "steps_per_ml": 200,
+    },
+    "controllers": {"nutrient": {"ec_min": 1.6, "ec_max": 2.0}},
+}
+
+
+def _write(path, data, mtime_s: int) -> None:
+    path.write_text(yaml.safe_dump(data) if isinstance(data, dict) else data)
+    os.utime(path, (mtime_s, mtime_s))
+
+
+def _changed(**sections):
+    data = {key: dict(value) if isinstance(value, dict) else value for key, value in BASE.items()}
+    data.update(sections)
+    return data
+
+
+@pytest.fixture
+def manager(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, BASE, 1_000)
+    system = SystemManager(str(path))
+    system.path = path
+    yield system
+    system.close()
+
+
+def test_invalid_file_keeps_the_running_config(manager, caplog):
+    running = manager.config
+    _write(manager.path, "ble: [unclosed\n", 2_000)
+    with caplog.at_level(logging.ERROR):
+        assert manager.reload_config() is False
+    assert manager.config is running
+    assert "keeping the running config" in caplog.text
+
+
+def test_controllers_and_syringe_are_retuned_in_place(manager):
+    zone = manager.zones[0]
+    nutrient = next(ctrl for ctrl in zone.controllers if ctrl.name == "nutrient")
+    changed = _changed(
+        controllers={"nutrient": {"ec_min": 1.2, "ec_max": 2.0}},
+        syringe={**BASE["syringe"], "steps_per_ml": 250, "refill_channel": "nutrient_a"},
+    )
+    _write(manager.path, changed, 2_000)
+    assert manager.reload_config() is True
+    assert next(ctrl for ctrl in zone.controllers if ctrl.name == "nutrient") is nutrient
+    assert nutrient.ec_min == 1.2
+    assert zone.syringe.cfg.steps_per_ml == 250
+    assert zone.syringe.cfg.refill_channel == "nutrient_a"
+
+
+def test_restart_only_sections_are_reported(manager, caplog):
+    changed = _changed(ble={"enabled": False, "baudrate": 9600}, relays={"direct": {"heater": 18, "nutrient_a": 22}})
+    _write(manager.path, changed, 2_000)
+    with caplog.at_level(logging.WARNING):
+        assert manager.reload_config() is True
+    (warning,) = [record.getMessage() for record in caplog.records if "after a restart" in record.getMessage()]
+    assert warning.endswith(": ble, main.relays")
+    # Pins stay as they were until the restart.
+    assert manager.zones[0].relays.names == {"heater": 17, "nutrient_a": 22}
+
+
+def test_watcher_polling_detects_a_rewrite(tmp_path):
+    path = tmp_path / "config.yaml"
+    _write(path, "loop_hz: 1\n", 1_000)
+    watcher = ConfigWatcher(path, poll_interval=0.0, use_inotify=False)
+    try:
+        assert watcher.mode == "polling"
+        assert not watcher.changed()
+        # Same size and mtime: not a change.
+        _write(path, "loop_hz: 2\n", 1_000)
+        assert not watcher.changed()
+        _write(path, "loop_hz: 2\n", 2_000)
+        assert watcher.changed()
+        assert not watcher.changed()
+        path.unlink()
+        assert not watcher.changed()
+    finally:
+        watcher.close()
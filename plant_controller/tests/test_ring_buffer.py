@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+import math
+from array import array
+
+import pytest
+
+from plant_controller.history.ring_buffer import RingBufferStore
+
+
+def test_array_row_and_extra_columns_round_trip(tmp_path):
+    ring = RingBufferStore(tmp_path / "h.ring", ["a", "b", "c", "pwm"], ["pump"], capacity=4)
+    for i in range(6):
+        ring.append(100.0 + i, i & 1, array("d", [i, math.nan, -i * 0.5]), [i * 10.0])
+    ring.close()
+    reader = RingBufferStore.open_reader(tmp_path / "h.ring")
+    try:
+        rows = list(reader.records())
+        # Four slots; with the ring wrapped, the oldest one is skipped as possibly mid-write.
+        assert [row[0] for row in rows] == [103.0, 104.0, 105.0]
+        ts, mask, a, b, c, pwm = rows[-1]
+        assert (mask, a, c, pwm) == (1, 5.0, -2.5, 50.0)
+        assert math.isnan(b)
+    finally:
+        reader.close()
+
+
+def test_plain_sequence_still_packs(tmp_path):
+    ring = RingBufferStore(tmp_path / "h.ring", ["a", "b"], capacity=2)
+    try:
+        ring.append(1.0, 0, [1.5, 2.5])
+        assert ring.latest() == (1.0, 0, 1.5, 2.5)
+        with pytest.raises(ValueError):
+            ring.append(2.0, 0, [1.0])
+    finally:
+        ring.close()
@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import random
+
+from plant_controller.utils.settle import SettleDetector
+
+
+def _feed(detector: SettleDetector, values, start: float = 0.0, step: float = 5.0):
+    """Add one sample every `step` seconds; return the time `settled()` first held, or None."""
+    for i, value in enumerate(values):
+        now = start + i * step
+        detector.add(now, value)
+        if detector.settled(now):
+            return now
+    return None
+
+
+def test_flat_series_settles_once_min_time_and_half_window_pass():
+    detector = SettleDetector(window_s=30.0, slope_per_min=0.01, band=0.02, min_s=20.0, timeout_s=300.0)
+    detector.start(0.0)
+    assert _feed(detector, [1.8] * 20) == 20.0
+    assert not detector.timed_out
+    assert detector.duration == 20.0
+    assert not detector.active
+
+
+def test_drifting_series_settles_only_after_it_levels_off():
+    detector = SettleDetector(window_s=30.0, slope_per_min=0.01, band=0.02, min_s=20.0, timeout_s=300.0)
+    detector.start(0.0)
+    # Rises 0.05 per sample (0.6 per minute) for a minute, then holds.
+    values = [1.5 + 0.05 * min(i, 12) for i in range(40)]
+    settled_at = _feed(detector, values)
+    assert settled_at is not None and settled_at >= 60.0 + 15.0
+    assert not detector.timed_out
+
+
+def test_noisy_series_times_out():
+    rng = random.Random(7)
+    detector = SettleDetector(window_s=30.0, slope_per_min=0.01, band=0.02, min_s=20.0, timeout_s=120.0)
+    detector.start(0.0)
+    values = [1.8 + rng.uniform(-0.2, 0.2) for _ in range(40)]
+    assert _feed(detector, values) == 120.0
+    assert detector.timed_out
+    assert detector.duration == 120.0
+
+
+def test_idle_detector_counts_as_settled():
+    detector = SettleDetector()
+    assert not detector.active
+    assert detector.settled(0.0)
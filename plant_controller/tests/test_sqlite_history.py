@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import math
+import sqlite3
+
+from plant_controller.history.gorilla import ArchiveReader
+from plant_controller.history.sqlite_history import SQLiteHistory
+
+
+def _history(tmp_path, **kwargs) -> SQLiteHistory:
+    return SQLiteHistory(tmp_path / "history.db", ["a", "b"], batch_size=1000, **kwargs)
+
+
+def test_young_database_uses_finest_level_that_fits(tmp_path):
+    history = _history(tmp_path)
+    start = 1_700_000_000.0
+    for i in range(7200):
+        history.record(start + i, 0, [math.sin(i / 100.0), 1.0])
+    end = start + 7200
+    # The default 24 h window reaches far back before the first row.
+    result = history.query("a", end - 86400, end, max_points=100)
+    assert result["level"] == "rollup_1m"
+    assert len(result["points"]) == 100
+    assert history.query("a", end - 600, end, max_points=100)["level"] == "raw"
+    history.close()
+
+
+def test_pruned_raw_rows_fall_back_to_rollups(tmp_path):
+    history = _history(tmp_path, retention_days=1.0)
+    start = 1_700_000_000.0
+    for hour in range(72):
+        history.record(start + hour * 3600, 0, [float(hour), 1.0])
+    end = start + 71 * 3600
+    result = history.query("a", start, start + 12 * 3600, max_points=100)
+    assert result["level"] == "rollup_1m"
+    assert [v for _, v in result["points"]] == [float(h) for h in range(13)]
+    assert history.query("a", end - 3600, end, max_points=100)["level"] == "raw"
+    history.close()
+
+
+def test_failed_flush_keeps_rows_for_the_next_one(tmp_path):
+    history = _history(tmp_path)
+    # No busy wait, so the lock below fails the write at once.
+    history._conn.close()
+    history._conn = sqlite3.connect(str(history.path), timeout=0, check_same_thread=False)
+    blocker = sqlite3.connect(str(history.path), timeout=0)
+    blocker.execute("BEGIN EXCLUSIVE")
+    history.record(1_700_000_000.0, 0, [1.0, 2.0])
+    history.flush()
+    assert len(history._pending) == 1
+    blocker.rollback()
+    blocker.close()
+    history.record(1_700_000_001.0, 0, [3.0, 4.0])
+    history.flush()
+    assert history._pending == []
+    assert history._conn.execute("SELECT COUNT(*) FROM samples").fetchone()[0] == 2
+    history.close()
+
+
+def test_archive_failure_keeps_rows_and_backs_off(tmp_path):
+    blocked = tmp_path / "archive"
+    blocked.write_text("not a directory")
+    history = _history(tmp_path, retention_days=1.0, archive_dir=blocked, segment_seconds=3600.0)
+    start = 1_700_000_000.0
+    for hour in range(30):
+        history.record(start + hour * 3600, 0, [float(hour), 1.0])
+    history.flush()
+    history._archiver.join()
+    assert history._archive_retry_at > 0
+    assert history._archive_backoff > 60.0
+    history.record(start + 30 * 3600, 0, [30.0, 1.0])
+    history.flush()
+    # Nothing was archived, so nothing expired is deleted and no new attempt starts before the retry time.
+    assert not history._archiver.is_alive()
+    assert history._conn.execute("SELECT MIN(ts) FROM samples").fetchone()[0] == start
+    history.close()
+
+
+def test_expired_rows_are_archived_then_deleted(tmp_path):
+    history = _history(tmp_path, retention_days=1.0, archive_dir=tmp_path / "archive", segment_seconds=3600.0)
+    start = 1_700_000_000.0
+    for hour in range(30):
+        history.record(start + hour * 3600, 0, [float(hour), 1.0])
+    history.flush()
+    history._archiver.join()
+    history.record(start + 30 * 3600, 0, [30.0, 1.0])
+    history.flush()
+    history._archiver.join()
+    # One archive per expired segment, each holding the rows the database no longer has.
+    archived = []
+    for path in sorted((tmp_path / "archive").glob("*.gor")):
+        archived.extend(record[0] for record in ArchiveReader(path).iter_records())
+    assert archived == [start + hour * 3600 for hour in range(len(archived))]
+    assert len(archived) == 6
+    oldest = history._conn.execute("SELECT MIN(ts) FROM samples").fetchone()[0]
+    # Expired rows were deleted, and only ones already archived (no gap between archive and table).
+    assert start < oldest
+    assert oldest in archived
+    history.close()
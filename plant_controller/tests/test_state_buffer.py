@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import threading
+import time
+from array import array
+
+from plant_controller.sensors.hub import SensorPoller
+from plant_controller.utils.datatypes import SystemState
+from plant_controller.utils.seqlock import StateBuffer
+
+
+def _fill(state: SystemState, value: float) -> None:
+    state.values[:] = array("d", [value] * len(state.values))
+
+
+def test_read_into_copies_the_latest_pass():
+    buffer = StateBuffer()
+    _fill(buffer.back, 1.0)
+    buffer.back.timestamp = 10.0
+    buffer.publish()
+    state = SystemState()
+    assert buffer.read_into(state) == 1
+    assert set(state.values) == {1.0} and state.timestamp == 10.0
+    # The next pass starts from the published one, so an untouched field keeps its value.
+    buffer.back.reservoir.ec = 2.0
+    buffer.publish()
+    buffer.read_into(state)
+    assert state.reservoir.ec == 2.0 and state.environment.air_temp_c == 1.0
+
+
+class _RacedState(SystemState):
+    """Publishes a new pass while its first copy is in progress, as a poller thread could."""
+
+    __slots__ = ("buffer", "copies")
+
+    def copy_from(self, other: SystemState) -> None:
+        super().copy_from(other)
+        self.copies += 1
+        if self.copies == 1:
+            _fill(self.buffer.back, 2.0)
+            self.buffer.publish()
+
+
+def test_read_retries_when_a_publish_lands_mid_copy():
+    buffer = StateBuffer()
+    _fill(buffer.back, 1.0)
+    buffer.publish()
+    state = _RacedState()
+    state.buffer, state.copies = buffer, 0
+    assert buffer.read_into(state) == 2
+    assert state.copies == 2
+    assert set(state.values) == {2.0}
+
+
+def test_concurrent_reads_never_mix_passes():
+    buffer = StateBuffer()
+    stop = threading.Event()
+
+    def write() -> None:
+        value = 0.0
+        while not stop.is_set():
+            value += 1.0
+            _fill(buffer.back, value)
+            buffer.publish()
+
+    writer = threading.Thread(target=write)
+    writer.start()
+    try:
+        state = SystemState()
+        for _ in range(2000):
+            buffer.read_into(state)
+            assert len(set(state.values)) == 1
+    finally:
+        stop.set()
+        writer.join()
+
+
+class _FlakyHub:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def refresh(self, state: SystemState) -> None:
+        self.calls += 1
+        if self.calls % 2:
+            raise OSError("DHT22 timeout")
+        state.environment.humidity = 55.0
+
+
+def test_poller_keeps_publishing_after_a_sensor_exception():
+    hub = _FlakyHub()
+    poller = SensorPoller(hub, 0.001)
+    poller.start()
+    try:
+        deadline = time.monotonic() + 5.0
+        while hub.calls < 4 and time.monotonic() < deadline:
+            time.sleep(0.005)
+        state = SystemState()
+        assert poller.read_into(state) >= 3
+        assert state.environment.humidity == 55.0
+        assert state.timestamp > 0
+    finally:
+        poller.stop()
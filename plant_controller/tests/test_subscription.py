@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import pytest
+
+from plant_controller.comms.telemetry import Subscription
+
+
+def test_single_zone_string_is_one_zone():
+    subscription = Subscription.from_command({"target": "subscribe", "zones": "veg"})
+    assert subscription.zones == ("veg",)
+    assert subscription.wants("veg")
+    assert not subscription.wants("v")
+
+
+def test_zone_list_and_default():
+    assert Subscription.from_command({"zones": ["veg", "flower"]}).zones == ("veg", "flower")
+    assert Subscription.from_command({}).zones is None
+
+
+def test_topics_keep_canonical_order_and_accept_a_string():
+    assert Subscription.from_command({"topics": ["relays", "environment"]}).topics == ("environment", "relays")
+    assert Subscription.from_command({"topics": "soil"}).topics == ("soil",)
+
+
+@pytest.mark.parametrize("command", [{"zones": 3}, {"zones": {"veg": 1}}, {"zones": ["veg", 2]}, {"topics": 1}])
+def test_rejects_non_list_values(command):
+    with pytest.raises(ValueError):
+        Subscription.from_command(command)
+
+
+def test_rejects_unknown_topics_and_negative_rate():
+    with pytest.raises(ValueError):
+        Subscription.from_command({"topics": ["weather"]})
+    with pytest.raises(ValueError):
+        Subscription.from_command({"hz": -1})
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import pytest
+
+from plant_controller.hardware.dosing_service import DosingService
+from plant_controller.hardware.gpio import get_gpio
+from plant_controller.hardware.relay_manager import RelayManager
+from plant_controller.hardware.syringe_driver import SyringeConfig, SyringeDriver
+
+
+STEP, DIR, ENABLE, TOP, BOTTOM = 5, 6, 13, 19, 26
+
+
+@pytest.fixture
+def gpio():
+    get_gpio.cache_clear()
+    backend = get_gpio()
+    if not hasattr(backend, "set_input"):
+        pytest.skip("needs the mock GPIO backend")
+    yield backend
+    get_gpio.cache_clear()
+
+
+def _driver() -> SyringeDriver:
+    config = SyringeConfig(STEP, DIR, ENABLE, TOP, BOTTOM, steps_per_ml=100, step_delay=0.0, capacity_ml=5.0)
+    return SyringeDriver(config)
+
+
+def _close_after(gpio, pin: int, pulses: int) -> None:
+    """Pull `pin` low (switch closed) once the step pin has been pulsed `pulses` times."""
+    output = gpio.output
+    count = 0
+
+    def counting_output(out_pin: int, value: bool) -> None:
+        nonlocal count
+        output(out_pin, value)
+        if out_pin == STEP and value:
+            count += 1
+            if count == pulses:
+                gpio.set_input(pin, False)
+
+    gpio.output = counting_output
+
+
+def test_mock_limit_switches_start_released(gpio):
+    driver = _driver()
+    assert gpio.input(TOP) and gpio.input(BOTTOM)
+    driver.position = driver.travel_steps
+    assert driver.move_steps(40, False) == 40
+    assert driver.position == driver.travel_steps - 40
+
+
+def test_edge_callback_stops_a_move_mid_travel(gpio):
+    driver = _driver()
+    assert driver._edges
+    driver.position = driver.travel_steps
+    _close_after(gpio, BOTTOM, 50)
+    assert driver.move_steps(300, False) == 50
+    # Reaching the switch resets the count to the bottom reference.
+    assert driver.position == 0
+    # A switch that is already closed stops the next move before the first step.
+    assert driver.move_steps(10, False) == 0
+
+
+def test_edge_on_the_other_switch_does_not_stop_the_move(gpio):
+    driver = _driver()
+    driver.position = driver.travel_steps
+    _close_after(gpio, TOP, 10)
+    assert driver.move_steps(30, False) == 30
+    assert driver.position == driver.travel_steps - 30
+
+
+def test_falls_back_to_polling_without_edge_detection(gpio):
+    # Edge detection already taken on one pin makes add_event_detect fail, as on the Pi.
+    gpio.add_event_detect(BOTTOM, gpio.FALLING)
+    driver = _driver()
+    assert not driver._edges
+    assert TOP not in gpio._events
+    driver.position = driver.travel_steps
+    _close_after(gpio, BOTTOM, 25)
+    assert driver.move_steps(300, False) == 25
+    assert driver.position == 0
+
+
+def test_close_removes_edge_callbacks(gpio):
+    driver = _driver()
+    assert TOP in gpio._events and BOTTOM in gpio._events
+    driver.close()
+    assert TOP not in gpio._events and BOTTOM not in gpio._events
+
+
+def _plunger(gpio, driver: SyringeDriver, start: int) -> None:
+    """Simulate a barrel: each step moves the plunger and the switches close at either end."""
+    output = gpio.output
+    position = start
+
+    def stepping_output(out_pin: int, value: bool) -> None:
+        nonlocal position
+        output(out_pin, value)
+        if out_pin == STEP and value:
+            position += 1 if gpio.input(DIR) else -1
+            gpio.set_input(TOP, position < driver.travel_steps)
+            gpio.set_input(BOTTOM, position > 0)
+
+    gpio.output = stepping_output
+
+
+def test_dose_larger_than_the_barrel_without_refill_channel_is_short(gpio):
+    driver = _driver()
+    _plunger(gpio, driver, start=100)
+    driver.position = 100
+    valves = []
+    # Only 1 ml is left and nothing to refill from: the plunger is never drawn up against closed valves.
+    assert driver.dispense_ml(3.0, channel="ph_up", valve=valves.append) == pytest.approx(1.0)
+    assert valves == []
+    assert driver.refills == 0
+    assert driver.position == 0
+    assert driver.dosed_ml["ph_up"] == pytest.approx(1.0)
+
+
+def test_short_dose_without_refill_channel_fails_the_job(gpio):
+    driver = _driver()
+    _plunger(gpio, driver, start=50)
+    driver.position = 50
+    relays = RelayManager({}, {"nutrient_a": 20, "main_water": 21})
+    dosing = DosingService(driver, relays)
+    try:
+        job = dosing.submit("nutrient_a", 2.0)
+        assert job.wait(5.0)
+        assert job.status == "failed"
+        assert job.delivered_ml == pytest.approx(0.5)
+        assert "0.500 of 2.000" in job.error
+    finally:
+        dosing.close()
+
+
+def test_hand_loaded_barrel_is_trusted_only_at_the_top_switch(gpio):
+    driver = _driver()
+    _plunger(gpio, driver, start=driver.travel_steps)
+    # Not homed and the plunger is not at the top: nothing is dispensed.
+    assert driver.dispense_ml(1.0, channel="ph_up") == 0.0
+    gpio.set_input(TOP, False)
+    assert driver.dispense_ml(2.0, channel="ph_up") == pytest.approx(2.0)
+    assert driver.position == driver.travel_steps - 200
+    assert driver.refills == 0
+
+
+def test_dose_refills_through_refill_channel(gpio):
+    driver = _driver()
+    driver.cfg.refill_channel = "main_water"
+    _plunger(gpio, driver, start=0)
+    valves = []
+    # Not homed yet: the first refill homes against the top switch.
+    assert driver.dispense_ml(1.0, channel="nutrient_a", valve=valves.append) == pytest.approx(1.0)
+    assert valves == ["main_water", "nutrient_a"]
+    assert driver.refills == 1
+
+
+def test_refill_that_misses_the_top_switch_is_not_counted(gpio):
+    driver = _driver()
+    # Switches never close: the plunger runs past the barrel length without a reference.
+    driver.position = 100
+    with pytest.raises(RuntimeError):
+        driver.refill()
+    assert driver.refills == 0
+    assert driver.position is None
@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import heapq
+import random
+
+import pytest
+
+from plant_controller.utils.timer_wheel import TimerWheel
+
+
+class _HeapReference:
+    def __init__(self) -> None:
+        self._heap = []
+        self._cancelled = set()
+
+    def schedule(self, deadline: float, key: int) -> None:
+        heapq.heappush(self._heap, (deadline, key))
+
+    def cancel(self, key: int) -> None:
+        self._cancelled.add(key)
+
+    def advance(self, now: float):
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, key = heapq.heappop(self._heap)
+            if key not in self._cancelled:
+                due.append((deadline, key))
+        return due
+
+    def next_deadline(self):
+        live = [deadline for deadline, key in self._heap if key not in self._cancelled]
+        return min(live) if live else None
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_matches_heap_reference(seed):
+    rng = random.Random(seed)
+    resolution, slots, levels = 0.01, 8, 3
+    span = resolution * slots**levels
+    now = 1_000.0
+    wheel = TimerWheel(now, resolution=resolution, slots=slots, levels=levels)
+    reference = _HeapReference()
+    timers = []
+    keys = {}
+    for step in range(400):
+        for _ in range(rng.randint(0, 4)):
+            # Mostly near deadlines, some already due, some beyond every level (overflow).
+            offset = rng.choice((rng.uniform(-1, 1) * resolution, rng.uniform(0, span), rng.uniform(0, 3 * span)))
+            timer = wheel.schedule(now + offset, lambda: None)
+            keys[id(timer)] = len(timers)
+            reference.schedule(timer.deadline, len(timers))
+            timers.append(timer)
+        if timers and rng.random() < 0.3:
+            key = rng.randrange(len(timers))
+            timers[key].cancel()
+            reference.cancel(key)
+        assert wheel.next_deadline() == reference.next_deadline(), step
+        # Stand still, cross one bucket, a few buckets, up to a full span, or jump past everything.
+        now += rng.choice((0.0, resolution, rng.uniform(0, 10 * resolution), rng.uniform(0, span), 2 * span))
+        due = wheel.advance(now)
+        assert [timer.deadline for timer in due] == sorted(timer.deadline for timer in due)
+        assert sorted((timer.deadline, keys[id(timer)]) for timer in due) == reference.advance(now), step
+
+
+def test_level_boundaries():
+    # 8 slots of 1 s: level 0 holds deltas below 7 s, level 1 below 56 s, level 2 below 448 s.
+    wheel = TimerWheel(0.0, resolution=1.0, slots=8, levels=3)
+    deadlines = [6.0, 7.0, 55.0, 56.0, 447.0, 448.0, 10_000.0]
+    for deadline in deadlines:
+        wheel.schedule(deadline, lambda: None)
+    fired = []
+    now = 0.0
+    while len(fired) < len(deadlines):
+        nxt = wheel.next_deadline()
+        assert nxt == deadlines[len(fired)]
+        # Just short of the deadline nothing fires; at it, exactly that timer does.
+        assert wheel.advance(nxt - 0.5) == []
+        now = nxt
+        fired.extend(timer.deadline for timer in wheel.advance(now))
+    assert fired == deadlines
+    assert wheel.next_deadline() is None
+
+
+def test_cancelled_timers_never_fire_or_count_as_next():
+    wheel = TimerWheel(0.0, resolution=0.01, slots=8, levels=2)
+    early = wheel.schedule(0.05, lambda: None)
+    late = wheel.schedule(2.0, lambda: None)
+    assert wheel.next_deadline() == 0.05
+    early.cancel()
+    assert wheel.next_deadline() == 2.0
+    late.cancel()
+    assert wheel.next_deadline() is None
+    assert wheel.advance(10.0) == []
+
+
+def test_advance_does_not_move_backwards():
+    wheel = TimerWheel(100.0, resolution=0.01)
+    wheel.schedule(100.5, lambda: None)
+    assert wheel.advance(50.0) == []
+    assert wheel.next_deadline() == 100.5
+    assert [timer.deadline for timer in wheel.advance(100.5)] == [100.5]
@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import logging
+import threading
+
+from plant_controller.controllers.base import BaseController
+from plant_controller.history.ring_buffer import RingBufferStore
+from plant_controller.zone import Zone
+
+
+SYRINGE = {"step_pin": 5, "dir_pin": 6, "enable_pin": 13, "limit_top": 19, "limit_bottom": 26, "step_delay": 0.0}
+
+
+def _zone(**extra) -> Zone:
+    return Zone("main", {"relays": {"direct": {"heater": 17, "fan": 27}}, "syringe": SYRINGE, **extra})
+
+
+class _SlowHeater(BaseController):
+    """Switches the heater on at the end of an update that the test holds open."""
+
+    def __init__(self, relays) -> None:
+        super().__init__("slow_heater", {})
+        self.relays = relays
+        self.entered = threading.Event()
+        self.release = threading.Event()
+
+    def update(self, *_args, **_kwargs) -> None:
+        self.entered.set()
+        self.release.wait(5.0)
+        self.relays.set_state("heater", True)
+
+
+def test_emergency_stop_waits_for_a_running_controller_pass():
+    zone = _zone()
+    try:
+        heater = _SlowHeater(zone.relays)
+        zone.controllers = [heater]
+        loop = threading.Thread(target=zone.run_timers)
+        loop.start()
+        assert heater.entered.wait(5.0)
+        stop = threading.Thread(target=zone.emergency_stop)
+        stop.start()
+        stop.join(0.1)
+        # The stop is held back until the pass ends, rather than being undone by it.
+        assert stop.is_alive()
+        heater.release.set()
+        loop.join(5.0)
+        stop.join(5.0)
+        assert zone.relays.states["heater"] is False
+        assert not heater.enabled
+    finally:
+        zone.close()
+
+
+def test_ring_with_an_old_layout_is_moved_aside(tmp_path, caplog):
+    path = tmp_path / "history.ring"
+    old = RingBufferStore(path, ["air_temp_c"], ["heater"], capacity=4)
+    old.append(1.0, 1, [20.0])
+    old.close()
+    with caplog.at_level(logging.WARNING, logger="plant_controller.zone"):
+        zone = _zone(history={"ring": {"enabled": True, "path": str(path), "capacity": 4}})
+    try:
+        assert zone.ring is not None
+        assert zone.ring.relay_names == ["heater", "fan"]
+        assert len(zone.ring) == 0
+    finally:
+        zone.close()
+    (stale,) = tmp_path.glob("history.ring.*.stale")
+    assert "does not match this configuration" in caplog.text
+    reader = RingBufferStore.open_reader(stale)
+    try:
+        assert reader.relay_names == ["heater"]
+        assert [row[2] for row in reader.records()] == [20.0]
+    finally:
+        reader.close()
@@ -1,16 +1,227 @@
 from __future__ import annotations
 
+import hashlib
+import logging
+import marshal
+import os
 import pathlib
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
-import yaml
 
+logger = logging.getLogger(__name__)
 
-def load_config(path: str | pathlib.Path) -> Dict[str, Any]:
+NoneType = type(None)
+Number = (int, float)
+
+# Schema leaves are types (or tuples of types); dicts list the keys to check, with "*"
+# matching any key; a one-item list checks every element. Unlisted keys pass through.
+_HARDWARE_SCHEMA: Dict[str, Any] = {
+    "sensors": {
+        "background": bool,
+        "poll_hz": Number,
+        "deadband": {"*": Number},
+        "dht22_gpio": (int, NoneType),
+        "ds18b20_bus": (str, NoneType),
+        "ads1115": [{"address": int, "channels": {"*": int}}],
+    },
+    "relays": {
+        "expander_address": (int, NoneType),
+        "expander_bus": int,
+        "expander": {"*": int},
+        "direct": {"*": int},
+    },
+    "servos": {"*": int},
+    "pwm": {"*": {"pwm_pin": int, "dir_pin": (int, NoneType), "frequency": int}},
+    "syringe": {
+        "step_pin": int,
+        "dir_pin": int,
+        "enable_pin": int,
+        "limit_top": int,
+        "limit_bottom": int,
+        "steps_per_ml": Number,
+        "step_delay": Number,
+        "capacity_ml": Number,
+        "refill_channel": (str, NoneType),
+    },
+}
+
+_HISTORY_SCHEMA: Dict[str, Any] = {
+    "ring": {"enabled": bool, "path": str, "capacity": int},
+    "sqlite": {
+        "enabled": bool,
+        "path": str,
+        "batch_size": int,
+        "flush_interval_seconds": Number,
+        "retention_days": Number,
+        "rollup_retention_days": ({"*": Number}, NoneType),
+        "archive_dir": (str, NoneType),
+    },
+}
+
+_CONTROLLERS_SCHEMA: Dict[str, Any] = {"*": {"enabled": bool, "period_s": Number, "max_idle_s": Number}}
+
+CONFIG_SCHEMA: Dict[str, Any] = {
+    "loop_hz": Number,
+    "plugins": [str],
+    "processes": {
+        "enabled": bool,
+        "sensor_hz": Number,
+        "stale_seconds": Number,
+        "estop_timeout_seconds": Number,
+        "restart_backoff_max_seconds": Number,
+    },
+    "reload": {"enabled": bool, "poll_seconds": Number, "inotify": bool},
+    "api": {"enabled": bool, "host": str, "port": int, "queue_size": int},
+    "logging": {
+        "level": str,
+        "format": str,
+        "console": bool,
+        "file": (str, NoneType),
+        "max_bytes": int,
+        "backup_count": int,
+        "rate_limit_seconds": Number,
+    },
+    "metrics": {"enabled": bool, "textfile": (str, NoneType), "textfile_interval_seconds": Number},
+    "ble": {
+        "port": str,
+        "baudrate": int,
+        "enabled": bool,
+        "queue_size": int,
+        "dedupe_window": int,
+        "dedupe_ttl_seconds": Number,
+    },
+    "controllers": _CONTROLLERS_SCHEMA,
+    "history": _HISTORY_SCHEMA,
+    "zones": {"*": {**_HARDWARE_SCHEMA, "controllers": _CONTROLLERS_SCHEMA, "history": _HISTORY_SCHEMA}},
+    **_HARDWARE_SCHEMA,
+}
+
+# Cached configs are only trusted if they were validated against this exact schema.
+_SCHEMA_TAG = hashlib.sha1(repr(CONFIG_SCHEMA).encode("utf-8")).hexdigest()[:12]
+_CACHE_FORMAT = 1
+
+_memo: Dict[str, Tuple[int, int, bytes]] = {}
+
+
+def _type_name(expected: Any) -> str:
+    if isinstance(expected, tuple):
+        return " or ".join(_type_name(item) for item in expected)
+    if isinstance(expected, dict):
+        return "mapping"
+    if isinstance(expected, list):
+        return "list"
+    return "null" if expected is NoneType else expected.__name__
+
+
+def _matches(value: Any, expected: Any) -> bool:
+    if isinstance(expected, dict):
+        return isinstance(value, dict)
+    if isinstance(expected, list):
+        return isinstance(value, list)
+    if expected is int or expected is float:
+        return isinstance(value, expected) and not isinstance(value, bool)
+    return isinstance(value, expected)
+
+
+def _check(value: Any, schema: Any, path: str, errors: List[str]) -> None:
+    options = schema if isinstance(schema, tuple) else (schema,)
+    match = next((option for option in options if _matches(value, option)), None)
+    if match is None:
+        errors.append(f"{path or '<root>'}: expected {_type_name(schema)}, got {type(value).__name__}")
+        return
+    if isinstance(match, dict):
+        for key, item in value.items():
+            sub = match.get(key, match.get("*"))
+            if sub is not None:
+                _check(item, sub, f"{path}.{key}" if path else str(key), errors)
+    elif isinstance(match, list):
+        for index, item in enumerate(value):
+            _check(item, match[0], f"{path}[{index}]", errors)
+
+
+def validate_config(config: Any, source: str = "config") -> Dict[str, Any]:
+    errors: List[str] = []
+    _check(config, CONFIG_SCHEMA, "", errors)
+    if errors:
+        raise ValueError(f"Invalid configuration in {source}: " + "; ".join(errors))
+    return config
+
+
+def _cache_path(cfg_path: pathlib.Path) -> pathlib.Path:
+    return cfg_path.with_name(f".{cfg_path.name}.cache")
+
+
+def _read_cache(cache_path: pathlib.Path) -> Optional[Tuple[int, int, str, bytes]]:
+    try:
+        fmt, tag, mtime_ns, size, digest, payload = marshal.loads(cache_path.read_bytes())
+    except (OSError, EOFError, ValueError, TypeError):
+        return None
+    if fmt != _CACHE_FORMAT or tag != _SCHEMA_TAG:
+        return None
+    return mtime_ns, size, digest, payload
+
+
+def _write_cache(cache_path: pathlib.Path, mtime_ns: int, size: int, digest: str, payload: bytes) -> None:
+    tmp_path = cache_path.with_name(cache_path.name + ".tmp")
+    try:
+        tmp_path.write_bytes(marshal.dumps((_CACHE_FORMAT, _SCHEMA_TAG, mtime_ns, size, digest, payload)))
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # A read-only config directory only costs the cache, not the load.
+        logger.debug("Could not write config cache %s", cache_path, exc_info=True)
+
+
+def _parse(raw: bytes, source: str) -> Dict[str, Any]:
+    import yaml  # Only needed when the cache misses.
+
+    data = yaml.safe_load(raw.decode("utf-8")) or {}
+    return validate_config(data, source)
+
+
+def load_config(path: str | pathlib.Path, use_cache: bool = True) -> Dict[str, Any]:
+    """Load and validate a YAML config, reusing the parsed result while the file is unchanged.
+
+    The parsed, validated config is cached next to the file (``.config.yaml.cache``) keyed
+    by mtime and size, with a SHA-256 of the contents as the fallback check, so YAML is
+    only parsed and validated after a real edit. Each call returns a fresh copy.
+    """
     cfg_path = pathlib.Path(path)
     if not cfg_path.exists():
         raise FileNotFoundError(f"Configuration file not found: {cfg_path}")
-    with cfg_path.open("r", encoding="utf-8") as handle:
-        data = yaml.safe_load(handle) or {}
-    return data
+    if not use_cache:
+        return _parse(cfg_path.read_bytes(), str(cfg_path))
+    stat = cfg_path.stat()
+    key = str(cfg_path.resolve())
+    memo = _memo.get(key)
+    if memo is not None and memo[:2] == (stat.st_mtime_ns, stat.st_size):
+        return marshal.loads(memo[2])
+    cache_path = _cache_path(cfg_path)
+    cached = _read_cache(cache_path)
+    if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+        payload = cached[3]
+    else:
+        raw = cfg_path.read_bytes()
+        digest = hashlib.sha256(raw).hexdigest()
+        if cached is not None and cached[2] == digest:
+            # Touched but unchanged: keep the cached parse and refresh its key.
+            payload = cached[3]
+        else:
+            data = _parse(raw, str(cfg_path))
+            try:
+                payload = marshal.dumps(data)
+            except ValueError:
+                # YAML types marshal cannot hold (dates, sets) just skip the cache.
+                return data
+        _write_cache(cache_path, stat.st_mtime_ns, stat.st_size, digest, payload)
+    _memo[key] = (stat.st_mtime_ns, stat.st_size, payload)
+    return marshal.loads(payload)
+
 
+def merge_config(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = merge_config(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
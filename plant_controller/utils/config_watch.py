@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import pathlib
+import struct
+import sys
+import time
+from typing import Optional, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+_EVENT = struct.Struct("iIII")
+
+
+class ConfigWatcher:
+    """Reports when a config file has been rewritten on disk.
+
+    On Linux an inotify watch on the parent directory catches every save,
+    including editors that write a temp file and rename it over the original.
+    Without inotify, `changed()` compares mtime and size at most once every
+    `poll_interval` seconds. Either way the check never blocks the control loop.
+    """
+
+    def __init__(self, path: str | pathlib.Path, poll_interval: float = 2.0, use_inotify: bool = True) -> None:
+        self.path = pathlib.Path(path).resolve()
+        self.poll_interval = poll_interval
+        self._stamp = self._stat()
+        self._next_poll = time.monotonic() + poll_interval
+        self._fd = self._open_inotify() if use_inotify else None
+
+    @property
+    def mode(self) -> str:
+        return "inotify" if self._fd is not None else "polling"
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _open_inotify(self) -> Optional[int]:
+        if not sys.platform.startswith("linux"):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+        if libc.inotify_add_watch(fd, os.fsencode(self.path.parent), mask) < 0:
+            logger.debug("inotify watch failed (errno %s); polling instead", ctypes.get_errno())
+            os.close(fd)
+            return None
+        return fd
+
+    def _drain_inotify(self) -> bool:
+        name = os.fsencode(self.path.name)
+        hit = False
+        while True:
+            try:
+                data = os.read(self._fd, 4096)
+            except BlockingIOError:
+                return hit
+            offset = 0
+            while offset < len(data):
+                _wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                if data[offset : offset + length].rstrip(b"\0") == name:
+                    hit = True
+                offset += length
+
+    def changed(self) -> bool:
+        if self._fd is not None:
+            if not self._drain_inotify():
+                return False
+        else:
+            now = time.monotonic()
+            if now < self._next_poll:
+                return False
+            self._next_poll = now + self.poll_interval
+        # Both paths confirm with a stat so a save with nothing new is not a change.
+        stamp = self._stat()
+        if stamp is None or stamp == self._stamp:
+            return False
+        self._stamp = stamp
+        return True
+
+    def close(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
@@ -1,50 +1,170 @@
 from __future__ import annotations
 
-from dataclasses import dataclass, field
-from typing import Dict, Optional
+from array import array
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
 
 
-@dataclass
-class EnvironmentReading:
-    air_temp_c: Optional[float] = None
-    humidity: Optional[float] = None
-    co2_ppm: Optional[float] = None
+NAN = float("nan")
 
 
-@dataclass
-class ReservoirReading:
-    water_temp_c: Optional[float] = None
-    ph: Optional[float] = None
-    ec: Optional[float] = None
-    tds: Optional[float] = None
+class _Slot:
+    """One sensor reading stored as a float64 in the shared state vector; NaN means missing."""
 
+    __slots__ = ("index", "name")
 
-@dataclass
-class SoilReading:
-    moisture: Optional[float] = None
+    def __init__(self, index: int) -> None:
+        self.index = index
+        self.name = ""
+
+    def __set_name__(self, owner: type, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj: Optional["_Reading"], owner: Optional[type] = None):
+        if obj is None:
+            return self
+        value = obj._values[self.index]
+        return None if value != value else value
+
+    def __set__(self, obj: "_Reading", value: Optional[float]) -> None:
+        obj._values[self.index] = NAN if value is None else value
+
+
+class _Reading:
+    """Named view over a slice of a SystemState vector; writes go straight to the vector."""
+
+    __slots__ = ("_values",)
+    FIELDS: Tuple[str, ...] = ()
+    OFFSET = 0
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        slots = sorted(
+            (value for value in vars(cls).values() if isinstance(value, _Slot)),
+            key=lambda slot: slot.index,
+        )
+        cls.FIELDS = tuple(slot.name for slot in slots)
+        cls.OFFSET = slots[0].index if slots else 0
+
+    def __init__(self, values: Optional[array] = None, **readings: Optional[float]) -> None:
+        self._values = values if values is not None else array("d", [NAN] * SENSOR_COUNT)
+        for name, value in readings.items():
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        body = ", ".join(f"{name}={getattr(self, name)!r}" for name in self.FIELDS)
+        return f"{type(self).__name__}({body})"
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.FIELDS)
+
+
+class EnvironmentReading(_Reading):
+    __slots__ = ()
+    air_temp_c = _Slot(0)
+    humidity = _Slot(1)
+    co2_ppm = _Slot(2)
+
+
+class ReservoirReading(_Reading):
+    __slots__ = ()
+    water_temp_c = _Slot(3)
+    ph = _Slot(4)
+    ec = _Slot(5)
+    tds = _Slot(6)
+
+
+class SoilReading(_Reading):
+    __slots__ = ()
+    moisture = _Slot(7)
+
+
+SENSOR_COUNT = 8
 
 
-@dataclass
 class NutrientState:
-    last_dose_ml: float = 0.0
-    pending_recipe: Optional[str] = None
+    __slots__ = ("last_dose_ml", "pending_recipe")
+
+    def __init__(self, last_dose_ml: float = 0.0, pending_recipe: Optional[str] = None) -> None:
+        self.last_dose_ml = last_dose_ml
+        self.pending_recipe = pending_recipe
+
+    def __repr__(self) -> str:
+        return f"NutrientState(last_dose_ml={self.last_dose_ml!r}, pending_recipe={self.pending_recipe!r})"
 
 
-@dataclass
 class ActuatorState:
-    relays: Dict[str, bool] = field(default_factory=dict)
-    pwm_outputs: Dict[str, float] = field(default_factory=dict)
-    servos: Dict[str, float] = field(default_factory=dict)
+    __slots__ = ("relays", "pwm_outputs", "servos")
+
+    def __init__(
+        self,
+        relays: Optional[Dict[str, bool]] = None,
+        pwm_outputs: Optional[Dict[str, float]] = None,
+        servos: Optional[Dict[str, float]] = None,
+    ) -> None:
+        self.relays = relays if relays is not None else {}
+        self.pwm_outputs = pwm_outputs if pwm_outputs is not None else {}
+        self.servos = servos if servos is not None else {}
+
+    def __repr__(self) -> str:
+        return f"ActuatorState(relays={self.relays!r}, pwm_outputs={self.pwm_outputs!r}, servos={self.servos!r})"
 
 
-@dataclass
 class SystemState:
-    environment: EnvironmentReading = field(default_factory=EnvironmentReading)
-    reservoir: ReservoirReading = field(default_factory=ReservoirReading)
-    soil: SoilReading = field(default_factory=SoilReading)
-    nutrients: NutrientState = field(default_factory=NutrientState)
-    actuators: ActuatorState = field(default_factory=ActuatorState)
-    timestamp: float = 0.0
+    """Every sensor reading lives in one float64 vector in `SENSOR_FIELDS` order.
+
+    The `environment`, `reservoir` and `soil` sections are views onto it, so
+    `state.values` is already the dense row for history and serializers and a
+    snapshot is a single array copy.
+    """
+
+    __slots__ = ("values", "environment", "reservoir", "soil", "nutrients", "actuators", "timestamp")
+
+    def __init__(
+        self,
+        values: Optional[Iterable[float]] = None,
+        timestamp: float = 0.0,
+        nutrients: Optional[NutrientState] = None,
+        actuators: Optional[ActuatorState] = None,
+    ) -> None:
+        self.values = array("d", values if values is not None else _MISSING)
+        if len(self.values) != SENSOR_COUNT:
+            raise ValueError(f"SystemState needs {SENSOR_COUNT} sensor values, got {len(self.values)}")
+        self.environment = EnvironmentReading(self.values)
+        self.reservoir = ReservoirReading(self.values)
+        self.soil = SoilReading(self.values)
+        self.nutrients = nutrients if nutrients is not None else NutrientState()
+        self.actuators = actuators if actuators is not None else ActuatorState()
+        self.timestamp = timestamp
+
+    def snapshot(self) -> "SystemState":
+        # Sensor readings are copied; nutrient and actuator bookkeeping is shared.
+        return SystemState(self.values, self.timestamp, self.nutrients, self.actuators)
+
+    def copy_from(self, other: "SystemState") -> None:
+        self.values[:] = other.values
+        self.timestamp = other.timestamp
+
+    def __repr__(self) -> str:
+        return (
+            f"SystemState(environment={self.environment!r}, reservoir={self.reservoir!r}, "
+            f"soil={self.soil!r}, timestamp={self.timestamp!r})"
+        )
+
+
+_MISSING = array("d", [NAN] * SENSOR_COUNT)
+
+SENSOR_FIELDS = tuple(
+    f"{section}.{name}"
+    for section, reading_cls in (
+        ("environment", EnvironmentReading),
+        ("reservoir", ReservoirReading),
+        ("soil", SoilReading),
+    )
+    for name in reading_cls.FIELDS
+)
 
 
 @dataclass
@@ -0,0 +1,56 @@
+from __future__ import annotations
+
+import math
+from typing import List, Optional
+
+
+class DosePlanner:
+    """Sizes a nutrient correction from the EC error instead of stepping a fixed dose.
+
+    `gain` is the ml of *each* part (A and B are dosed in equal amounts) that raises
+    one litre of reservoir by 1.0 EC. A plan covers the whole deficit, capped at
+    `max_cycle_ml` per part against a bad reading, and is split into sub-doses of at
+    most `max_sub_dose_ml`. After each dose has mixed in, `observe()` nudges the gain
+    towards the measured response, so later plans land closer to the target.
+    """
+
+    def __init__(
+        self,
+        reservoir_liters: float,
+        gain: float,
+        max_sub_dose_ml: float,
+        max_cycle_ml: float,
+        learning_rate: float = 0.3,
+        min_response: float = 0.02,
+    ) -> None:
+        if reservoir_liters <= 0 or gain <= 0 or max_sub_dose_ml <= 0:
+            raise ValueError("reservoir_liters, gain and max_sub_dose_ml must be positive")
+        self.reservoir_liters = reservoir_liters
+        self.gain = gain
+        self.max_sub_dose_ml = max_sub_dose_ml
+        self.max_cycle_ml = max_cycle_ml
+        self.learning_rate = learning_rate
+        self.min_response = min_response
+
+    def plan(self, ec: float, target: float) -> List[float]:
+        """Per-part sub-doses (ml) that should bring `ec` up to `target`; empty if none needed."""
+        deficit = target - ec
+        if deficit <= 0:
+            return []
+        total = min(deficit * self.gain * self.reservoir_liters, self.max_cycle_ml)
+        if total <= 0:
+            return []
+        count = math.ceil(total / self.max_sub_dose_ml)
+        return [total / count] * count
+
+    def observe(self, ec_before: float, ec_after: float, dosed_ml: float) -> Optional[float]:
+        """Fold one dose's measured EC rise into the gain; returns the new gain, or None if skipped."""
+        rise = ec_after - ec_before
+        # Too small a rise is mostly sensor noise (or the dose never reached the probe).
+        if dosed_ml <= 0 or rise < self.min_response:
+            return None
+        observed = dosed_ml / (rise * self.reservoir_liters)
+        # One odd reading may move the estimate, but never by more than 4x.
+        observed = min(max(observed, self.gain / 4.0), self.gain * 4.0)
+        self.gain += self.learning_rate * (observed - self.gain)
+        return self.gain
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import logging.handlers
+import pathlib
+import queue
+import threading
+import time
+from typing import Any, Dict, Optional, Tuple
+
+
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class StructuredFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are kept as top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class RateLimitFilter(logging.Filter):
+    """Drops repeats of the same message template within `interval` seconds.
+
+    Applies to records at or below `max_level`, and to any record logged with
+    ``extra={"_rate_limit": True}`` (e.g. a warning raised from a retry loop).
+    """
+
+    def __init__(self, interval: float = 30.0, max_level: int = logging.DEBUG) -> None:
+        super().__init__()
+        self.interval = interval
+        self.max_level = max_level
+        self._seen: Dict[Tuple[str, Any], Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > self.max_level and not getattr(record, "_rate_limit", False):
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            last, suppressed = self._seen.get(key, (0.0, 0))
+            if now - last < self.interval:
+                self._seen[key] = (last, suppressed + 1)
+                return False
+            self._seen[key] = (now, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _DeferredQueueHandler(logging.handlers.QueueHandler):
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]") -> None:
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._pending_drops = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock handler formats here, on the caller's thread; leave that to the listener.
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        # A full queue means the listener is behind; shed the record rather than let
+        # handleError print a traceback for each one. The next record carries the count.
+        if self._pending_drops:
+            record.dropped = self._pending_drops
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            self._pending_drops += 1
+        else:
+            self._pending_drops = 0
+
+
+def configure_logging(config: Optional[Dict[str, Any]] = None) -> logging.handlers.QueueListener:
+    cfg = config or {}
+    level = getattr(logging, str(cfg.get("level", "INFO")).upper(), logging.INFO)
+    if cfg.get("format", "json") == "json":
+        formatter: logging.Formatter = StructuredFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    handlers = []
+    if cfg.get("console", True):
+        console = logging.StreamHandler()
+        console.setFormatter(formatter)
+        handlers.append(console)
+    log_file = cfg.get("file")
+    if log_file:
+        path = pathlib.Path(log_file)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        rotating = logging.handlers.RotatingFileHandler(
+            path,
+            maxBytes=int(cfg.get("max_bytes", 1_000_000)),
+            backupCount=int(cfg.get("backup_count", 3)),
+            encoding="utf-8",
+        )
+        rotating.setFormatter(formatter)
+        handlers.append(rotating)
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=int(cfg.get("queue_size", 10000)))
+    queue_handler = _DeferredQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(float(cfg.get("rate_limit_seconds", 30.0))))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(level)
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+
+    def _flush_on_exit() -> None:
+        if listener._thread is not None:
+            listener.stop()
+
+    atexit.register(_flush_on_exit)
+    return listener
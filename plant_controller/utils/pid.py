@@ -13,6 +13,12 @@ class PID:
         self._last_error = 0.0
         self._last_time = time.time()
 
+    def tune(self, kp: float, ki: float, kd: float) -> None:
+        # New gains apply from the next compute; the integral and last error carry over.
+        self.kp = kp
+        self.ki = ki
+        self.kd = kd
+
     def reset(self) -> None:
         self._integral = 0.0
         self._last_error = 0.0
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import struct
+from typing import Iterable, Optional, Tuple
+
+from plant_controller.utils.datatypes import SystemState
+
+
+class SeqlockBlock:
+    """Float64 slots in shared memory with one writer, published through a sequence lock.
+
+    The writer makes the counter odd, copies the payload, then makes it even
+    again. A reader copies the payload and keeps the copy only if it saw the
+    same even counter before and after. Readers never block the writer and
+    never keep a half-written row.
+    """
+
+    _SEQ = struct.Struct("<Q")
+
+    def __init__(self, name: Optional[str], slots: int, create: bool = False) -> None:
+        self.slots = slots
+        self._payload = struct.Struct(f"<{slots}d")
+        size = self._SEQ.size + self._payload.size
+        # Only multi-process mode needs shared memory; keep it off the single-process import path.
+        from multiprocessing import shared_memory
+
+        self._shm = shared_memory.SharedMemory(name=name, create=create, size=size if create else 0)
+        if not create and self._shm.size < size:
+            self._shm.close()
+            raise ValueError(f"Shared block {name} holds fewer than {slots} slots")
+        self.name = self._shm.name
+        self._owner = create
+        self.seq = 0
+        if create:
+            self._SEQ.pack_into(self._shm.buf, 0, 0)
+            self.write([float("nan")] * slots)
+
+    def write(self, values: Iterable[float]) -> None:
+        buf = self._shm.buf
+        # A writer that died mid-update leaves the counter odd; carry on from there.
+        odd = self._SEQ.unpack_from(buf, 0)[0] | 1
+        self._SEQ.pack_into(buf, 0, odd)
+        self._payload.pack_into(buf, self._SEQ.size, *values)
+        self._SEQ.pack_into(buf, 0, odd + 1)
+        self.seq = odd + 1
+
+    def read(self, retries: int = 1000) -> Tuple[float, ...]:
+        buf = self._shm.buf
+        for _ in range(retries):
+            before = self._SEQ.unpack_from(buf, 0)[0]
+            if before & 1:
+                continue
+            values = self._payload.unpack_from(buf, self._SEQ.size)
+            if self._SEQ.unpack_from(buf, 0)[0] == before:
+                self.seq = before
+                return values
+        raise TimeoutError(f"Shared block {self.name} is stuck mid-write")
+
+    def close(self) -> None:
+        self._shm.close()
+        if self._owner:
+            self._shm.unlink()
+
+
+class StateBuffer:
+    """Double-buffered SystemState for one writer thread and any number of readers.
+
+    The writer fills `back` and calls `publish()`. That flips the buffers and
+    bumps `seq`. Readers copy the front buffer and retry if `seq` moved during
+    the copy. They always get one whole acquisition pass, for example `ec` and
+    `tds` from the same ADC read, without a lock on either side.
+    """
+
+    def __init__(self) -> None:
+        self._buffers = (SystemState(), SystemState())
+        self._front = 0
+        self.seq = 0
+
+    @property
+    def back(self) -> SystemState:
+        return self._buffers[1 - self._front]
+
+    def publish(self) -> None:
+        front = 1 - self._front
+        self._front = front
+        self.seq += 1
+        # The next pass starts from what was just published; a reader still copying
+        # the old front sees `seq` change and retries.
+        self._buffers[1 - front].copy_from(self._buffers[front])
+
+    def read_into(self, state: SystemState) -> int:
+        while True:
+            seq = self.seq
+            state.copy_from(self._buffers[self._front])
+            if self.seq == seq:
+                return seq
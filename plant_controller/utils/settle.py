@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+
+class SettleDetector:
+    """Decides when a reading has stopped moving after a disturbance such as a dose.
+
+    Samples from the last `window_s` seconds are fitted with a straight line. The
+    reading counts as settled once `min_s` has passed, the window covers at least
+    half its length, the fitted slope is within `slope_per_min` and the samples'
+    standard deviation is within `band`. After `timeout_s` it counts as settled
+    regardless.
+    """
+
+    def __init__(
+        self,
+        window_s: float = 30.0,
+        slope_per_min: float = 0.01,
+        band: float = 0.02,
+        min_s: float = 20.0,
+        timeout_s: float = 300.0,
+    ) -> None:
+        self.tune(window_s, slope_per_min, band, min_s, timeout_s)
+        self.started: Optional[float] = None
+        self.timed_out = False
+        self.duration = 0.0
+        self._samples: Deque[Tuple[float, float]] = deque()
+
+    def tune(self, window_s: float, slope_per_min: float, band: float, min_s: float, timeout_s: float) -> None:
+        self.window_s = window_s
+        self.slope_per_min = slope_per_min
+        self.band = band
+        self.min_s = min_s
+        self.timeout_s = timeout_s
+
+    @property
+    def active(self) -> bool:
+        return self.started is not None
+
+    def start(self, now: float) -> None:
+        self.started = now
+        self.timed_out = False
+        self._samples.clear()
+
+    def add(self, now: float, value: float) -> None:
+        samples = self._samples
+        samples.append((now, value))
+        while samples and samples[0][0] < now - self.window_s:
+            samples.popleft()
+
+    def settled(self, now: float) -> bool:
+        """True once settled (or timed out); the detector is then idle until the next `start()`."""
+        if self.started is None:
+            return True
+        elapsed = now - self.started
+        if elapsed >= self.timeout_s:
+            self.timed_out = True
+        elif elapsed < self.min_s or not self._steady():
+            return False
+        self.started = None
+        self.duration = elapsed
+        return True
+
+    def _steady(self) -> bool:
+        samples = self._samples
+        if len(samples) < 3 or samples[-1][0] - samples[0][0] < self.window_s / 2.0:
+            return False
+        n = len(samples)
+        mean_t = sum(t for t, _ in samples) / n
+        mean_v = sum(v for _, v in samples) / n
+        var_t = sum((t - mean_t) ** 2 for t, _ in samples)
+        if var_t <= 0:
+            return False
+        slope = sum((t - mean_t) * (v - mean_v) for t, v in samples) / var_t
+        spread = math.sqrt(sum((v - mean_v) ** 2 for _, v in samples) / n)
+        return abs(slope) * 60.0 <= self.slope_per_min and spread <= self.band
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+from typing import Callable, List, Optional
+
+
+class Timer:
+    __slots__ = ("deadline", "callback", "active")
+
+    def __init__(self, deadline: float, callback: Callable[[], None]) -> None:
+        self.deadline = deadline
+        self.callback = callback
+        self.active = True
+
+    def cancel(self) -> None:
+        # Cancelled timers stay in their slot and are dropped the next time it is swept.
+        self.active = False
+
+
+class TimerWheel:
+    """Hierarchical timing wheel for one-shot deadlines (any clock, in seconds).
+
+    Level 0 has `slots` buckets of `resolution` seconds; each level above covers
+    `slots` times the span of the one below (the defaults reach about 46 h, later
+    deadlines wait in an overflow list). Scheduling is O(1). `advance(now)` sweeps
+    only the buckets the clock moved across and re-files timers that are not due
+    yet onto a finer level. `next_deadline()` looks at the first occupied bucket
+    of each level, so the loop can sleep until exactly the earliest deadline.
+    """
+
+    def __init__(self, now: float, resolution: float = 0.01, slots: int = 64, levels: int = 4) -> None:
+        self.resolution = resolution
+        self._slots = slots
+        self._widths = [slots**level for level in range(levels)]
+        self._wheels: List[List[List[Timer]]] = [[[] for _ in range(slots)] for _ in range(levels)]
+        self._overflow: List[Timer] = []
+        self._tick = self._to_tick(now)
+
+    def _to_tick(self, when: float) -> int:
+        return int(when // self.resolution)
+
+    def _file(self, timer: Timer) -> None:
+        tick = max(self._to_tick(timer.deadline), self._tick)
+        delta = tick - self._tick
+        for level, width in enumerate(self._widths):
+            # One bucket short of a full turn, so a bucket never mixes this turn and the next.
+            if delta < (self._slots - 1) * width:
+                self._wheels[level][(tick // width) % self._slots].append(timer)
+                return
+        self._overflow.append(timer)
+
+    def schedule(self, deadline: float, callback: Callable[[], None]) -> Timer:
+        timer = Timer(deadline, callback)
+        self._file(timer)
+        return timer
+
+    def advance(self, now: float) -> List[Timer]:
+        """Move the clock to `now` and return the timers that fell due, earliest first."""
+        target = max(self._to_tick(now), self._tick)
+        swept: List[Timer] = []
+        for level, width in enumerate(self._widths):
+            start, end = self._tick // width, target // width
+            for index in range(start, min(end, start + self._slots - 1) + 1):
+                bucket = self._wheels[level][index % self._slots]
+                if bucket:
+                    swept.extend(bucket)
+                    bucket.clear()
+        if self._overflow:
+            swept.extend(self._overflow)
+            self._overflow.clear()
+        self._tick = target
+        due: List[Timer] = []
+        for timer in swept:
+            if not timer.active:
+                continue
+            if timer.deadline <= now:
+                timer.active = False
+                due.append(timer)
+            else:
+                self._file(timer)
+        due.sort(key=lambda timer: timer.deadline)
+        return due
+
+    def next_deadline(self) -> Optional[float]:
+        best: Optional[float] = None
+        for level, width in enumerate(self._widths):
+            cursor = self._tick // width
+            for offset in range(self._slots):
+                live = [timer.deadline for timer in self._wheels[level][(cursor + offset) % self._slots] if timer.active]
+                if live:
+                    earliest = min(live)
+                    best = earliest if best is None else min(best, earliest)
+                    break
+        for timer in self._overflow:
+            if timer.active and (best is None or timer.deadline < best):
+                best = timer.deadline
+        return best
@@ -0,0 +1,381 @@
+from __future__ import annotations
+
+import logging
+import pathlib
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from plant_controller.comms.metrics import Family, labelled
+from plant_controller.comms.telemetry import TelemetryEncoder
+from plant_controller.controllers.base import BaseController
+from plant_controller.controllers.registry import build_controllers
+from plant_controller.hardware.dosing_service import PRIORITY_MANUAL, DosingService
+from plant_controller.hardware.pwm_channel import PWMChannel
+from plant_controller.hardware.relay_manager import RelayManager
+from plant_controller.hardware.servo_driver import ServoDriver
+from plant_controller.hardware.syringe_driver import SyringeConfig, SyringeDriver
+from plant_controller.sensors.hub import ChangeTracker, SensorHub, SensorPoller
+from plant_controller.utils.config import merge_config
+from plant_controller.utils.datatypes import SENSOR_FIELDS, SystemState
+
+if TYPE_CHECKING:
+    from plant_controller.history.ring_buffer import RingBufferStore
+    from plant_controller.history.sqlite_history import SQLiteHistory
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ZONE = "main"
+ZONE_KEYS = ("sensors", "relays", "servos", "pwm", "syringe")
+
+
+class NullServos:
+    angles: Dict[str, float] = {}
+
+    def set_angle(self, *_args, **_kwargs) -> None:
+        return
+
+
+class NullPWM:
+    signed_output = 0.0
+
+    def set_output(self, *_args, **_kwargs) -> None:
+        return
+
+    def stop(self) -> None:
+        return
+
+
+def _suffixed(path: str, name: str) -> str:
+    p = pathlib.Path(path)
+    return str(p.with_name(f"{p.stem}.{name}{p.suffix}"))
+
+
+def zone_configs(config: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Resolve the ``zones`` section into one self-contained config per zone.
+
+    Without a ``zones`` section the top-level hardware keys form a single zone.
+    Zone controller settings are merged over the top-level ``controllers`` and,
+    when several zones exist, history files get the zone name as a suffix.
+    """
+    zones = config.get("zones")
+    if not zones:
+        return [(DEFAULT_ZONE, config)]
+    shared = len(zones) > 1
+    resolved = []
+    for name, zone_cfg in zones.items():
+        zone_cfg = zone_cfg or {}
+        cfg: Dict[str, Any] = {key: zone_cfg.get(key, {}) for key in ZONE_KEYS}
+        cfg["syringe"] = zone_cfg.get("syringe")
+        cfg["controllers"] = merge_config(config.get("controllers", {}), zone_cfg.get("controllers", {}))
+        own_history = zone_cfg.get("history", {})
+        history = merge_config(config.get("history", {}), own_history)
+        if shared:
+            # Zones must never append to the same ring file or database.
+            for store, default in (("ring", "history.ring"), ("sqlite", "history.db")):
+                store_cfg = dict(history.get(store, {}))
+                own = own_history.get(store, {})
+                if "path" not in own:
+                    store_cfg["path"] = _suffixed(store_cfg.get("path", default), str(name))
+                if store_cfg.get("archive_dir") and "archive_dir" not in own:
+                    store_cfg["archive_dir"] = str(pathlib.Path(store_cfg["archive_dir"]) / str(name))
+                history[store] = store_cfg
+        cfg["history"] = history
+        resolved.append((str(name), cfg))
+    return resolved
+
+
+class Zone:
+    """One grow space: its sensors, actuators, controllers and history stores."""
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        tag_telemetry: bool = False,
+        acquire: bool = True,
+        notify: Optional[Callable[[], None]] = None,
+    ) -> None:
+        self.name = name
+        self.config = config
+        self.state = SystemState()
+        # Held for a controller pass and for an emergency stop, so a controller that is mid-update
+        # cannot switch an output back on after the stop turned it off.
+        self._control_lock = threading.Lock()
+        # Without acquisition the readings are filled in from elsewhere (the sensor process).
+        self.sensor_hub = SensorHub(config) if acquire else None
+        self.poller = self._build_poller(config.get("sensors", {}))
+        self.changes = ChangeTracker(config.get("sensors", {}).get("deadband"))
+        relays_cfg = config.get("relays", {})
+        self.relays = RelayManager(
+            expander_pins=relays_cfg.get("expander", {}),
+            direct_pins=relays_cfg.get("direct", {}),
+            expander_address=relays_cfg.get("expander_address"),
+            expander_bus=relays_cfg.get("expander_bus", 1),
+        )
+        servo_cfg = config.get("servos", {})
+        self.servos = ServoDriver(servo_cfg) if servo_cfg else NullServos()
+        self.servo_names = list(servo_cfg.keys())
+        pwm_cfg = config.get("pwm", {})
+        air_cfg = pwm_cfg.get("air_peltier")
+        water_cfg = pwm_cfg.get("water_peltier")
+        self.air_pwm = PWMChannel(**air_cfg) if air_cfg else NullPWM()
+        self.water_pwm = PWMChannel(**water_cfg) if water_cfg else NullPWM()
+        syringe_cfg_data = config.get("syringe")
+        if not syringe_cfg_data:
+            raise ValueError(f"Syringe configuration missing for zone {name}")
+        syringe_cfg = SyringeConfig(**syringe_cfg_data)
+        self.syringe = SyringeDriver(syringe_cfg)
+        # Every syringe move goes through this queue; `notify` wakes the loop when a job finishes.
+        self.dosing = DosingService(self.syringe, self.relays, name=name, notify=notify)
+        self.controllers = self._build_controllers(config.get("controllers", {}))
+        self.telemetry = TelemetryEncoder(self.relays.names, name if tag_telemetry else None)
+        self._labels = {"zone": name}
+        history_cfg = config.get("history", {})
+        self.ring = self._build_ring(history_cfg.get("ring", {}))
+        self.history = self._build_history(history_cfg.get("sqlite", {}))
+
+    def _build_poller(self, cfg: dict) -> Optional[SensorPoller]:
+        if self.sensor_hub is None or not cfg.get("background", False):
+            return None
+        hz = float(cfg.get("poll_hz", 1.0))
+        if hz <= 0:
+            raise ValueError("sensors.poll_hz must be positive")
+        poller = SensorPoller(self.sensor_hub, 1.0 / hz, name=self.name)
+        poller.start()
+        return poller
+
+    def _build_ring(self, cfg: dict) -> Optional[RingBufferStore]:
+        if not cfg.get("enabled", False):
+            return None
+        from plant_controller.history.ring_buffer import RingBufferStore
+
+        columns = list(SENSOR_FIELDS)
+        columns += ["pwm.air_peltier", "pwm.water_peltier"]
+        columns += [f"servo.{name}" for name in self.servo_names]
+        path = pathlib.Path(cfg.get("path", "history.ring"))
+        capacity = cfg.get("capacity", 604800)
+        try:
+            return RingBufferStore(path, columns, list(self.relays.names), capacity=capacity)
+        except ValueError:
+            if not path.exists():
+                raise
+        # A ring left by an older layout (new relays, servos or sensor fields) is kept
+        # for offline reading rather than stopping the controller from starting.
+        stale = path.with_name(f"{path.name}.{time.strftime('%Y%m%d-%H%M%S')}.stale")
+        logger.warning("History ring %s does not match this configuration; moved it to %s", path, stale, exc_info=True)
+        path.replace(stale)
+        return RingBufferStore(path, columns, list(self.relays.names), capacity=capacity)
+
+    def _build_history(self, cfg: dict) -> Optional[SQLiteHistory]:
+        if not cfg.get("enabled", False):
+            return None
+        from plant_controller.history.sqlite_history import SQLiteHistory
+
+        return SQLiteHistory(
+            cfg.get("path", "history.db"),
+            [name.split(".")[-1] for name in SENSOR_FIELDS],
+            batch_size=cfg.get("batch_size", 60),
+            flush_interval=cfg.get("flush_interval_seconds", 60.0),
+            retention_days=cfg.get("retention_days", 14.0),
+            rollup_retention_days=cfg.get("rollup_retention_days"),
+            archive_dir=cfg.get("archive_dir"),
+            relay_names=list(self.relays.names),
+        )
+
+    def _record_history(self) -> None:
+        angles = self.servos.angles
+        extra = [self.air_pwm.signed_output, self.water_pwm.signed_output]
+        extra += [angles.get(name, float("nan")) for name in self.servo_names]
+        # The sensor row goes into the mapped slot as one byte copy of state.values.
+        self.ring.append(self.state.timestamp, self.relays.bitmask, self.state.values, extra)
+
+    def _build_controllers(self, cfg: dict) -> List[BaseController]:
+        resources = {
+            "relays": self.relays,
+            "servos": self.servos,
+            "air_pwm": self.air_pwm,
+            "water_pwm": self.water_pwm,
+            "syringe": self.syringe,
+            "dosing": self.dosing,
+        }
+        return build_controllers(resources, cfg)
+
+    def reconfigure(self, config: Dict[str, Any]) -> List[str]:
+        """Apply a reloaded zone config in place and return the sections that need a restart.
+
+        Controller settings, syringe calibration and sensor poll rate change on the
+        running objects. Pin assignments and history stores keep their old values
+        until the service restarts.
+        """
+        old, self.config = self.config, config
+        new_controllers = config.get("controllers", {})
+        old_controllers = old.get("controllers", {})
+        for ctrl in self.controllers:
+            cfg = new_controllers.get(ctrl.name, {})
+            if cfg != old_controllers.get(ctrl.name, {}):
+                ctrl.reconfigure(cfg)
+                logger.info("Controller reconfigured", extra={"zone": self.name, "controller": ctrl.name})
+        restart = [key for key in ("relays", "servos", "pwm", "history") if config.get(key, {}) != old.get(key, {})]
+        if self._reconfigure_sensors(config.get("sensors", {}), old.get("sensors", {})):
+            restart.append("sensors")
+        if self._reconfigure_syringe(config.get("syringe") or {}, old.get("syringe") or {}):
+            restart.append("syringe")
+        return restart
+
+    def _reconfigure_sensors(self, cfg: dict, old: dict) -> bool:
+        live = ("background", "poll_hz", "deadband")
+        if {k: v for k, v in cfg.items() if k not in live} != {k: v for k, v in old.items() if k not in live}:
+            return True
+        if cfg.get("deadband") != old.get("deadband"):
+            # A fresh tracker reports every field once, so each controller re-evaluates.
+            self.changes = ChangeTracker(cfg.get("deadband"))
+        if self.sensor_hub is None or all(cfg.get(key) == old.get(key) for key in ("background", "poll_hz")):
+            return False
+        if self.poller is not None:
+            self.poller.stop()
+            # Hand the last complete pass over so the next tick does not see a blank state.
+            self.poller.read_into(self.state)
+        self.poller = self._build_poller(cfg)
+        logger.info("Sensor polling reconfigured", extra={"zone": self.name, "background": self.poller is not None})
+        return False
+
+    def _reconfigure_syringe(self, cfg: dict, old: dict) -> bool:
+        live = ("steps_per_ml", "step_delay", "capacity_ml", "refill_channel")
+        if {k: v for k, v in cfg.items() if k not in live} != {k: v for k, v in old.items() if k not in live}:
+            return True
+        if cfg != old:
+            self.syringe.cfg.steps_per_ml = cfg.get("steps_per_ml", SyringeConfig.steps_per_ml)
+            self.syringe.cfg.step_delay = cfg.get("step_delay", SyringeConfig.step_delay)
+            self.syringe.cfg.capacity_ml = cfg.get("capacity_ml", SyringeConfig.capacity_ml)
+            self.syringe.cfg.refill_channel = cfg.get("refill_channel", SyringeConfig.refill_channel)
+            logger.info("Syringe calibration reconfigured", extra={"zone": self.name})
+        return False
+
+    def _run_controllers(self, changed: int) -> None:
+        with self._control_lock:
+            for controller in self.controllers:
+                if controller.should_run(controller.period_s, changed):
+                    controller.update(self.state)
+
+    def run_timers(self) -> None:
+        """Run controllers whose time trigger has passed, on the last readings, between ticks."""
+        self._run_controllers(0)
+        self.telemetry.update(self.state, self.relays.states)
+
+    def tick(self) -> None:
+        if self.poller is not None:
+            self.poller.read_into(self.state)
+        elif self.sensor_hub is not None:
+            self.sensor_hub.refresh(self.state)
+        self.state.timestamp = time.time()
+        self._run_controllers(self.changes.update(self.state.values))
+        if self.ring is not None:
+            self._record_history()
+        if self.history is not None:
+            self.history.record(self.state.timestamp, self.relays.bitmask, self.state.values)
+        self.telemetry.update(self.state, self.relays.states)
+
+    def handle_command(self, command: Dict) -> Any:
+        target = command.get("target")
+        if target == "relay":
+            name = command.get("name")
+            if name not in self.relays.names:
+                raise ValueError(f"Unknown relay {name}")
+            state = bool(command.get("state", False))
+            self.relays.set_state(name, state)
+            return {"name": name, "state": state}
+        if target == "controller":
+            name = command.get("name")
+            enabled = bool(command.get("enabled", True))
+            matched = [ctrl for ctrl in self.controllers if ctrl.name == name]
+            if not matched:
+                raise ValueError(f"Unknown controller {name}")
+            for ctrl in matched:
+                ctrl.enabled = enabled
+                ctrl.wake()
+            return {"name": name, "enabled": enabled}
+        if target == "dose":
+            channel = command.get("channel", "nutrient_a")
+            amount = float(command.get("amount", 1.0))
+            if channel not in ("nutrient_a", "nutrient_b"):
+                raise ValueError(f"Unknown dose channel {channel}")
+            job = self.dosing.submit(channel, amount, priority=PRIORITY_MANUAL)
+            logger.info(
+                "Manual dose queued",
+                extra={"zone": self.name, "channel": channel, "ml": amount, "job": job.id},
+            )
+            return {"channel": channel, "amount": amount, "job": job.id}
+        if target == "dosing":
+            if "job" not in command:
+                return self.dosing.describe()
+            job_id = int(command["job"])
+            job = self.dosing.job(job_id)
+            if job is None:
+                raise ValueError(f"Unknown or expired dosing job {job_id}")
+            return job.describe()
+        if target == "history":
+            if self.history is None:
+                raise ValueError("History store is disabled")
+            end = float(command.get("end", time.time()))
+            start = float(command.get("start", end - 86400.0))
+            return self.history.query(
+                command.get("field", ""),
+                start,
+                end,
+                max_points=int(command.get("max_points", 100)),
+                method=command.get("method", "lttb"),
+            )
+        raise ValueError(f"Unknown command target {target}")
+
+    def emergency_stop(self) -> None:
+        # Runs on a command reader thread; controllers stay disabled until re-enabled by command.
+        logger.warning("Emergency stop: disabling controllers and switching outputs off", extra={"zone": self.name})
+        with self._control_lock:
+            for ctrl in self.controllers:
+                ctrl.enabled = False
+            self.dosing.cancel_all()
+            self.syringe.disable()
+            self.air_pwm.set_output(0.0)
+            self.water_pwm.set_output(0.0)
+            for name in self.relays.names:
+                self.relays.set_state(name, False)
+
+    def metric_families(self) -> Iterator[Family]:
+        labels = self._labels
+        sensors = zip(SENSOR_FIELDS, self.state.values)
+        yield "sensor_value", "gauge", "Latest sensor reading.", (
+            ({**labels, "field": name.split(".")[-1]}, value) for name, value in sensors
+        )
+        yield "relay_state", "gauge", "Relay output (1 = energised).", labelled("relay", self.relays.states, labels)
+        yield "pwm_duty_percent", "gauge", "Peltier PWM duty, negative when reversed.", (
+            ({**labels, "channel": "air_peltier"}, self.air_pwm.signed_output),
+            ({**labels, "channel": "water_peltier"}, self.water_pwm.signed_output),
+        )
+        yield "servo_angle_degrees", "gauge", "Last commanded servo angle.", labelled("servo", self.servos.angles, labels)
+        yield "syringe_steps_total", "counter", "Syringe stepper steps moved.", ((labels, self.syringe.steps_moved),)
+        yield "syringe_remaining_ml", "gauge", "Liquid left in the syringe barrel.", ((labels, self.syringe.remaining_ml),)
+        yield "syringe_refills_total", "counter", "Syringe barrel refills.", ((labels, self.syringe.refills),)
+        yield "doses_total", "counter", "Syringe doses per channel.", labelled("channel", self.syringe.dose_counts, labels)
+        yield "dosed_ml_total", "counter", "Volume dispensed per channel.", labelled("channel", self.syringe.dosed_ml, labels)
+        yield "dosing_jobs_total", "counter", "Dosing jobs by outcome.", labelled("outcome", self.dosing.outcomes, labels)
+        yield "dosing_queue_depth", "gauge", "Dosing jobs waiting to run.", ((labels, self.dosing.queue_depth),)
+        yield "dosing_wait_seconds_total", "counter", "Queue wait of completed doses.", ((labels, self.dosing.wait_seconds),)
+        yield "dosing_run_seconds_total", "counter", "Run time of completed doses.", ((labels, self.dosing.run_seconds),)
+        yield "controller_enabled", "gauge", "Controller enable flag.", (
+            ({**labels, "controller": ctrl.name}, ctrl.enabled) for ctrl in self.controllers
+        )
+        yield "controller_runs_total", "counter", "Controller update() calls.", (
+            ({**labels, "controller": ctrl.name}, ctrl.runs) for ctrl in self.controllers
+        )
+
+    def close(self) -> None:
+        self.dosing.close()
+        self.syringe.close()
+        if self.poller is not None:
+            self.poller.stop()
+        if self.history is not None:
+            self.history.close()
+        if self.ring is not None:
+            self.ring.close()